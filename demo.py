@@ -3,6 +3,7 @@ import time
 import os
 import sys
 import random
+import argparse
 
 # Color codes for terminal
 GREEN = '\033[92m'
@@ -17,6 +18,7 @@ sys.path.append(os.path.join(os.path.dirname(__file__), 'src'))
 try:
     from src.ingestion import create_dummy_fastq
     from src.inference import EdgeInference
+    from src.profiling import profile_run, stage
 except ImportError as e:
     print(f"{RED}[Error] No se pudieron importar los módulos necesarios: {e}{RESET}")
     sys.exit(1)
@@ -28,13 +30,16 @@ def print_banner():
     print(f"{CYAN}================================================================{RESET}")
     print("")
 
-def run_demo():
+def run_demo(dramatic=True):
     print_banner()
+    # Pausas de efecto visual (se omiten al perfilar para no contaminar el profile)
+    pause = time.sleep if dramatic else (lambda s: None)
     
     # 1. Ingesta
     print(f"{YELLOW}[Ingesta] Preparando muestra de prueba...{RESET}")
-    sample_path = create_dummy_fastq()
-    time.sleep(0.5) # Efecto dramático
+    with stage('ingestion'):
+        sample_path = create_dummy_fastq()
+    pause(0.5) # Efecto dramático
     
     # 2. Carga del Motor
     print(f"{YELLOW}[Sistema] Iniciando motor de inferencia (TensorFlow Lite)...{RESET}")
@@ -48,15 +53,16 @@ def run_demo():
         
     print("")
     print(f"{CYAN}---> ANALIZANDO LECTURAS DE ARQUIVO: {os.path.basename(sample_path)} <---{RESET}")
-    time.sleep(1)
+    pause(1)
     
     # Simular lectura línea a línea del archivo FASTQ
     total_reads = 0
     virus_hits = 0
     
     # Leer las primeras 50 lecturas para la demo
-    with open(sample_path, 'r') as f:
-        lines = f.readlines()
+    with stage('ingestion'):
+        with open(sample_path, 'r') as f:
+            lines = f.readlines()
         
     # El archivo FASTQ tiene 4 líneas por lectura.
     num_entries = len(lines) // 4
@@ -74,7 +80,8 @@ def run_demo():
         header = lines[i*4].strip()
         sequence = lines[i*4 + 1].strip()
         
-        pathogen, confidence, ms = engine.predict(sequence)
+        with stage('interpreter'):
+            pathogen, confidence, ms = engine.predict(sequence)
         latencies.append(ms)
         
         if "Viral" in pathogen:
@@ -84,7 +91,7 @@ def run_demo():
             color = GREEN
             
         print(f"{header:<20} | {color}{pathogen:<20}{RESET} | {ms:.2f}ms")
-        time.sleep(0.1) # Pausa pequeña para que el ojo humano siga el log
+        pause(0.1) # Pausa pequeña para que el ojo humano siga el log
         
     avg_latency = sum(latencies) / len(latencies)
     
@@ -101,4 +108,13 @@ def run_demo():
     print(f"Velocidad de Procesamiento: {1000/avg_latency:.0f} lecturas/segundo")
     
 if __name__ == "__main__":
-    run_demo()
+    parser = argparse.ArgumentParser(description="Demo CLI de EdgeGen Dx.")
+    parser.add_argument('--profile', type=str, nargs='?', const='profile_demo', default=None,
+                        help="Perfila la ejecución y escribe <prefijo>.folded / <prefijo>.txt")
+    args = parser.parse_args()
+    
+    if args.profile:
+        with profile_run(args.profile):
+            run_demo(dramatic=False)
+    else:
+        run_demo()
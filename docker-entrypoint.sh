@@ -7,8 +7,15 @@ python web_interface/manage.py migrate
 # Recolectar estáticos (si fuera necesario, para demo simple no hace falta tanto lio)
 # python web_interface/manage.py collectstatic --noinput
 
-# Iniciar servidor Gunicorn
+# Workers de la cola de análisis en segundo plano (jobs en SQLite, reanudan tras reinicios)
+echo "Iniciando workers de análisis..."
+python web_interface/manage.py run_workers &
+
+# Iniciar servidor Gunicorn (gthread: las peticiones concurrentes de cada worker pasan por
+# el control de admisión, que acota la inferencia en vuelo y descarta el exceso con 503)
 echo "Iniciando Gunicorn..."
 exec gunicorn --chdir web_interface web_interface.wsgi:application \
     --bind 0.0.0.0:8000 \
-    --workers 3
+    --workers 3 \
+    --threads 16 \
+    --worker-connections 32
@@ -0,0 +1,188 @@
+import argparse
+import fcntl
+import json
+import os
+import platform
+import socket
+import sys
+import time
+from contextlib import contextmanager
+
+import numpy as np
+
+sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
+
+from src.registry import MANIFEST_PATH, MODEL_DIR, file_sha256, load_manifest, write_atomic
+
+# Perfiles por host: data/models/host_profiles/<hostname>.json (o la ruta de $EDGEGEN_HOST_PROFILE)
+PROFILE_DIR = os.path.join(MODEL_DIR, 'host_profiles')
+PROFILE_ENV = 'EDGEGEN_HOST_PROFILE'
+PROFILE_VERSION = 1
+
+# Grilla de búsqueda: hilos del intérprete (potencias de 2 hasta las CPUs disponibles) x lote
+BATCH_GRID = (64, 256, 1024, 4096)
+TUNE_READS = 8192
+REPEATS = 3
+
+# Configuraciones dentro de este margen del mejor throughput se consideran empatadas: se
+# prefiere la de menos hilos (deja CPU a otros motores/workers) y luego el lote menor (latencia)
+TOLERANCE = 0.05
+
+def available_cpus():
+    """CPUs utilizables por el proceso (respeta la afinidad/cgroup de contenedores)."""
+    if hasattr(os, 'sched_getaffinity'):
+        return len(os.sched_getaffinity(0))
+    return os.cpu_count() or 1
+
+def thread_grid(cpus=None):
+    cpus = cpus or available_cpus()
+    grid = [1]
+    while grid[-1] * 2 <= cpus:
+        grid.append(grid[-1] * 2)
+    return grid if grid[-1] == cpus else grid + [cpus]
+
+def host_info():
+    """Identidad del host: un perfil medido en otra máquina (o con otras CPUs) no aplica."""
+    import tensorflow as tf
+
+    return {
+        'hostname': socket.gethostname(),
+        'machine': platform.machine(),
+        'processor': platform.processor(),
+        'cpus': available_cpus(),
+        'tensorflow': tf.__version__,
+    }
+
+def profile_path():
+    if os.environ.get(PROFILE_ENV):
+        return os.environ[PROFILE_ENV]
+    host = ''.join(c if c.isalnum() or c in '-_.' else '_' for c in socket.gethostname()) or 'localhost'
+    return os.path.join(PROFILE_DIR, f'{host}.json')
+
+def _matches_host(profile):
+    host = profile.get('host') or {}
+    return host.get('machine') == platform.machine() and host.get('cpus') == available_cpus()
+
+_cache = {}
+
+def load_profile(path=None):
+    """
+    Perfil del host: {'version', 'host', 'models': {sha256 del modelo: configuración}}.
+    Vacío si no existe o si fue medido en otro hardware. Se cachea por mtime: los motores
+    creados después de un autotune lo ven sin reiniciar el proceso.
+    """
+    path = path or profile_path()
+    try:
+        stamp = os.stat(path).st_mtime_ns
+    except FileNotFoundError:
+        return {'version': PROFILE_VERSION, 'host': None, 'models': {}}
+    cached = _cache.get(path)
+    if cached and cached[0] == stamp:
+        return cached[1]
+    with open(path) as f:
+        profile = json.load(f)
+    if not _matches_host(profile):
+        print(f"[Autotune] {path} fue medido en otro hardware ({profile.get('host')}). Se ignora.")
+        profile = {'version': PROFILE_VERSION, 'host': None, 'models': {}}
+    _cache[path] = (stamp, profile)
+    return profile
+
+def tuned_config(model_path, path=None):
+    """{'num_threads', 'batch_size'} del perfil para este archivo de modelo (por sha256), o {}."""
+    models = load_profile(path)['models']
+    if not models:
+        return {}
+    try:
+        entry = models.get(file_sha256(model_path))
+    except OSError:
+        return {}
+    return {'num_threads': entry['num_threads'], 'batch_size': entry['batch_size']} if entry else {}
+
+def tune_model(model_path, buckets=None, threads=None, batch_sizes=BATCH_GRID, num_reads=TUNE_READS,
+               repeats=REPEATS):
+    """
+    Mide el throughput del modelo en la grilla hilos x lote (lecturas sintéticas del ancho
+    máximo del modelo; el costo no depende del contenido) y elige la mejor configuración.
+    Retorna {'num_threads', 'batch_size', 'reads_per_sec', 'grid': [...]}.
+    """
+    from src.inference import EdgeInference
+
+    grid = []
+    X = None
+    for num_threads in threads or thread_grid():
+        engine = EdgeInference(model_path, buckets=buckets, num_threads=num_threads)
+        if X is None:
+            X = np.random.default_rng(0).integers(1, 5, size=(num_reads, engine.encoder.max_length), dtype=np.int8)
+        for batch_size in batch_sizes:
+            engine.predict_encoded(X[:batch_size], batch_size=batch_size)  # asigna tensores para este lote
+            best = float('inf')
+            for _ in range(repeats):
+                start = time.perf_counter()
+                engine.predict_encoded(X, batch_size=batch_size)
+                best = min(best, time.perf_counter() - start)
+            grid.append({'num_threads': num_threads, 'batch_size': batch_size,
+                         'reads_per_sec': round(num_reads / best, 1)})
+
+    top = max(row['reads_per_sec'] for row in grid)
+    tied = [row for row in grid if row['reads_per_sec'] >= top * (1 - TOLERANCE)]
+    chosen = min(tied, key=lambda row: (row['num_threads'], row['batch_size']))
+    return {**chosen, 'grid': grid}
+
+@contextmanager
+def _locked_profile(path):
+    """Lectura-modificación-escritura del perfil bajo lock (varios workers arrancando a la vez)."""
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    with open(path + '.lock', 'w') as lock:
+        fcntl.flock(lock, fcntl.LOCK_EX)
+        profile = load_profile(path)
+        if profile['host'] is None:
+            profile = {'version': PROFILE_VERSION, 'host': host_info(), 'models': {}}
+        yield {**profile, 'models': dict(profile['models'])}  # copia: el perfil cacheado no cambia
+
+def ensure_profile(keys=None, manifest_path=MANIFEST_PATH, path=None, force=False, **grid):
+    """
+    Afina los modelos del registro (o solo `keys`) que aún no tienen configuración en el
+    perfil de este host (todos con `force`) y guarda el perfil tras cada modelo.
+    Retorna el perfil.
+    """
+    path = path or profile_path()
+    manifest = load_manifest(manifest_path)
+    base = os.path.dirname(os.path.abspath(manifest_path))
+    with _locked_profile(path) as profile:
+        for key, entry in manifest['models'].items():
+            if (keys and key not in keys) or (entry['sha256'] in profile['models'] and not force):
+                continue
+            print(f"[Autotune] Midiendo {key} ...")
+            result = tune_model(os.path.join(base, entry['path']), entry['input'].get('buckets'), **grid)
+            profile['models'][entry['sha256']] = {'key': key, **result,
+                                                  'tuned_at': time.strftime('%Y-%m-%dT%H:%M:%S')}
+            write_atomic(path, (json.dumps(profile, indent=2) + '\n').encode())
+            print(f"[Autotune] {key}: {result['num_threads']} hilo(s), lote {result['batch_size']} "
+                  f"-> {result['reads_per_sec']:,.0f} lecturas/s")
+    return load_profile(path)
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Afina hilos del intérprete y tamaño de lote para este host.")
+    parser.add_argument('--models', type=str, nargs='+', default=None, help="Claves del registro (por defecto todas)")
+    parser.add_argument('--force', action='store_true', help="Vuelve a medir modelos ya presentes en el perfil")
+    parser.add_argument('--threads', type=int, nargs='+', default=None,
+                        help="Hilos a probar (por defecto potencias de 2 hasta las CPUs disponibles)")
+    parser.add_argument('--batch-sizes', type=int, nargs='+', default=list(BATCH_GRID))
+    parser.add_argument('--reads', type=int, default=TUNE_READS, help="Lecturas sintéticas por medición")
+    parser.add_argument('--show', action='store_true', help="Solo muestra el perfil actual")
+    args = parser.parse_args(argv)
+
+    path = profile_path()
+    if args.show:
+        profile = load_profile(path)
+    else:
+        profile = ensure_profile(args.models, path=path, force=args.force, threads=args.threads,
+                                 batch_sizes=args.batch_sizes, num_reads=args.reads)
+    print(f"Perfil: {path}")
+    for digest, entry in profile['models'].items():
+        print(f"{entry['key']:<10} | {digest[:12]} | {entry['num_threads']} hilo(s) | lote {entry['batch_size']:<5} | "
+              f"{entry['reads_per_sec']:,.0f} lecturas/s | {entry['tuned_at']}")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
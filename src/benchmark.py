@@ -0,0 +1,359 @@
+import argparse
+import json
+import os
+import platform
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
+
+from src.inference import EdgeInference
+from src.memory import track_memory
+from src.ingestion import parse_fastq
+from src.pipeline import classify_file
+from src.minimizer_index import MinimizerIndex
+from src.prefilter import KmerBloomFilter, KmerPrefilter, genome_kmers
+from src.preprocessing.encoder import DNAEncoder
+
+BASELINE_PATH = os.path.join(os.path.dirname(__file__), '..', 'data', 'benchmarks', 'baseline.json')
+
+# Tamaños de entrada (lecturas) por defecto del suite
+DEFAULT_SIZES = (1_000, 10_000, 100_000)
+
+# Regresión: caída de throughput mayor a este umbral respecto al baseline
+DEFAULT_THRESHOLD = 0.10
+
+BASES = np.frombuffer(b'ACGT', dtype=np.uint8)
+
+def build_untrained_tflite(path, num_classes, variable_length=False):
+    """
+    Exporta una CNN sin entrenar con la arquitectura de producción. El costo de inferencia
+    no depende de los pesos, así que basta para medir escalamiento sin datos de referencia.
+    Con `variable_length`, la variante de entrada dinámica (GlobalMaxPooling, por buckets).
+    """
+    from src.model.cnn import create_genomic_cnn
+    from src.model.train import convert_to_tflite
+
+    model = create_genomic_cnn(input_length=None if variable_length else 100, num_classes=num_classes,
+                               global_pooling=variable_length)
+    with open(path, 'wb') as f:
+        f.write(convert_to_tflite(model))
+    return path
+
+def random_reads(num_reads, length=100, seed=0):
+    """Lecturas sintéticas ya codificadas (1..4 = A, C, G, T)."""
+    rng = np.random.default_rng(seed)
+    return rng.integers(1, 5, size=(num_reads, length), dtype=np.int8)
+
+def write_synthetic_fastq(path, num_reads, length=100, seed=0):
+    """FASTQ sintético de `num_reads` lecturas aleatorias (generado con NumPy, rápido)."""
+    rng = np.random.default_rng(seed)
+    seqs = BASES[rng.integers(0, 4, size=(num_reads, length))]
+    quality = "I" * length
+    with open(path, 'w') as f:
+        for i, seq in enumerate(seqs):
+            f.write(f"@SEQ_ID_{i}\n{seq.tobytes().decode()}\n+\n{quality}\n")
+    return path
+
+def _best_time_ms(fn, repeats):
+    fn()  # calentamiento (redimensiona tensores)
+    times = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        fn()
+        times.append((time.perf_counter() - start) * 1000)
+    return min(times)
+
+def benchmark_panel_scaling(panel_sizes=(1, 2, 4, 8), num_reads=4096, batch_size=1024, repeats=3):
+    """
+    Compara, para paneles de K patógenos, K modelos binarios (K invocaciones por lectura)
+    contra un único modelo multi-clase de K+1 salidas (una invocación por lectura).
+    Retorna una lista de filas con µs por lectura de cada enfoque.
+    """
+    X = random_reads(num_reads)
+    rows = []
+    with tempfile.TemporaryDirectory() as workdir:
+        binary_path = build_untrained_tflite(os.path.join(workdir, 'binary.tflite'), 2)
+
+        for k in panel_sizes:
+            binary_engines = [EdgeInference(model_path=binary_path) for _ in range(k)]
+            panel_path = build_untrained_tflite(os.path.join(workdir, f'panel_{k}.tflite'), k + 1)
+            panel_engine = EdgeInference(model_path=panel_path)
+
+            binary_ms = _best_time_ms(
+                lambda: [eng.predict_encoded(X, batch_size=batch_size) for eng in binary_engines], repeats)
+            panel_ms = _best_time_ms(lambda: panel_engine.predict_encoded(X, batch_size=batch_size), repeats)
+
+            row = {
+                'pathogens': k,
+                'binary_models_us_per_read': binary_ms * 1000 / num_reads,
+                'panel_model_us_per_read': panel_ms * 1000 / num_reads,
+            }
+            row['speedup'] = row['binary_models_us_per_read'] / row['panel_model_us_per_read']
+            rows.append(row)
+            print(f"[Bench] K={k}: {k} binarios {row['binary_models_us_per_read']:.1f} µs/lectura | "
+                  f"panel {row['panel_model_us_per_read']:.1f} µs/lectura | x{row['speedup']:.1f}")
+    return rows
+
+def benchmark_high_titre(titres=(0.1, 0.5, 0.9), num_reads=20_000, batch_size=1024, repeats=3,
+                         mutation_rate=0.002, genome_length=30_000):
+    """
+    Archivo -> diagnóstico sobre muestras con una fracción `titre` de lecturas virales (ventanas
+    de un genoma sintético con mutaciones puntuales; el resto, ruido). Compara solo la CNN, con
+    el prefiltro de k-mers y con prefiltro + índice de minimizers (la vía rápida decide las
+    coincidencias casi exactas). Retorna una fila por título con lecturas/s y vías de decisión.
+    """
+    from src.validate_models import sample_windows
+
+    rng = np.random.default_rng(0)
+    genome_codes = rng.integers(1, 5, size=genome_length, dtype=np.int8)
+    genome = BASES[genome_codes - 1].tobytes().decode()
+    prefilter = KmerPrefilter({'covid19': KmerBloomFilter.build(genome_kmers(genome))})
+    index = MinimizerIndex.from_genomes({'covid19': genome})
+    quality = "I" * 100
+
+    rows = []
+    with tempfile.TemporaryDirectory() as workdir:
+        engine = EdgeInference(model_path=build_untrained_tflite(os.path.join(workdir, 'binary.tflite'), 2))
+        engines = {'covid19': engine}
+        for titre in titres:
+            n_viral = int(num_reads * titre)
+            reads = np.concatenate([sample_windows(genome_codes, n_viral, rng, mutation_rate=mutation_rate),
+                                    rng.integers(1, 5, size=(num_reads - n_viral, 100), dtype=np.int8)])
+            path = os.path.join(workdir, f'titre_{titre}.fastq')
+            with open(path, 'w') as f:
+                for i, read in enumerate(BASES[reads - 1]):
+                    f.write(f"@SEQ_ID_{i}\n{read.tobytes().decode()}\n+\n{quality}\n")
+
+            row = {'titre': titre, 'reads': num_reads}
+            for case, kwargs in (('model', {}), ('prefilter', {'prefilter': prefilter}),
+                                 ('prefilter_index', {'prefilter': prefilter, 'index': index})):
+                ms = _best_time_ms(lambda: classify_file(path, engines, batch_size=batch_size, **kwargs), repeats)
+                row[f'{case}_reads_per_sec'] = num_reads / (ms / 1000)
+            row['decided_by'] = classify_file(path, engines, batch_size=batch_size, prefilter=prefilter,
+                                              index=index)['decided_by']['covid19']
+            row['speedup'] = row['prefilter_index_reads_per_sec'] / row['model_reads_per_sec']
+            rows.append(row)
+            print(f"[Bench] título {titre:.0%}: CNN {row['model_reads_per_sec']:,.0f} | "
+                  f"+prefiltro {row['prefilter_reads_per_sec']:,.0f} | "
+                  f"+índice {row['prefilter_index_reads_per_sec']:,.0f} lecturas/s (x{row['speedup']:.1f}) | "
+                  f"decididas {row['decided_by']}")
+    return rows
+
+def benchmark_read_lengths(lengths=(50, 100, 150), num_reads=20_000, batch_size=1024, repeats=3):
+    """
+    Costo de inferencia por lectura según su largo: modelo de entrada fija (100 posiciones:
+    padding de las cortas, truncado de las largas) vs modelo dinámico por buckets de longitud.
+    Incluye una muestra mixta dominada por lecturas recortadas (70% de 40-60 bp, 30% de 100-150 bp).
+    Retorna una fila por caso con µs/lectura de ambos modelos.
+    """
+    rng = np.random.default_rng(0)
+    samples = [(f'{length}bp', np.full(num_reads, length)) for length in lengths]
+    short = int(num_reads * 0.7)
+    samples.append(('mixed', np.concatenate([rng.integers(40, 61, size=short),
+                                              rng.integers(100, 151, size=num_reads - short)])))
+    rows = []
+    with tempfile.TemporaryDirectory() as workdir:
+        fixed = EdgeInference(model_path=build_untrained_tflite(os.path.join(workdir, 'fixed.tflite'), 2))
+        dynamic = EdgeInference(model_path=build_untrained_tflite(os.path.join(workdir, 'dynamic.tflite'), 2,
+                                                                 variable_length=True))
+        width = dynamic.encoder.max_length
+        for name, read_lengths in samples:
+            X = random_reads(num_reads, width, seed=len(rows))
+            X[np.arange(width)[None, :] >= read_lengths[:, None]] = 0  # padding tras el final de cada lectura
+            row = {'case': name, 'reads': num_reads}
+            for label, engine in (('fixed', fixed), ('bucketed', dynamic)):
+                ms = _best_time_ms(lambda: engine.predict_encoded(X, batch_size=batch_size), repeats)
+                row[f'{label}_us_per_read'] = ms * 1000 / num_reads
+            row['speedup'] = row['fixed_us_per_read'] / row['bucketed_us_per_read']
+            rows.append(row)
+            print(f"[Bench] {name:<6} fija (100) {row['fixed_us_per_read']:.2f} µs/lectura | "
+                  f"por buckets {row['bucketed_us_per_read']:.2f} µs/lectura (x{row['speedup']:.2f})")
+    return rows
+
+def run_suite(sizes=DEFAULT_SIZES, batch_size=1024, repeats=3, single_limit=2_000, memory_budget_mb=None):
+    """
+    Suite completo sobre datos sintéticos (offline). Para cada tamaño de entrada mide throughput
+    (lecturas/s, mejor de `repeats`) de: parseo FASTQ, codificación individual vs por lotes,
+    inferencia individual vs por lotes, panel de 2 modelos y archivo -> diagnóstico.
+    Los casos lectura-a-lectura se limitan a `single_limit` lecturas para acotar la duración.
+    El caso archivo -> diagnóstico registra además el pico de RSS y de memoria trazada
+    (y falla con MemoryBudgetExceeded si se supera `memory_budget_mb`).
+    Retorna: {'meta': {...}, 'results': {"<caso>@<tamaño>": {'reads', 'seconds', 'reads_per_sec', ...}}}
+    """
+    results = {}
+
+    def record(case, reads, ms):
+        results[f"{case}@{reads}"] = {
+            'reads': reads,
+            'seconds': ms / 1000,
+            'reads_per_sec': reads / (ms / 1000) if ms > 0 else 0.0,
+        }
+        print(f"[Bench] {case:<22} n={reads:<8} {results[f'{case}@{reads}']['reads_per_sec']:>14,.0f} lecturas/s")
+
+    with tempfile.TemporaryDirectory() as workdir:
+        model_path = build_untrained_tflite(os.path.join(workdir, 'binary.tflite'), 2)
+        engine = EdgeInference(model_path=model_path)
+        panel = {'covid19': engine, 'h3n2': EdgeInference(model_path=model_path)}
+        encoder = DNAEncoder(method='integer', max_length=100)
+
+        for size in sizes:
+            fastq_path = write_synthetic_fastq(os.path.join(workdir, f'sample_{size}.fastq'), size)
+            with open(fastq_path) as f:
+                seqs = [seq for _, seq in parse_fastq(f)]
+            X = encoder.encode_batch(seqs)
+
+            def parse():
+                with open(fastq_path) as f:
+                    for _ in parse_fastq(f):
+                        pass
+
+            record('fastq_parse', size, _best_time_ms(parse, repeats))
+
+            n_single = min(size, single_limit)
+            record('encode_single', n_single, _best_time_ms(lambda: [encoder.encode(s) for s in seqs[:n_single]], repeats))
+            record('encode_batch', size, _best_time_ms(lambda: encoder.encode_batch(seqs), repeats))
+
+            record('inference_single', n_single, _best_time_ms(lambda: [engine.predict(s) for s in seqs[:n_single]], repeats))
+            record('inference_batch', size, _best_time_ms(lambda: engine.predict_encoded(X, batch_size=batch_size), repeats))
+
+            record('panel_2_models', size, _best_time_ms(
+                lambda: [eng.predict_encoded(X, batch_size=batch_size) for eng in panel.values()], repeats))
+            record('file_to_diagnosis', size, _best_time_ms(
+                lambda: classify_file(fastq_path, panel, batch_size=batch_size), repeats))
+            with track_memory(budget_mb=memory_budget_mb, trace_top=0, verbose=False) as tracker:
+                classify_file(fastq_path, panel, batch_size=batch_size)
+            results[f'file_to_diagnosis@{size}'].update(
+                peak_rss_bytes=tracker.peak_rss, peak_traced_bytes=tracker.peak_traced)
+
+    import tensorflow as tf
+    meta = {
+        'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'host': platform.node(),
+        'machine': platform.machine(),
+        'python': platform.python_version(),
+        'numpy': np.__version__,
+        'tensorflow': tf.__version__,
+        'batch_size': batch_size,
+    }
+    return {'meta': meta, 'results': results}
+
+def compare_results(baseline, current, threshold=DEFAULT_THRESHOLD):
+    """
+    Compara caso a caso. Regresión = caída relativa de throughput mayor que `threshold`,
+    o crecimiento relativo de la memoria trazada mayor que `threshold` (si ambos la registran).
+    Un caso del baseline ausente en la corrida actual (eliminado, renombrado o caído) también
+    es regresión (`missing`).
+    Retorna una lista de filas {'case', 'baseline', 'current', 'change', 'memory_change', 'missing', 'regression'}.
+    """
+    rows = []
+    for case, base in baseline['results'].items():
+        if case not in current['results']:
+            rows.append({'case': case, 'baseline': base['reads_per_sec'], 'current': None, 'change': None,
+                         'memory_change': None, 'missing': True, 'regression': True})
+            continue
+        curr = current['results'][case]
+        base_rps = base['reads_per_sec']
+        curr_rps = curr['reads_per_sec']
+        change = (curr_rps - base_rps) / base_rps if base_rps > 0 else 0.0
+
+        memory_change = None
+        if base.get('peak_traced_bytes') and 'peak_traced_bytes' in curr:
+            memory_change = (curr['peak_traced_bytes'] - base['peak_traced_bytes']) / base['peak_traced_bytes']
+
+        rows.append({
+            'case': case,
+            'baseline': base_rps,
+            'current': curr_rps,
+            'change': change,
+            'memory_change': memory_change,
+            'missing': False,
+            'regression': change < -threshold or (memory_change is not None and memory_change > threshold),
+        })
+    return rows
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmarks de rendimiento de EdgeGen Dx.")
+    sub = parser.add_subparsers(dest='command', required=True)
+
+    run = sub.add_parser('run', help="Ejecuta el suite completo y guarda los resultados (JSON)")
+    run.add_argument('--sizes', type=int, nargs='+', default=list(DEFAULT_SIZES))
+    run.add_argument('--batch-size', type=int, default=1024)
+    run.add_argument('--repeats', type=int, default=3)
+    run.add_argument('--output', type=str, required=True,
+                     help="Archivo de resultados (data/benchmarks/baseline.json solo para renovar el baseline)")
+    run.add_argument('--memory-budget', type=float, default=None, metavar='MB',
+                     help="Falla el suite si el RSS supera este presupuesto")
+
+    compare = sub.add_parser('compare', help="Compara resultados contra un baseline")
+    compare.add_argument('baseline', type=str)
+    compare.add_argument('current', type=str)
+    compare.add_argument('--threshold', type=float, default=DEFAULT_THRESHOLD,
+                         help="Caída relativa de throughput tolerada (0.10 = 10%%)")
+
+    panel = sub.add_parser('panel', help="Panel multi-clase vs K modelos binarios")
+    panel.add_argument('--sizes', type=int, nargs='+', default=[1, 2, 4, 8])
+    panel.add_argument('--reads', type=int, default=4096)
+    panel.add_argument('--batch-size', type=int, default=1024)
+    panel.add_argument('--output', type=str, default=None, help="Guardar resultados en JSON")
+
+    titre = sub.add_parser('titre', help="Vía rápida (prefiltro + índice de minimizers) según el título viral")
+    titre.add_argument('--titres', type=float, nargs='+', default=[0.1, 0.5, 0.9])
+    titre.add_argument('--reads', type=int, default=20_000)
+    titre.add_argument('--batch-size', type=int, default=1024)
+    titre.add_argument('--output', type=str, default=None, help="Guardar resultados en JSON")
+
+    lengths = sub.add_parser('lengths', help="Costo por lectura según su largo: entrada fija vs buckets de longitud")
+    lengths.add_argument('--lengths', type=int, nargs='+', default=[50, 100, 150])
+    lengths.add_argument('--reads', type=int, default=20_000)
+    lengths.add_argument('--batch-size', type=int, default=1024)
+    lengths.add_argument('--output', type=str, default=None, help="Guardar resultados en JSON")
+
+    args = parser.parse_args(argv)
+    if args.command == 'run':
+        report = run_suite(args.sizes, args.batch_size, args.repeats, memory_budget_mb=args.memory_budget)
+        os.makedirs(os.path.dirname(os.path.abspath(args.output)), exist_ok=True)
+        with open(args.output, 'w') as f:
+            json.dump(report, f, indent=2)
+        print(f"[Bench] Resultados guardados en {args.output}")
+
+    elif args.command == 'compare':
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        with open(args.current) as f:
+            current = json.load(f)
+        rows = compare_results(baseline, current, args.threshold)
+
+        print(f"{'CASO':<32} | {'BASELINE':>12} | {'ACTUAL':>12} | {'CAMBIO':>8} | {'MEMORIA':>8}")
+        print("-" * 85)
+        for row in rows:
+            if row['missing']:
+                print(f"{row['case']:<32} | {row['baseline']:>12,.0f} | {'-':>12} | {'-':>8} | {'-':>8}"
+                      f"  ⚠️ FALTA EN LA CORRIDA ACTUAL")
+                continue
+            flag = "  ⚠️ REGRESIÓN" if row['regression'] else ""
+            memory = f"{row['memory_change'] * 100:>+7.1f}%" if row['memory_change'] is not None else f"{'-':>8}"
+            print(f"{row['case']:<32} | {row['baseline']:>12,.0f} | {row['current']:>12,.0f} | "
+                  f"{row['change'] * 100:>+7.1f}% | {memory}{flag}")
+
+        regressions = [r for r in rows if r['regression']]
+        print(f"\n{len(regressions)} regresión(es) sobre {len(rows)} casos (umbral {args.threshold:.0%}).")
+        return 1 if regressions else 0
+
+    elif args.command in ('panel', 'titre', 'lengths'):
+        if args.command == 'panel':
+            rows = benchmark_panel_scaling(args.sizes, args.reads, args.batch_size)
+        elif args.command == 'lengths':
+            rows = benchmark_read_lengths(args.lengths, args.reads, args.batch_size)
+        else:
+            rows = benchmark_high_titre(args.titres, args.reads, args.batch_size)
+        if args.output:
+            with open(args.output, 'w') as f:
+                json.dump(rows, f, indent=2)
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
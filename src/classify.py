@@ -0,0 +1,367 @@
+import argparse
+import gzip
+import json
+import multiprocessing
+import os
+import sys
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
+
+from src.ingestion import (iter_batches, iter_decompressed, iter_file_chunks, iter_lines, iter_mates, mate_id,
+                           parse_records, read_id)
+from src.pipeline import DECIDED_BY, add_hits, classify_batches, load_engines, summarize
+from src.registry import MANIFEST_PATH, load_manifest
+
+# Lotes grandes: menos invocaciones del intérprete y menos mensajes entre procesos
+DEFAULT_BATCH_SIZE = 4096
+
+# Filas por grupo del archivo de salida (cada grupo se escribe y se libera)
+DEFAULT_CHUNK_READS = 1 << 18
+
+# --- Salida columnar ---
+
+def output_columns(models, manifest_path=MANIFEST_PATH):
+    """
+    Columnas por lectura: read_id y, por modelo, <modelo>_class_id, la probabilidad de cada
+    clase positiva (<modelo>_prob en los binarios, <modelo>_prob_<patógeno> en el panel) y
+    <modelo>_decided_by (model, prefilter o index).
+    Retorna: {modelo: [(columna, índice de clase)]} con las columnas de probabilidad.
+    """
+    entries = load_manifest(manifest_path)['models']
+    columns = {}
+    for name in models:
+        classes = entries[name].get('classes', ['background', name])
+        if entries[name].get('kind') == 'panel':
+            columns[name] = [(f'{name}_prob_{cls}', i) for i, cls in enumerate(classes) if i > 0]
+        else:
+            columns[name] = [(f'{name}_prob', 1)]
+    return columns
+
+class ParquetSink:
+    """Parquet (pyarrow): un row group por chunk; decided_by como columna diccionario."""
+    def __init__(self, path):
+        import pyarrow  # noqa: F401 (falla aquí si no está instalado)
+
+        self.path = path
+        self._writer = None
+
+    def write(self, columns):
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+
+        arrays = {}
+        for key, values in columns.items():
+            if key.endswith('_decided_by'):
+                arrays[key] = pa.DictionaryArray.from_arrays(pa.array(values), pa.array(DECIDED_BY))
+            else:
+                arrays[key] = pa.array(values)
+        table = pa.table(arrays)
+        if self._writer is None:
+            self._writer = pq.ParquetWriter(self.path, table.schema, compression='zstd')
+        self._writer.write_table(table)
+
+    def close(self):
+        if self._writer is not None:
+            self._writer.close()
+
+class CsvSink:
+    """CSV (gzip si la ruta termina en .gz), escrito por chunks con pandas."""
+    def __init__(self, path):
+        self.path = path
+        self._file = gzip.open(path, 'wt', compresslevel=1) if path.endswith('.gz') else open(path, 'w')
+        self._header = True
+
+    def write(self, columns):
+        import pandas as pd
+
+        frame = pd.DataFrame({
+            key: np.asarray(DECIDED_BY)[values] if key.endswith('_decided_by') else values
+            for key, values in columns.items()
+        })
+        frame.to_csv(self._file, header=self._header, index=False, float_format='%.6g')
+        self._header = False
+
+    def close(self):
+        self._file.close()
+
+class ColumnsSink:
+    """
+    Binario compacto sin dependencias: un directorio con un archivo crudo little-endian por
+    columna (<columna>.bin), read_id.txt (una línea por lectura) y schema.json. Se lee con
+    load_columns() (np.memmap, sin cargar el archivo completo).
+    """
+    def __init__(self, path):
+        os.makedirs(path, exist_ok=True)
+        self.path = path
+        self.rows = 0
+        self._files = {}
+        self._dtypes = {}
+
+    def write(self, columns):
+        for key, values in columns.items():
+            if key not in self._files:
+                name = 'read_id.txt' if key == 'read_id' else f'{key}.bin'
+                self._files[key] = open(os.path.join(self.path, name), 'wb')
+            if key == 'read_id':
+                self._files[key].write(('\n'.join(values) + '\n').encode())
+            else:
+                values = np.asarray(values)
+                self._dtypes[key] = values.dtype.newbyteorder('<').str
+                self._files[key].write(values.astype(self._dtypes[key], copy=False).tobytes())
+        self.rows += len(columns['read_id'])
+
+    def close(self):
+        for f in self._files.values():
+            f.close()
+        schema = {'rows': self.rows, 'columns': self._dtypes, 'decided_by': list(DECIDED_BY)}
+        with open(os.path.join(self.path, 'schema.json'), 'w') as f:
+            json.dump(schema, f, indent=2)
+
+def load_columns(path):
+    """Lee una salida de ColumnsSink: {'read_id': [...], columna: np.memmap}."""
+    with open(os.path.join(path, 'schema.json')) as f:
+        schema = json.load(f)
+    with open(os.path.join(path, 'read_id.txt')) as f:
+        columns = {'read_id': f.read().splitlines()}
+    for key, dtype in schema['columns'].items():
+        columns[key] = np.memmap(os.path.join(path, f'{key}.bin'), dtype=dtype, mode='r', shape=(schema['rows'],))
+    return columns
+
+SINKS = {'parquet': ParquetSink, 'csv': CsvSink, 'columns': ColumnsSink}
+
+def open_sink(path, fmt='auto'):
+    """
+    Formato por extensión (.parquet, .csv, .csv.gz); sin extensión reconocida, Parquet si
+    pyarrow está disponible y si no el binario por columnas (directorio).
+    """
+    if fmt == 'auto':
+        name = os.path.basename(path.rstrip(os.sep))
+        if name.endswith(('.csv', '.csv.gz')):
+            fmt = 'csv'
+        elif name.endswith('.parquet'):
+            fmt = 'parquet'
+        else:
+            try:
+                import pyarrow  # noqa: F401
+                fmt = 'parquet'
+            except ImportError:
+                fmt = 'columns'
+    try:
+        return SINKS[fmt](path)
+    except ImportError:
+        raise ValueError(f"Formato {fmt} no disponible (instala pyarrow o usa --format columns/csv)")
+
+# --- Clasificación (en el proceso principal o en workers) ---
+
+_worker = {}
+
+def _init_worker(models, use_prefilter, use_index):
+    """Carga los motores del proceso; ValueError si alguno de `models` no se pudo cargar."""
+    from src.minimizer_index import default_index
+    from src.prefilter import default_prefilter
+
+    engines = load_engines(models)
+    unavailable = [name for name in models if name not in engines]
+    if unavailable:
+        raise ValueError(f"No se pudieron cargar: {', '.join(unavailable)}")
+    _worker['engines'] = engines
+    _worker['prefilter'] = default_prefilter() if use_prefilter else None
+    _worker['index'] = default_index() if use_index else None
+
+def _init_pool_worker(*init):
+    """
+    Initializer de los procesos del pool. Un error de carga se guarda y se lanza en el primer
+    lote: llega al proceso principal como ValueError (no como BrokenProcessPool sin causa).
+    """
+    try:
+        _init_worker(*init)
+    except ValueError as e:
+        _worker['error'] = e
+
+def _classify_seqs(*mates):
+    """
+    Un lote de secuencias (o de mates R1, R2) -> ({modelo: probs}, {modelo: decided_by}),
+    con los motores del proceso.
+    """
+    if 'error' in _worker:
+        raise _worker['error']
+    result = next(classify_batches([(None, *mates)], _worker['engines'],
+                                   prefilter=_worker['prefilter'], index=_worker['index']))
+    return result['probs'], result['decided_by']
+
+def iter_results(batches, init, workers=1, depth=2):
+    """
+    Clasifica los lotes en orden. Con workers > 1, cada proceso carga sus propios motores con
+    _init_worker(*init) (spawn: TensorFlow no es fork-safe) y hay a lo sumo workers * depth
+    lotes en vuelo. Los lotes son (headers, secuencias) o (headers, R1, R2).
+    Genera (headers, probs, decided_by).
+    """
+    if workers <= 1:
+        if not _worker:
+            _init_worker(*init)
+        for headers, *mates in batches:
+            yield (headers, *_classify_seqs(*mates))
+        return
+
+    ctx = multiprocessing.get_context('spawn')
+    with ProcessPoolExecutor(max_workers=workers, mp_context=ctx, initializer=_init_pool_worker,
+                             initargs=init) as pool:
+        pending = deque()
+        for headers, *mates in batches:
+            pending.append((headers, pool.submit(_classify_seqs, *mates)))
+            if len(pending) >= workers * depth:
+                headers, future = pending.popleft()
+                yield (headers, *future.result())
+        while pending:
+            headers, future = pending.popleft()
+            yield (headers, *future.result())
+
+def classify_reads(paths, output, models=None, batch_size=DEFAULT_BATCH_SIZE, workers=1, fmt='auto',
+                   chunk_reads=DEFAULT_CHUNK_READS, use_prefilter=True, use_index=True, progress=None,
+                   min_hits=1, paired=False, autotune=False):
+    """
+    Archivos FASTQ/FASTA (planos, .gz o BGZF) -> resultados por lectura en `output` (columnar,
+    por chunks) y resumen de la muestra (summarize + vías de decisión + throughput).
+    Con `paired`, `paths` son pares consecutivos R1, R2 y cada fila es un fragmento, con el
+    puntaje conjunto de sus dos mates.
+    Con `autotune`, los modelos sin configuración en el perfil del host se afinan antes de
+    cargar los motores (en el proceso principal: las mediciones no compiten con los workers).
+    """
+    if paired and len(paths) % 2:
+        raise ValueError("Entradas pareadas: se esperan pares R1 R2 (número par de archivos)")
+    manifest = load_manifest()['models']
+    models = models or [key for key, entry in manifest.items() if entry.get('kind') == 'binary']
+    missing = [name for name in models if name not in manifest]
+    if missing or not models:
+        raise ValueError(f"Modelos no registrados: {', '.join(missing)}" if missing else
+                         "No hay modelos disponibles. Entrena primero!")
+    columns = output_columns(models)
+    # Patógenos por modelo: los binarios cuentan su clase 1, el panel cada clase 1..K
+    pathogens = {name: manifest[name]['classes'][1:] if manifest[name].get('kind') == 'panel' else None
+                 for name in models}
+    hits = {pathogen: 0 for name in models for pathogen in (pathogens[name] or [name])}
+    decided = {name: dict.fromkeys(DECIDED_BY, 0) for name in models}
+
+    # El formato de salida se valida antes de cargar los motores (e.g. .parquet sin pyarrow)
+    sink = open_sink(output, fmt)
+    try:
+        if autotune:
+            from src.autotune import ensure_profile
+
+            ensure_profile(models)
+        init = (models, use_prefilter, use_index)
+        if workers <= 1:
+            _init_worker(*init)
+    except BaseException:
+        sink.close()
+        raise
+
+    def parse(path):
+        return parse_records(iter_lines(iter_decompressed(iter_file_chunks(path))))
+
+    def records():
+        if paired:
+            for r1, r2 in zip(paths[::2], paths[1::2]):
+                yield from iter_mates(parse(r1), parse(r2))
+        else:
+            for path in paths:
+                yield from parse(path)
+
+    name_of = mate_id if paired else read_id
+
+    buffered = []
+    total_reads = 0
+    start = time.perf_counter()
+
+    def flush():
+        chunk = {'read_id': [header for part in buffered for header in part['read_id']]}
+        for key in buffered[0]:
+            if key != 'read_id':
+                chunk[key] = np.concatenate([part[key] for part in buffered])
+        sink.write(chunk)
+        buffered.clear()
+
+    try:
+        for headers, probs, decided_by in iter_results(iter_batches(records(), batch_size), init, workers):
+            part = {'read_id': [name_of(header) for header in headers]}
+            for name in models:
+                predicted = np.argmax(probs[name], axis=1)
+                part[f'{name}_class_id'] = predicted.astype(np.uint8)
+                for column, i in columns[name]:
+                    part[column] = probs[name][:, i]
+                part[f'{name}_decided_by'] = decided_by[name]
+                add_hits(hits, name, pathogens[name], predicted)
+                for i, count in enumerate(np.bincount(decided_by[name], minlength=len(DECIDED_BY))):
+                    decided[name][DECIDED_BY[i]] += int(count)
+            buffered.append(part)
+            total_reads += len(headers)
+            if sum(len(p['read_id']) for p in buffered) >= chunk_reads:
+                flush()
+            if progress is not None:
+                progress.update(len(headers))
+        if buffered:
+            flush()
+    finally:
+        sink.close()
+
+    elapsed = time.perf_counter() - start
+    summary = summarize(total_reads, hits, min_hits)
+    summary.update(
+        decided_by=decided,
+        output=os.path.abspath(output),
+        format=type(sink).__name__.replace('Sink', '').lower(),
+        paired=paired,
+        elapsed_seconds=round(elapsed, 3),
+        reads_per_sec=round(total_reads / elapsed, 1) if elapsed > 0 else 0.0,
+    )
+    return summary
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description="Clasificación offline de alto throughput: FASTQ/FASTA (planos o gzip) -> resultados "
+                    "por lectura en formato columnar (Parquet si hay pyarrow, si no CSV) y resumen de la muestra.")
+    parser.add_argument('inputs', type=str, nargs='+', help="Archivos FASTQ/FASTA (.gz/BGZF admitidos)")
+    parser.add_argument('-o', '--output', type=str, required=True,
+                        help="Salida: .parquet, .csv, .csv.gz o un directorio (binario por columnas si no hay pyarrow)")
+    parser.add_argument('--models', type=str, nargs='+', default=None,
+                        help="Modelos del manifest (por defecto: todos los binarios; 'panel' para el multi-clase)")
+    parser.add_argument('--batch-size', type=int, default=DEFAULT_BATCH_SIZE)
+    parser.add_argument('--workers', type=int, default=1, help="Procesos de inferencia (cada uno con sus motores)")
+    parser.add_argument('--format', choices=['auto', *SINKS], default='auto')
+    parser.add_argument('--chunk-reads', type=int, default=DEFAULT_CHUNK_READS,
+                        help="Lecturas por grupo escrito en el archivo de salida")
+    parser.add_argument('--min-hits', type=int, default=1, help="Lecturas positivas para declarar un patógeno")
+    parser.add_argument('--no-prefilter', action='store_true', help="Sin el prefiltro de k-mers")
+    parser.add_argument('--no-index', action='store_true', help="Sin la vía rápida del índice de minimizers")
+    parser.add_argument('--paired', action='store_true',
+                        help="Corrida pareada: las entradas son pares R1 R2; una fila por fragmento")
+    parser.add_argument('--autotune', action='store_true',
+                        help="Afina hilos y lote de los modelos sin perfil en este host antes de clasificar")
+    parser.add_argument('--summary', type=str, default=None, help="Guardar también el resumen en JSON")
+    parser.add_argument('--quiet', action='store_true', help="Sin barra de progreso")
+    args = parser.parse_args(argv)
+
+    from tqdm import tqdm
+
+    with tqdm(unit=' lecturas', unit_scale=True, disable=args.quiet or None, file=sys.stderr) as progress:
+        try:
+            summary = classify_reads(args.inputs, args.output, args.models, args.batch_size, args.workers,
+                                     args.format, args.chunk_reads, not args.no_prefilter, not args.no_index,
+                                     progress, args.min_hits, args.paired, args.autotune)
+        except ValueError as e:
+            print(f"[Error] {e}")
+            return 1
+
+    print(json.dumps(summary, indent=2, ensure_ascii=False))
+    if args.summary:
+        with open(args.summary, 'w') as f:
+            json.dump(summary, f, indent=2, ensure_ascii=False)
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
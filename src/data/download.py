@@ -1,65 +1,239 @@
+import argparse
+import hashlib
+import json
 import os
-from Bio import Entrez
-from Bio import SeqIO
+import sys
 import time
+import urllib.error
+import urllib.parse
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+
+sys.path.append(os.path.join(os.path.dirname(__file__), '..', '..'))
+
+from src.ingestion import REF_DIR
+from src.registry import file_sha256, write_atomic
+
+# Manifest de referencias: accesión, archivo y checksum esperado (sha256) de cada genoma
+REFERENCES_MANIFEST = os.path.join(os.path.dirname(__file__), 'references.json')
+
+# NCBI E-utilities (efetch en FASTA). Identificación de cortesía requerida por NCBI
+EFETCH_URL = "https://eutils.ncbi.nlm.nih.gov/entrez/eutils/efetch.fcgi"
+ENTREZ_EMAIL = "demo_user@edgegen.dx"
+ENTREZ_TOOL = "EdgeGenDx_Downloader"
+
+# Sin API key NCBI admite ~3 peticiones/s: 3 conexiones simultáneas por defecto
+DEFAULT_CONNECTIONS = 3
+CHUNK_SIZE = 1 << 20
+TIMEOUT = 60
+RETRIES = 3
+
+# Espejo local por defecto (directorio o URL HTTP) para sitios sin conexión
+MIRROR_ENV = 'EDGEGEN_REFERENCE_MIRROR'
+
+class ChecksumError(Exception):
+    """El contenido descargado no coincide con el sha256 del manifest."""
+
+def load_references(manifest_path=REFERENCES_MANIFEST):
+    """Manifest de referencias: {'version', 'references': {clave: entrada}}."""
+    with open(manifest_path) as f:
+        return json.load(f)
+
+def efetch_url(accession):
+    query = urllib.parse.urlencode({'db': 'nucleotide', 'id': accession, 'rettype': 'fasta', 'retmode': 'text',
+                                    'email': ENTREZ_EMAIL, 'tool': ENTREZ_TOOL})
+    return f"{EFETCH_URL}?{query}"
+
+def is_url(source):
+    return source.startswith(('http://', 'https://'))
+
+def sources(entry, mirror=None):
+    """Fuentes de una referencia, en orden: el espejo (directorio o URL) y luego NCBI."""
+    found = []
+    if mirror:
+        if is_url(mirror):
+            found.append(mirror.rstrip('/') + '/' + urllib.parse.quote(entry['filename']))
+        else:
+            found.append(os.path.join(mirror, entry['filename']))
+    if entry.get('accession'):
+        found.append(efetch_url(entry['accession']))
+    return found
+
+def _open(source, offset):
+    """Abre una fuente desde el byte `offset`. Retorna (stream, reanudado: si respetó el offset)."""
+    if not is_url(source):
+        stream = open(source, 'rb')
+        stream.seek(offset)
+        return stream, True
+    request = urllib.request.Request(source, headers={'User-Agent': ENTREZ_TOOL})
+    if offset:
+        request.add_header('Range', f'bytes={offset}-')
+    response = urllib.request.urlopen(request, timeout=TIMEOUT)
+    # 206: el servidor respetó el rango; 200: envía el archivo completo desde el inicio
+    return response, offset > 0 and response.status == 206
+
+def fetch(source, dest, sha256=None, size=None, chunk_size=CHUNK_SIZE):
+    """
+    Descarga `source` (URL o archivo local) a `dest` en streaming, por chunks, a través de
+    `dest`.part; al terminar verifica el sha256 (si se conoce) y renombra de forma atómica:
+    `dest` nunca queda a medias.
+    Un .part previo se reanuda solo si el checksum es conocido (así una reanudación que mezcle
+    contenidos distintos no pasa la verificación); si no, se descarta.
+    Retorna el sha256 del archivo.
+    """
+    part = dest + '.part'
+    offset = os.path.getsize(part) if sha256 and os.path.exists(part) else 0
+    if size is not None and offset > size:
+        offset = 0
+
+    hasher = hashlib.sha256()
+    if size is not None and offset == size:
+        stream, resumed = None, True  # el .part ya está completo: solo falta verificarlo
+    else:
+        try:
+            stream, resumed = _open(source, offset)
+        except urllib.error.HTTPError as e:
+            if e.code != 416 or not offset:
+                raise
+            os.remove(part)  # rango inválido: el .part no corresponde a esta fuente
+            offset = 0
+            stream, resumed = _open(source, 0)
+
+    if resumed and offset:
+        with open(part, 'rb') as f:
+            for chunk in iter(lambda: f.read(chunk_size), b''):
+                hasher.update(chunk)
+    if stream is not None:
+        with stream, open(part, 'ab' if resumed and offset else 'wb') as out:
+            for chunk in iter(lambda: stream.read(chunk_size), b''):
+                out.write(chunk)
+                hasher.update(chunk)
+            out.flush()
+            os.fsync(out.fileno())
+
+    digest = hasher.hexdigest()
+    if sha256 and digest != sha256:
+        os.remove(part)
+        if offset:
+            return fetch(source, dest, sha256, size, chunk_size)  # el .part previo no era válido: desde cero
+        raise ChecksumError(f"sha256 {digest[:12]}… != {sha256[:12]}… (esperado)")
+    os.replace(part, dest)
+    return digest
+
+def _retryable(error):
+    # Archivos locales ausentes y errores HTTP 4xx no mejoran reintentando (salvo 408/429)
+    if isinstance(error, urllib.error.HTTPError):
+        return error.code >= 500 or error.code in (408, 429)
+    return not isinstance(error, FileNotFoundError)
+
+def acquire(key, entry, ref_dir=REF_DIR, mirror=None, retries=RETRIES):
+    """
+    Asegura una referencia en `ref_dir`: la reutiliza si ya existe y coincide con el checksum
+    del manifest; si no, la descarga de la primera fuente que funcione (con reintentos y
+    backoff exponencial).
+    Retorna {'key', 'status': cached|downloaded|failed, 'path', 'sha256', 'source', 'errors'}.
+    """
+    dest = os.path.join(ref_dir, entry['filename'])
+    expected = entry.get('sha256')
+    if os.path.exists(dest):
+        digest = file_sha256(dest)
+        if not expected or digest == expected:
+            return {'key': key, 'status': 'cached', 'path': dest, 'sha256': digest}
+        print(f"[Checksum] {entry['filename']} no coincide con el manifest. Se descarga de nuevo.")
+        os.remove(dest)
+
+    errors = []
+    for source in sources(entry, mirror):
+        for attempt in range(retries):
+            try:
+                digest = fetch(source, dest, expected, entry.get('size'))
+                return {'key': key, 'status': 'downloaded', 'path': dest, 'sha256': digest, 'source': source}
+            except ChecksumError as e:
+                errors.append(f"{source}: {e}")
+                break
+            except OSError as e:
+                errors.append(f"{source}: {e}")
+                if not _retryable(e) or attempt == retries - 1:
+                    break
+                time.sleep(0.5 * 2 ** attempt)
+    return {'key': key, 'status': 'failed', 'path': dest, 'errors': errors}
+
+def sync(targets=None, ref_dir=REF_DIR, mirror=None, connections=DEFAULT_CONNECTIONS,
+         manifest_path=REFERENCES_MANIFEST, retries=RETRIES):
+    """
+    Sincroniza las referencias del manifest (o solo `targets`) en paralelo, con a lo sumo
+    `connections` descargas simultáneas. Retorna {clave: resultado de acquire()}.
+    """
+    references = load_references(manifest_path)['references']
+    targets = targets or sorted(references)
+    missing = [key for key in targets if key not in references]
+    if missing:
+        raise ValueError(f"Referencias no registradas en el manifest: {', '.join(missing)}")
+    mirror = mirror or os.environ.get(MIRROR_ENV) or None
+    os.makedirs(ref_dir, exist_ok=True)
+    for key in targets:
+        if not references[key].get('sha256'):
+            print(f"[Aviso] {key}: sin sha256 en el manifest; la descarga no se verifica ni se reanuda "
+                  f"(fíjalo con --pin en un equipo conectado).")
+
+    with ThreadPoolExecutor(max_workers=max(1, connections)) as pool:
+        futures = {key: pool.submit(acquire, key, references[key], ref_dir, mirror, retries) for key in targets}
+        results = {key: future.result() for key, future in futures.items()}
+
+    for key, result in results.items():
+        filename = references[key]['filename']
+        if result['status'] == 'cached':
+            print(f"[Cache] {filename} ya existe y es válido. Saltando descarga.")
+        elif result['status'] == 'downloaded':
+            print(f"[Éxito] {filename} <- {result['source']}")
+        else:
+            print(f"[Error] Falló la descarga de {key}: {'; '.join(result['errors'])}")
+    return results
+
+def pin(results, manifest_path=REFERENCES_MANIFEST):
+    """Registra en el manifest el sha256 y el tamaño de las referencias obtenidas (para espejos)."""
+    manifest = load_references(manifest_path)
+    for key, result in results.items():
+        if result['status'] != 'failed':
+            entry = manifest['references'][key]
+            entry['sha256'] = result['sha256']
+            entry['size'] = os.path.getsize(result['path'])
+    write_atomic(manifest_path, (json.dumps(manifest, indent=2) + '\n').encode())
+    return manifest
+
+def download_genome(accession_id, filename, ref_dir=REF_DIR, mirror=None):
+    """Descarga una accesión suelta (sin checksum en el manifest). Retorna la ruta o None."""
+    result = acquire(accession_id, {'accession': accession_id, 'filename': filename}, ref_dir, mirror)
+    return result['path'] if result['status'] != 'failed' else None
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="EdgeGen Dx: descarga y verificación de referencias biológicas.")
+    parser.add_argument('--targets', type=str, nargs='+', default=None,
+                        help="Claves del manifest de referencias (por defecto todas)")
+    parser.add_argument('--mirror', type=str, default=None,
+                        help=f"Espejo local: directorio o URL HTTP (también ${MIRROR_ENV}); NCBI como respaldo")
+    parser.add_argument('--connections', type=int, default=DEFAULT_CONNECTIONS, help="Descargas simultáneas")
+    parser.add_argument('--ref-dir', type=str, default=REF_DIR)
+    parser.add_argument('--manifest', type=str, default=REFERENCES_MANIFEST)
+    parser.add_argument('--pin', action='store_true',
+                        help="Registra en el manifest el sha256 de las referencias obtenidas")
+    args = parser.parse_args(argv)
 
-# Configuración de Entrez (Requerido por NCBI)
-Entrez.email = "demo_user@edgegen.dx"  # Identificación de cortesía
-Entrez.tool = "EdgeGenDx_Downloader"
-
-# Directorios
-BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
-DATA_DIR = os.path.join(BASE_DIR, 'data')
-REF_DIR = os.path.join(DATA_DIR, 'references')
-
-# IDs de Acceso de GenBank
-# SARS-CoV-2 Wuhuan-Hu-1 (Completo)
-COVID_ACCESSION = "NC_045512.2"
-# Influenza A H3N2 (Segmento 4 - Hemaglutinina) - Cepa New York
-H3N2_ACCESSION = "CY163680" 
-
-def ensure_dirs():
-    if not os.path.exists(REF_DIR):
-        os.makedirs(REF_DIR)
-        print(f"[Sistema] Directorio creado: {REF_DIR}")
-
-def download_genome(accession_id, filename):
-    filepath = os.path.join(REF_DIR, filename)
-    
-    if os.path.exists(filepath):
-        print(f"[Cache] {filename} ya existe. Saltando descarga.")
-        return filepath
-        
-    print(f"[NCBI] Descargando {accession_id} ({filename})...")
-    try:
-        # Fetch desde Nucleotide database en formato FASTA
-        handle = Entrez.efetch(db="nucleotide", id=accession_id, rettype="fasta", retmode="text")
-        record = handle.read()
-        handle.close()
-        
-        with open(filepath, "w") as f:
-            f.write(record)
-            
-        print(f"[Éxito] Guardado en {filepath}")
-        return filepath
-    except Exception as e:
-        print(f"[Error] Falló la descarga de {accession_id}: {e}")
-        return None
-
-def main():
     print("=== EdgeGen Dx: Descarga de Referencias Biológicas ===")
-    ensure_dirs()
-    
-    # 1. SARS-CoV-2
-    covid_path = download_genome(COVID_ACCESSION, "sars_cov_2_genomic.fasta")
-    
-    # 2. H3N2
-    h3n2_path = download_genome(H3N2_ACCESSION, "h3n2_segment4.fasta")
-    
-    if covid_path and h3n2_path:
+    try:
+        results = sync(args.targets, args.ref_dir, args.mirror, args.connections, args.manifest)
+    except ValueError as e:
+        print(f"[Error] {e}")
+        return 1
+    if args.pin:
+        pin(results, args.manifest)
+        print(f"[Manifest] Checksums registrados en {args.manifest}")
+
+    if all(result['status'] != 'failed' for result in results.values()):
         print("\n[Listo] Referencias actualizadas. Ahora puedes ejecutar el entrenamiento.")
-    else:
-        print("\n[Aviso] Hubo errores en la descarga. Revisa tu conexión.")
+        return 0
+    print("\n[Aviso] Hubo errores en la descarga. Revisa tu conexión o el espejo.")
+    return 1
 
 if __name__ == "__main__":
-    main()
+    sys.exit(main())
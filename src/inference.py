@@ -1,29 +1,78 @@
 import numpy as np
 import tensorflow as tf
+import json
 import time
 import os
 import sys
+import threading
 
 # Agregar path para importar módulos locales si es necesario
 sys.path.append(os.path.join(os.path.dirname(__file__), '..', '..'))
 
+from src.autotune import tuned_config
 from src.preprocessing.encoder import DNAEncoder
 
 MODEL_PATH = os.path.join(os.path.dirname(__file__), '..', '..', 'data', 'models', 'edgegen_quant.tflite')
+PANEL_MODEL_PATH = os.path.join(os.path.dirname(__file__), '..', '..', 'data', 'models', 'model_panel.tflite')
+
+# Tamaño de lote por defecto para la inferencia por lotes (predict_encoded)
+DEFAULT_BATCH_SIZE = 1024
+
+# Buckets de longitud de los modelos de entrada dinámica: cada lectura se evalúa con el menor
+# bucket que la contiene (una lectura recortada de 40-60 bp paga 64 posiciones y no 100; una de
+# 150 bp ya no se trunca). El menor bucket debe ser >= cnn.min_input_length de la arquitectura.
+LENGTH_BUCKETS = (64, 100, 152)
+
+def fit_width(X, length):
+    """Recorta o completa con padding (código 0) lecturas codificadas (n, L) a (n, length)."""
+    if X.shape[1] >= length:
+        return X[:, :length]
+    return np.pad(X, ((0, 0), (0, length - X.shape[1])))
+
+def read_lengths(X):
+    """
+    Longitud efectiva de lecturas codificadas: posición del último código distinto de 0.
+    El padding y las N finales (también código 0) no cambian la entrada efectiva del modelo.
+    """
+    X = np.asarray(X)
+    nonzero = X != 0
+    return np.where(nonzero.any(axis=1), X.shape[1] - np.argmax(nonzero[:, ::-1], axis=1), 0)
 
 class EdgeInference:
-    def __init__(self, model_path=MODEL_PATH):
+    def __init__(self, model_path=MODEL_PATH, buckets=None, num_threads=None, batch_size=None):
         self.model_path = model_path
         if not os.path.exists(self.model_path):
             raise FileNotFoundError(f"Modelo no encontrado en: {self.model_path}. Entrena primero!")
+
+        # Hilos del intérprete y lote por defecto: cada valor explícito tiene prioridad y el que falte
+        # sale del perfil de este host (python -m src.autotune); sin perfil, los valores por defecto
+        # de TFLite y DEFAULT_BATCH_SIZE
+        tuned = tuned_config(self.model_path) if num_threads is None or batch_size is None else {}
+        self.num_threads = num_threads or tuned.get('num_threads')
+        self.batch_size = batch_size or tuned.get('batch_size', DEFAULT_BATCH_SIZE)
             
         # Cargar TFLite Model
-        self.interpreter = tf.lite.Interpreter(model_path=self.model_path)
+        if self.num_threads:
+            self.interpreter = tf.lite.Interpreter(model_path=self.model_path, num_threads=self.num_threads)
+        else:
+            self.interpreter = tf.lite.Interpreter(model_path=self.model_path)
         self.interpreter.allocate_tensors()
         
         self.input_details = self.interpreter.get_input_details()
         self.output_details = self.interpreter.get_output_details()
-        self.encoder = DNAEncoder(method='integer', max_length=100)
+
+        # Entrada de longitud dinámica (-1 en la firma): inferencia por buckets de longitud
+        shape = self.input_details[0].get('shape', [1, 100])
+        signature = self.input_details[0].get('shape_signature', shape)
+        self.buckets = tuple(sorted(buckets or LENGTH_BUCKETS)) if int(signature[-1]) == -1 else None
+        self.encoder = DNAEncoder(method='integer', max_length=self.buckets[-1] if self.buckets else 100)
+
+        self.input_dtype = self.input_details[0]['dtype']
+        self.num_classes = int(np.asarray(self.output_details[0].get('shape', [1, 2]))[-1])
+        self._input_shape = tuple(int(d) for d in shape)  # forma asignada actualmente en el intérprete
+        # El intérprete no es reentrante: un motor compartido entre hilos (gthread, panel_pool)
+        # serializa set_tensor/invoke/get_tensor. Motores distintos siguen en paralelo.
+        self._lock = threading.Lock()
 
     def predict(self, sequence):
         """
@@ -32,6 +81,8 @@ class EdgeInference:
         """
         # 1. Preproceso
         input_data = self.encoder.encode(sequence)
+        if self.buckets is not None:
+            input_data = input_data[:self.bucket_for(read_lengths(input_data[None, :]))[0]]
         
         # Check model input type (INT8 vs FLOAT32)
         input_dtype = self.input_details[0]['dtype']
@@ -41,16 +92,18 @@ class EdgeInference:
         else:
             input_tensor = np.expand_dims(input_data, axis=0).astype(np.int8)
 
-        # 2. Set tensor
-        self.interpreter.set_tensor(self.input_details[0]['index'], input_tensor)
+        with self._lock:
+            # 2. Set tensor
+            self._ensure_input_shape(input_tensor.shape)
+            self.interpreter.set_tensor(self.input_details[0]['index'], input_tensor)
 
-        # 3. Invocar intérprete (Inferencia)
-        start_time = time.time()
-        self.interpreter.invoke()
-        end_time = time.time()
-        
-        # 4. Leer salida
-        output_data = self.interpreter.get_tensor(self.output_details[0]['index'])
+            # 3. Invocar intérprete (Inferencia)
+            start_time = time.time()
+            self.interpreter.invoke()
+            end_time = time.time()
+            
+            # 4. Leer salida
+            output_data = self.interpreter.get_tensor(self.output_details[0]['index'])
         
         # Dequantization si es necesario
         scale, zero_point = self.output_details[0]['quantization']
@@ -82,6 +135,134 @@ class EdgeInference:
         latency_ms = (end_time - start_time) * 1000
         return pathogen, confidence, latency_ms
 
+    def predict_encoded(self, X, batch_size=None):
+        """
+        Inferencia por lotes sobre lecturas ya codificadas, shape (n, L).
+        El intérprete se redimensiona al tamaño del lote (una invocación por lote; por defecto
+        self.batch_size, el del perfil del host si existe). En un modelo
+        de longitud fija, L se ajusta a su entrada; en uno dinámico, las lecturas se agrupan por
+        bucket de longitud y cada grupo se evalúa con su tamaño natural.
+        Retorna: (probabilidades (n, num_clases) float32, tiempo_ms acumulado de invoke)
+        """
+        X = np.asarray(X)
+        batch_size = batch_size or self.batch_size
+        if self.buckets is not None:
+            return self._predict_bucketed(X, batch_size)
+        X = fit_width(X, self.encoder.max_length)
+        outputs = []
+        total_ms = 0.0
+        for start in range(0, len(X), batch_size):
+            probs, ms = self._invoke_batch(X[start:start + batch_size])
+            outputs.append(probs)
+            total_ms += ms
+
+        if not outputs:
+            return np.zeros((0, self.num_classes), dtype=np.float32), 0.0
+        return np.concatenate(outputs), total_ms
+
+    def predict_pairs_encoded(self, X1, X2, batch_size=None):
+        """
+        Inferencia de fragmentos pareados: los mates R1 y R2 (n, max_length) van en las mismas
+        invocaciones y sus probabilidades se combinan en un puntaje por fragmento.
+        Retorna: (probabilidades (n, num_clases) float32, tiempo_ms acumulado de invoke)
+        """
+        from src.pipeline import combine_mates
+
+        probs, total_ms = self.predict_encoded(np.concatenate([X1, X2]), batch_size=batch_size)
+        return combine_mates(probs[:len(X1)], probs[len(X1):]), total_ms
+
+    def bucket_for(self, lengths):
+        """Longitud del menor bucket que contiene cada lectura (el mayor para las más largas)."""
+        buckets = np.asarray(self.buckets)
+        return buckets[np.minimum(np.searchsorted(buckets, lengths), len(buckets) - 1)]
+
+    def _predict_bucketed(self, X, batch_size):
+        """
+        Agrupa las lecturas por bucket de longitud, evalúa cada bucket a su tamaño (n, bucket)
+        y restaura el orden original: el cómputo por lectura es proporcional a su bucket.
+        """
+        probs = np.zeros((len(X), self.num_classes), dtype=np.float32)
+        total_ms = 0.0
+        if not len(X):
+            return probs, total_ms
+        widths = self.bucket_for(read_lengths(X))
+        for width in np.unique(widths):
+            rows = np.flatnonzero(widths == width)
+            bucket = fit_width(X[rows], int(width))
+            for start in range(0, len(rows), batch_size):
+                probs[rows[start:start + batch_size]], ms = self._invoke_batch(bucket[start:start + batch_size])
+                total_ms += ms
+        return probs, total_ms
+
+    def _ensure_input_shape(self, shape):
+        # Redimensiona el intérprete solo cuando cambia la forma (tamaño de lote o bucket)
+        if tuple(shape) != self._input_shape:
+            self.interpreter.resize_tensor_input(self.input_details[0]['index'], list(shape))
+            self.interpreter.allocate_tensors()
+            self._input_shape = tuple(shape)
+
+    def _invoke_batch(self, batch):
+        input_index = self.input_details[0]['index']
+
+        # Cuantizar la entrada si el modelo es INT8
+        scale, zero_point = self.input_details[0].get('quantization', (0.0, 0))
+        if self.input_dtype == np.float32:
+            input_tensor = batch.astype(np.float32)
+        elif scale > 0:
+            quantized = np.round(batch.astype(np.float32) / scale + zero_point)
+            input_tensor = np.clip(quantized, -128, 127).astype(self.input_dtype)
+        else:
+            input_tensor = batch.astype(self.input_dtype)
+
+        with self._lock:
+            self._ensure_input_shape(batch.shape)
+            self.interpreter.set_tensor(input_index, input_tensor)
+            start_time = time.perf_counter()
+            self.interpreter.invoke()
+            latency_ms = (time.perf_counter() - start_time) * 1000
+            output_data = self.interpreter.get_tensor(self.output_details[0]['index'])
+
+        scale, zero_point = self.output_details[0]['quantization']
+        if scale > 0 and output_data.dtype != np.float32:
+            output_data = (output_data.astype(np.float32) - zero_point) * scale
+        return output_data.astype(np.float32, copy=False), latency_ms
+
+class PanelInference(EdgeInference):
+    """
+    Motor para el modelo panel multi-clase (clase 0 = fondo, 1..K = patógenos).
+    Una sola invocación del intérprete entrega las probabilidades de todo el panel.
+    """
+    def __init__(self, model_path=PANEL_MODEL_PATH, labels_path=None, buckets=None, num_threads=None, batch_size=None):
+        super().__init__(model_path=model_path, buckets=buckets, num_threads=num_threads, batch_size=batch_size)
+        labels_path = labels_path or os.path.splitext(self.model_path)[0] + '.json'
+        if not os.path.exists(labels_path):
+            raise FileNotFoundError(f"Etiquetas del panel no encontradas en: {labels_path}")
+        with open(labels_path) as f:
+            labels = json.load(f)
+        self.classes = labels['classes']
+        self.names = labels.get('names', self.classes)
+        self.pathogens = self.classes[1:]
+
+    def predict(self, sequence):
+        """
+        Inferencia de una secuencia contra todo el panel.
+        Retorna: (patógeno predicho o "Clean", confianza, tiempo_ms)
+        """
+        probs, latency_ms = self.predict_encoded(np.expand_dims(self.encoder.encode(sequence), axis=0))
+        predicted_class = int(np.argmax(probs[0]))
+        label = "Clean" if predicted_class == 0 else self.classes[predicted_class]
+        return label, float(probs[0][predicted_class]), latency_ms
+
+    def predict_panel(self, sequences, batch_size=None):
+        """
+        Inferencia por lotes contra todo el panel.
+        Retorna: ({patógeno: probabilidades (n,)}, clases predichas (n,), tiempo_ms)
+        """
+        X = self.encoder.encode_batch(sequences)
+        probs, latency_ms = self.predict_encoded(X, batch_size=batch_size)
+        per_pathogen = {name: probs[:, i + 1] for i, name in enumerate(self.pathogens)}
+        return per_pathogen, np.argmax(probs, axis=1), latency_ms
+
 if __name__ == "__main__":
     # Test
     classifier = EdgeInference()
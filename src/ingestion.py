@@ -1,7 +1,14 @@
 import os
-import urllib.request
+import io
+import itertools
+import queue
+import struct
+import threading
 import gzip
 import shutil
+import zlib
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
 
 # Dataset de prueba: SARS-CoV-2 (Wuhan) - Submuestra pequeña para demo
 # Usamos una URL simulada o un endpoint que permita rango de bytes para no bajar 5GB
@@ -13,6 +20,11 @@ DATA_DIR = os.path.join(os.path.dirname(os.path.dirname(__file__)), 'data')
 RAW_DIR = os.path.join(DATA_DIR, 'raw')
 REF_DIR = os.path.join(DATA_DIR, 'references')
 
+GZIP_MAGIC = b'\x1f\x8b'
+
+# Cabecera gzip con campo extra (18 bytes): suficiente para reconocer un bloque BGZF
+BGZF_HEADER_SIZE = 18
+
 SARS_COV_2_REF_URL = "https://ftp.ncbi.nlm.nih.gov/genomes/all/GCF/009/858/895/GCF_009858895.2_ASM985889v3/GCF_009858895.2_ASM985889v3_genomic.fna.gz"
 
 def ensure_directories():
@@ -20,7 +32,13 @@ def ensure_directories():
     os.makedirs(REF_DIR, exist_ok=True)
 
 def download_reference_genome():
-    """Descarga el genoma de referencia de SARS-CoV-2"""
+    """
+    Descarga el genoma de referencia de SARS-CoV-2 (ensamblaje RefSeq) en streaming a un
+    temporal .part que se renombra al terminar (src.data.download.fetch): una descarga
+    interrumpida nunca queda como referencia válida.
+    """
+    from src.data.download import fetch
+
     target_path = os.path.join(REF_DIR, 'sars_cov_2.fna.gz')
     if os.path.exists(target_path):
         print(f"[Check] Referencia encontrada: {target_path}")
@@ -28,13 +46,315 @@ def download_reference_genome():
     
     print(f"[Download] Descargando genoma de referencia SARS-CoV-2...")
     try:
-        urllib.request.urlretrieve(SARS_COV_2_REF_URL, target_path)
+        os.makedirs(REF_DIR, exist_ok=True)
+        fetch(SARS_COV_2_REF_URL, target_path)
         print("[OK] Descarga completada.")
         return target_path
     except Exception as e:
         print(f"[Error] Falló la descarga: {e}")
         return None
 
+def parse_fastq(handle):
+    """
+    Generador de lecturas (header, secuencia) desde un archivo FASTQ abierto en modo texto.
+    Lee 4 líneas por registro sin cargar el archivo completo en memoria.
+    """
+    lines = iter(handle)
+    for header, seq, _, _ in zip(lines, lines, lines, lines):
+        yield header.strip(), seq.strip()
+
+def iter_batches(records, batch_size=1024):
+    """
+    Agrupa lecturas (header, secuencia) en lotes (headers, secuencias) de hasta batch_size.
+    Con fragmentos pareados (header, secuencia R1, secuencia R2) genera (headers, R1, R2).
+    """
+    batch = []
+    for record in records:
+        batch.append(record)
+        if len(batch) == batch_size:
+            yield tuple(map(list, zip(*batch)))
+            batch = []
+    if batch:
+        yield tuple(map(list, zip(*batch)))
+
+def iter_read_batches(path, batch_size=1024):
+    """Recorre un FASTQ (plano, .gz o BGZF) en lotes: genera (headers, secuencias) de hasta batch_size lecturas."""
+    with open_reads(path) as f:
+        yield from iter_batches(parse_fastq(f), batch_size)
+
+def read_id(header):
+    """Identificador de la lectura: primer campo del header, sin '@' ni '>'."""
+    return header.lstrip('@>').split(None, 1)[0]
+
+def mate_id(header):
+    """Identificador del fragmento: read_id sin el sufijo de mate (/1, /2) del formato Illumina antiguo."""
+    name = read_id(header)
+    return name[:-2] if name.endswith(('/1', '/2')) else name
+
+def iter_mates(records1, records2):
+    """
+    Recorre los archivos R1 y R2 de una corrida pareada en paralelo (streaming, memoria acotada).
+    Genera (header de R1, secuencia R1, secuencia R2); falla con ValueError si los
+    identificadores de los mates no coinciden o si un archivo tiene más lecturas que el otro.
+    """
+    missing = object()
+    for i, (first, second) in enumerate(itertools.zip_longest(records1, records2, fillvalue=missing)):
+        if first is missing or second is missing:
+            shorter = 'R1' if first is missing else 'R2'
+            raise ValueError(f"Archivos pareados desbalanceados: {shorter} termina en la lectura {i}")
+        if mate_id(first[0]) != mate_id(second[0]):
+            raise ValueError(f"Mates desalineados en la lectura {i}: {read_id(first[0])} != {read_id(second[0])}")
+        yield first[0], first[1], second[1]
+
+def read_fastq_from(path, offset=0, max_bytes=16 << 20):
+    """
+    Lee lecturas (header, secuencia) de un FASTQ plano que puede seguir creciendo (escritura
+    en curso del secuenciador), desde `offset` (inicio de un registro) y hasta `max_bytes`.
+    Solo toma registros completos (4 líneas terminadas en salto de línea): el registro a
+    medias queda para la próxima lectura.
+    Retorna (lecturas, offset del primer byte no consumido).
+    """
+    with open(path, 'rb') as f:
+        f.seek(offset)
+        data = f.read(max_bytes)
+    lines = data.split(b'\n')
+    lines.pop()  # fragmento sin salto de línea (o vacío si el bloque termina en uno)
+    complete = len(lines) // 4 * 4
+    if not complete and len(data) == max_bytes:
+        raise ValueError(f"Registro FASTQ mayor que {max_bytes} bytes en {path}:{offset}")
+    records = []
+    for i in range(0, complete, 4):
+        header = lines[i].rstrip(b'\r')
+        if not header.startswith(b'@'):
+            raise ValueError(f"FASTQ inválido en {path}: se esperaba '@' y no {header[:20]!r}")
+        records.append((header.decode('ascii', 'replace').strip(),
+                        lines[i + 1].rstrip(b'\r').decode('ascii', 'replace').strip()))
+    return records, offset + sum(len(line) + 1 for line in lines[:complete])
+
+def iter_paired_batches(path1, path2, batch_size=1024):
+    """Recorre un par R1/R2 (plano, .gz o BGZF) en lotes de fragmentos: genera (headers, R1, R2)."""
+    with open_reads(path1) as f1, open_reads(path2) as f2:
+        yield from iter_batches(iter_mates(parse_fastq(f1), parse_fastq(f2)), batch_size)
+
+def is_gzip(data):
+    return data[:2] == GZIP_MAGIC
+
+def bgzf_block_size(header):
+    """
+    Tamaño total del bloque BGZF que empieza en `header` (subcampo extra 'BC', BSIZE + 1),
+    o None si no es una cabecera BGZF.
+    """
+    if len(header) < BGZF_HEADER_SIZE or not is_gzip(header) or not header[3] & 4:
+        return None
+    xlen = struct.unpack_from('<H', header, 10)[0]
+    extra = header[12:12 + xlen]
+    pos = 0
+    while pos + 4 <= len(extra):
+        si1, si2, slen = extra[pos], extra[pos + 1], struct.unpack_from('<H', extra, pos + 2)[0]
+        if si1 == 66 and si2 == 67 and slen == 2:  # 'B', 'C'
+            return struct.unpack_from('<H', extra, pos + 4)[0] + 1
+        pos += 4 + slen
+    return None
+
+def _inflate_bgzf_block(block):
+    xlen = struct.unpack_from('<H', block, 10)[0]
+    data = zlib.decompress(block[12 + xlen:-8], -15)
+    crc, size = struct.unpack_from('<II', block, len(block) - 8)
+    if len(data) != size or zlib.crc32(data) != crc:
+        raise ValueError("Bloque BGZF corrupto (CRC/ISIZE no coinciden)")
+    return data
+
+def _iter_bgzf(chunks, workers):
+    """Descomprime bloques BGZF en paralelo (zlib libera el GIL), entregándolos en orden."""
+    workers = workers or os.cpu_count() or 1
+    pending = deque()
+    buffer = bytearray()
+    with ThreadPoolExecutor(max_workers=workers, thread_name_prefix='edgegen-bgzf') as pool:
+        for chunk in chunks:
+            buffer += chunk
+            while len(buffer) >= BGZF_HEADER_SIZE:
+                size = bgzf_block_size(buffer)
+                if size is None:
+                    raise ValueError("Flujo BGZF inválido: cabecera de bloque no reconocida")
+                if len(buffer) < size:
+                    break
+                pending.append(pool.submit(_inflate_bgzf_block, bytes(buffer[:size])))
+                del buffer[:size]
+                # Acotar bloques en vuelo (memoria) y entregar en orden
+                while len(pending) > 4 * workers:
+                    yield pending.popleft().result()
+        if buffer:
+            raise ValueError("Flujo BGZF truncado")
+        while pending:
+            yield pending.popleft().result()
+
+def _iter_gzip(chunks):
+    """Descompresión gzip en streaming (soporta varios miembros concatenados)."""
+    inflater = zlib.decompressobj(wbits=31)
+    for chunk in chunks:
+        while chunk:
+            yield inflater.decompress(chunk)
+            if not inflater.eof:
+                break
+            chunk = inflater.unused_data
+            inflater = zlib.decompressobj(wbits=31)
+    yield inflater.flush()
+
+def _prefetch(iterator, depth):
+    """
+    Consume `iterator` en un hilo auxiliar (cola acotada): la descompresión no espera a la inferencia.
+    Si el consumidor se detiene antes (cliente desconectado, error, islice), el hilo no queda
+    bloqueado en la cola llena: termina y cierra `iterator` (y el pool BGZF que tenga detrás).
+    """
+    done = object()
+    q = queue.Queue(maxsize=depth)
+    stop = threading.Event()
+
+    def put(item):
+        while not stop.is_set():
+            try:
+                q.put(item, timeout=0.1)
+                return True
+            except queue.Full:
+                pass
+        return False
+
+    def produce():
+        try:
+            for item in iterator:
+                if not put(item):
+                    return
+            put(done)
+        except BaseException as e:
+            put(e)
+        finally:
+            close = getattr(iterator, 'close', None)
+            if close is not None:
+                close()
+
+    threading.Thread(target=produce, name='edgegen-decompress', daemon=True).start()
+    try:
+        while True:
+            item = q.get()
+            if item is done:
+                return
+            if isinstance(item, BaseException):
+                raise item
+            yield item
+    finally:
+        stop.set()
+
+def iter_decompressed(chunks, workers=None, prefetch=8):
+    """
+    Chunks de bytes -> chunks descomprimidos. Detecta el formato por la cabecera:
+    BGZF (bloques en paralelo con `workers` hilos), gzip (streaming) o sin comprimir (tal cual).
+    La descompresión corre en un hilo auxiliar con `prefetch` chunks de adelanto.
+    """
+    chunks = iter(chunks)
+    head = b''
+    while len(head) < BGZF_HEADER_SIZE:
+        chunk = next(chunks, None)
+        if chunk is None:
+            break
+        head += chunk
+    chunks = itertools.chain([head], chunks)
+
+    if not is_gzip(head):
+        yield from chunks
+        return
+    inflated = _iter_bgzf(chunks, workers) if bgzf_block_size(head) else _iter_gzip(chunks)
+    yield from (chunk for chunk in _prefetch(inflated, prefetch) if chunk)
+
+class _ChunkReader(io.RawIOBase):
+    """Adaptador de un iterador de chunks de bytes a un stream de lectura."""
+    def __init__(self, chunks):
+        self._chunks = iter(chunks)
+        self._pending = memoryview(b'')
+
+    def readable(self):
+        return True
+
+    def readinto(self, buffer):
+        while not self._pending:
+            chunk = next(self._chunks, None)
+            if chunk is None:
+                return 0
+            self._pending = memoryview(chunk)
+        n = min(len(buffer), len(self._pending))
+        buffer[:n] = self._pending[:n]
+        self._pending = self._pending[n:]  # vista, sin copiar el resto del chunk
+        return n
+
+def open_reads(path, workers=None):
+    """
+    Abre un archivo de lecturas o referencia en modo texto, descomprimiendo gzip/BGZF
+    de forma transparente (streaming, BGZF en paralelo). Sin compresión equivale a open().
+    """
+    with open(path, 'rb') as f:
+        compressed = is_gzip(f.read(2))
+    if not compressed:
+        return open(path, 'r')
+    raw = _ChunkReader(iter_decompressed(iter_file_chunks(path), workers=workers))
+    return io.TextIOWrapper(io.BufferedReader(raw, buffer_size=1 << 20), encoding='ascii', errors='replace')
+
+def iter_lines(chunks):
+    """Divide un flujo de chunks de bytes (e.g. un upload) en líneas, sin cargarlo completo."""
+    pending = b''
+    for chunk in chunks:
+        lines = (pending + chunk).split(b'\n')
+        pending = lines.pop()
+        yield from lines
+    if pending:
+        yield pending
+
+def iter_file_chunks(path, chunk_size=1 << 20):
+    """Lee un archivo binario en chunks de chunk_size bytes (para iter_lines)."""
+    with open(path, 'rb') as f:
+        while True:
+            chunk = f.read(chunk_size)
+            if not chunk:
+                return
+            yield chunk
+
+def parse_records(lines):
+    """
+    Generador de lecturas (header, secuencia) desde líneas de bytes, detectando el formato
+    por la primera línea: FASTQ ('@'), FASTA ('>', multilínea) o secuencias crudas (una por línea).
+    """
+    lines = (line.rstrip(b'\r') for line in lines)
+    first = next((line for line in lines if line.strip()), None)
+    if first is None:
+        return
+
+    if first.startswith(b'@'):
+        # FASTQ: 4 líneas por registro
+        header = first
+        for seq, _, _ in zip(lines, lines, lines):
+            yield header.decode('ascii', 'replace').strip(), seq.decode('ascii', 'replace').strip()
+            header = next(lines, None)
+            while header is not None and not header.strip():
+                header = next(lines, None)
+            if header is None:
+                return
+
+    elif first.startswith(b'>'):
+        header, parts = first, []
+        for line in lines:
+            if line.startswith(b'>'):
+                yield header.decode('ascii', 'replace').strip(), b''.join(parts).decode('ascii', 'replace')
+                header, parts = line, []
+            else:
+                parts.append(line.strip())
+        yield header.decode('ascii', 'replace').strip(), b''.join(parts).decode('ascii', 'replace')
+
+    else:
+        i = 0
+        for line in itertools.chain([first], lines):
+            line = line.strip()
+            if line:
+                yield f"Read_{i}", line.decode('ascii', 'replace')
+                i += 1
+
 def create_dummy_fastq(filename="sample_covid.fastq", num_reads=1000):
     """
     Crea un archivo FASTQ sintético para probar el flujo sin descargar GBs de datos.
@@ -0,0 +1,180 @@
+import os
+import resource
+import sys
+import threading
+import tracemalloc
+from contextlib import contextmanager
+
+from src.profiling import add_observer, remove_observer
+
+MB = 1024 * 1024
+
+class MemoryBudgetExceeded(MemoryError):
+    """El pico de RSS superó el presupuesto de memoria configurado."""
+
+def current_rss_bytes():
+    """RSS actual del proceso (Linux: /proc/self/statm; otros: pico de getrusage)."""
+    try:
+        with open('/proc/self/statm') as f:
+            return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+    except (OSError, ValueError, IndexError):
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return peak if sys.platform == 'darwin' else peak * 1024
+
+class MemoryTracker:
+    """
+    Observador de etapas (ver src.profiling.stage) que registra, por etapa:
+    - pico de RSS (muestreado cada `interval` segundos por un hilo auxiliar),
+    - pico de memoria trazada por tracemalloc (objetos Python y buffers NumPy),
+    - las `trace_top` mayores asignaciones vivas cuando la etapa alcanza un nuevo pico.
+    Con `budget_bytes`, falla la ejecución (MemoryBudgetExceeded) en el siguiente límite
+    de etapa en que el RSS haya superado el presupuesto.
+    """
+    def __init__(self, interval=0.005, trace_top=5, budget_bytes=None):
+        self.interval = interval
+        self.trace_top = trace_top
+        self.budget_bytes = budget_bytes
+        self.stages = {}
+        self.peak_rss = 0
+        self.peak_traced = 0
+        self.exceeded_rss = None
+        self._budget_raised = False
+        self._active = []
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._sampler = None
+        self._owns_tracemalloc = False
+
+    def _stage(self, name):
+        if name not in self.stages:
+            self.stages[name] = {'calls': 0, 'peak_rss': 0, 'peak_traced': 0, 'top_allocations': []}
+        return self.stages[name]
+
+    # --- Control ---
+    def start(self):
+        if not tracemalloc.is_tracing():
+            tracemalloc.start(10)
+            self._owns_tracemalloc = True
+        tracemalloc.reset_peak()
+        add_observer(self)
+        self._sampler = threading.Thread(target=self._run, name='edgegen-memory', daemon=True)
+        self._sampler.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+        self._sampler.join()
+        remove_observer(self)
+        self._record_rss(current_rss_bytes())
+        self.peak_traced = max(self.peak_traced, tracemalloc.get_traced_memory()[1])
+        if self._owns_tracemalloc:
+            tracemalloc.stop()
+        return self
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            self._record_rss(current_rss_bytes())
+
+    def _record_rss(self, rss):
+        with self._lock:
+            self.peak_rss = max(self.peak_rss, rss)
+            for name in self._active:
+                entry = self._stage(name)
+                entry['peak_rss'] = max(entry['peak_rss'], rss)
+            if self.budget_bytes and rss > self.budget_bytes and self.exceeded_rss is None:
+                self.exceeded_rss = rss
+
+    # --- Observador de etapas ---
+    def _boundary(self):
+        """Atribuye el pico trazado desde el último límite a las etapas activas."""
+        traced_peak = tracemalloc.get_traced_memory()[1]
+        tracemalloc.reset_peak()
+        self.peak_traced = max(self.peak_traced, traced_peak)
+        self._record_rss(current_rss_bytes())
+
+        new_peak = []
+        with self._lock:
+            for name in self._active:
+                entry = self._stage(name)
+                if traced_peak > entry['peak_traced']:
+                    entry['peak_traced'] = traced_peak
+                    new_peak.append(entry)
+        return new_peak
+
+    def _check_budget(self):
+        # Una sola vez por tracker: si el llamador ya manejó la excepción (e.g. pipeline.main
+        # retorna 2), la salida de track_memory no debe volver a lanzarla
+        if self.exceeded_rss is not None and not self._budget_raised:
+            self._budget_raised = True
+            raise MemoryBudgetExceeded(
+                f"RSS {self.exceeded_rss / MB:.1f} MB supera el presupuesto de {self.budget_bytes / MB:.1f} MB")
+
+    def stage_enter(self, name):
+        self._boundary()
+        with self._lock:
+            self._active.append(name)
+            self._stage(name)['calls'] += 1
+        self._check_budget()
+
+    def stage_exit(self, name):
+        new_peak = self._boundary()
+        if self.trace_top and new_peak:
+            # Snapshot solo cuando la etapa marca un nuevo pico (acotado, no por cada lote)
+            top = self.top_allocations(self.trace_top)
+            for entry in new_peak:
+                entry['top_allocations'] = top
+        with self._lock:
+            if name in self._active:
+                self._active.remove(name)
+        self._check_budget()
+
+    @staticmethod
+    def top_allocations(limit):
+        snapshot = tracemalloc.take_snapshot().filter_traces([
+            tracemalloc.Filter(False, tracemalloc.__file__),
+            tracemalloc.Filter(False, __file__),
+        ])
+        return [
+            {'where': f"{os.path.basename(stat.traceback[0].filename)}:{stat.traceback[0].lineno}",
+             'size_bytes': stat.size, 'count': stat.count}
+            for stat in snapshot.statistics('lineno')[:limit]
+        ]
+
+    # --- Reportes ---
+    def report(self):
+        return {
+            'peak_rss_bytes': self.peak_rss,
+            'peak_traced_bytes': self.peak_traced,
+            'budget_bytes': self.budget_bytes,
+            'stages': self.stages,
+        }
+
+    def summary(self):
+        lines = [f"Memoria: pico RSS {self.peak_rss / MB:.1f} MB | pico trazado {self.peak_traced / MB:.1f} MB"
+                 + (f" | presupuesto {self.budget_bytes / MB:.0f} MB" if self.budget_bytes else ""), "",
+                 f"{'ETAPA':<20} | {'LLAMADAS':>8} | {'PICO RSS':>10} | {'PICO TRAZADO':>12}"]
+        for name, entry in self.stages.items():
+            lines.append(f"{name:<20} | {entry['calls']:>8} | {entry['peak_rss'] / MB:>7.1f} MB | "
+                         f"{entry['peak_traced'] / MB:>9.1f} MB")
+            for alloc in entry['top_allocations']:
+                lines.append(f"{'':<20}   {alloc['size_bytes'] / MB:8.2f} MB  {alloc['where']} ({alloc['count']} bloques)")
+        return "\n".join(lines) + "\n"
+
+@contextmanager
+def track_memory(budget_mb=None, trace_top=5, verbose=True):
+    """Mide la memoria por etapa del bloque; con budget_mb falla si el RSS lo supera."""
+    tracker = MemoryTracker(trace_top=trace_top, budget_bytes=int(budget_mb * MB) if budget_mb else None)
+    tracker.start()
+    try:
+        yield tracker
+    finally:
+        tracker.stop()
+        if verbose:
+            print(tracker.summary())
+    tracker._check_budget()
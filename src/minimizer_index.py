@@ -0,0 +1,254 @@
+import argparse
+import hashlib
+import io
+import json
+import os
+import sys
+import threading
+import time
+
+import numpy as np
+
+sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
+
+from src.prefilter import kmers_by_position
+from src.registry import write_atomic
+
+MODEL_DIR = os.path.join(os.path.dirname(__file__), '..', 'data', 'models')
+INDEX_DIR = os.path.join(MODEL_DIR, 'minimizer_index')
+
+# Minimizers (k=15, ventana de w=10 k-mers): ~2/(w+1) de las posiciones, ~16 por lectura de 100 bases
+DEFAULT_K = 15
+DEFAULT_W = 10
+
+# Umbral "fuerte": la lectura se decide sin la CNN solo si al menos MIN_HITS de sus minimizers
+# (y una fracción MIN_FRACTION de ellos) están en la referencia. Una mutación rompe como mucho
+# k k-mers (~2-3 minimizers), así que las lecturas casi exactas pasan y el resto va al modelo.
+MIN_HITS = 4
+MIN_FRACTION = 0.75
+
+# Minimizer vacío (ventana sin k-mers válidos)
+EMPTY = np.uint64(0xFFFFFFFFFFFFFFFF)
+
+# Máscara de objetivos: un bit por genoma, en el entero sin signo más chico que los contiene
+MASK_DTYPES = (np.uint16, np.uint32, np.uint64)
+MAX_TARGETS = 64
+
+def _mask_dtype(n_targets):
+    if n_targets > MAX_TARGETS:
+        raise ValueError(f"El índice admite hasta {MAX_TARGETS} objetivos ({n_targets} recibidos)")
+    return next(dtype for dtype in MASK_DTYPES if np.iinfo(dtype).bits >= n_targets)
+
+def _mix(values):
+    """Finalizador de splitmix64 en el lugar: orden pseudoaleatorio de los k-mers (uint64)."""
+    values ^= values >> np.uint64(30)
+    values *= np.uint64(0xBF58476D1CE4E5B9)
+    values ^= values >> np.uint64(27)
+    values *= np.uint64(0x94D049BB133111EB)
+    values ^= values >> np.uint64(31)
+    return values
+
+# Máscaras del intercambio por bloques (invertir el orden de las bases de 2 bits de un k-mer)
+_SWAPS = ((2, 0x3333333333333333), (4, 0x0F0F0F0F0F0F0F0F), (8, 0x00FF00FF00FF00FF),
+          (16, 0x0000FFFF0000FFFF), (32, 0x00000000FFFFFFFF))
+
+def _reverse_complement(kmers, k):
+    """Complementario inverso de k-mers de 2 bits por base (uint32/uint64), con operaciones de bits."""
+    dtype = kmers.dtype.type
+    bits = kmers.dtype.itemsize * 8
+    values = ~kmers  # complemento: 3 - código
+    for shift, mask in _SWAPS:
+        if shift >= bits:
+            break
+        mask = dtype(mask & ((1 << bits) - 1))
+        values = ((values >> dtype(shift)) & mask) | ((values & mask) << dtype(shift))
+    return values >> dtype(bits - 2 * k)
+
+def minimizers_by_position(X, k=DEFAULT_K, w=DEFAULT_W):
+    """
+    Minimizers canónicos (independientes de la hebra) de lecturas codificadas (n, L), en layout
+    (ventanas, n) como kmers_by_position.
+    Retorna: (minimizer por ventana de w k-mers (uint64), nuevo (bool): distinto del de la ventana
+    anterior y no vacío). `minimizers[nuevo]` es la secuencia de minimizers de cada lectura.
+    """
+    forward, valid = kmers_by_position(X, k)
+    hashes = _mix(np.minimum(forward, _reverse_complement(forward, k)).astype(np.uint64))
+    hashes[~valid] = EMPTY
+
+    # Lecturas con menos de w k-mers: una sola ventana con todos
+    w = max(1, min(w, len(hashes)))
+    windows = len(hashes) - w + 1
+    minimizers = hashes[:windows].copy()
+    for j in range(1, w):
+        np.minimum(minimizers, hashes[j:j + windows], out=minimizers)
+
+    new = minimizers != EMPTY
+    new[1:] &= minimizers[1:] != minimizers[:-1]
+    return minimizers, new
+
+class MinimizerIndex:
+    """
+    Índice exacto de minimizers de los genomas de referencia: array ordenado de minimizers
+    (uint64) y, en paralelo, la máscara de bits de los genomas que lo contienen. Se guarda como
+    .npy y se abre con mmap: varios procesos comparten las mismas páginas y la carga es inmediata.
+    """
+    def __init__(self, minimizers, masks, targets, k=DEFAULT_K, w=DEFAULT_W, sha256=''):
+        self.minimizers = minimizers
+        self.masks = masks
+        self.targets = list(targets)
+        self.k = k
+        self.w = w
+        self.sha256 = sha256  # hash del contenido (clave de caché de resultados)
+
+    def __contains__(self, target):
+        return target in self.targets
+
+    def covers(self, targets):
+        return all(target in self.targets for target in targets)
+
+    def lookup(self, values):
+        """Máscara de genomas de cada minimizer consultado (0 si no está en el índice)."""
+        if not len(self.minimizers):
+            return np.zeros(len(values), dtype=self.masks.dtype)
+        # Consultas ordenadas: la búsqueda binaria recorre el índice en orden (mejor uso de caché)
+        values, inverse = np.unique(values, return_inverse=True)
+        pos = np.searchsorted(self.minimizers, values)
+        pos[pos == len(self.minimizers)] = 0
+        return np.where(self.minimizers[pos] == values, self.masks[pos], 0)[inverse]
+
+    def classify(self, X, targets, min_hits=MIN_HITS, min_fraction=MIN_FRACTION):
+        """
+        Decide las lecturas que coinciden casi exactamente con una referencia.
+        Retorna (n,) int8: i + 1 si la lectura se atribuye a targets[i]; 0 si queda para el
+        modelo (sin evidencia suficiente, o evidencia fuerte para más de un objetivo).
+        """
+        X = np.asarray(X)
+        minimizers, new = minimizers_by_position(X, self.k, self.w)
+        total = new.sum(axis=0)
+        reads = np.broadcast_to(np.arange(len(X)), new.shape)[new]
+        masks = self.lookup(minimizers[new])
+
+        calls = np.zeros(len(X), dtype=np.int8)
+        for i, target in enumerate(targets):
+            bit = masks.dtype.type(1 << self.targets.index(target))
+            hits = np.bincount(reads[(masks & bit) != 0], minlength=len(X))
+            strong = (hits >= min_hits) & (hits >= min_fraction * total)
+            calls[strong & (calls != 0)] = -1  # ambigua: la decide el modelo
+            calls[strong & (calls == 0)] = i + 1
+        calls[calls < 0] = 0
+        return calls
+
+    # --- Serialización (junto a los modelos) ---
+    def save(self, directory=INDEX_DIR):
+        os.makedirs(directory, exist_ok=True)
+        hasher = hashlib.sha256()
+        for name, array in (('minimizers', self.minimizers), ('masks', self.masks)):
+            buffer = io.BytesIO()
+            np.save(buffer, np.ascontiguousarray(array))
+            hasher.update(buffer.getvalue())
+            write_atomic(os.path.join(directory, f'{name}.npy'), buffer.getvalue())
+        self.sha256 = hasher.hexdigest()
+        meta = {'k': self.k, 'w': self.w, 'targets': self.targets, 'size': int(len(self.minimizers)),
+                'sha256': self.sha256}
+        # meta.json al final: un índice con meta.json está completo
+        write_atomic(os.path.join(directory, 'meta.json'), json.dumps(meta, indent=2).encode())
+        return directory
+
+    @classmethod
+    def load(cls, directory=INDEX_DIR, mmap=True):
+        with open(os.path.join(directory, 'meta.json')) as f:
+            meta = json.load(f)
+        mode = 'r' if mmap else None
+        minimizers = np.load(os.path.join(directory, 'minimizers.npy'), mmap_mode=mode)
+        masks = np.load(os.path.join(directory, 'masks.npy'), mmap_mode=mode)
+        return cls(minimizers, masks, meta['targets'], meta['k'], meta['w'], meta['sha256'])
+
+    @classmethod
+    def from_genomes(cls, genomes, k=DEFAULT_K, w=DEFAULT_W):
+        """Construye el índice desde {objetivo: genoma (str)}."""
+        from src.preprocessing.encoder import DNAEncoder
+
+        mask_dtype = _mask_dtype(len(genomes))
+        lookup = DNAEncoder(method='integer').lookup
+        values, masks = [], []
+        for i, sequence in enumerate(genomes.values()):
+            codes = lookup[np.frombuffer(sequence.encode('ascii', 'replace'), dtype=np.uint8)]
+            minimizers, new = minimizers_by_position(codes[None, :], k, w)
+            unique = np.unique(minimizers[new])
+            values.append(unique)
+            masks.append(np.full(len(unique), 1 << i, dtype=mask_dtype))
+        values = np.concatenate(values) if values else np.zeros(0, dtype=np.uint64)
+        masks = np.concatenate(masks) if masks else np.zeros(0, dtype=mask_dtype)
+
+        # Minimizers compartidos entre genomas: una entrada con la unión de las máscaras
+        order = np.argsort(values, kind='stable')
+        values, masks = values[order], masks[order]
+        starts = np.flatnonzero(np.r_[True, values[1:] != values[:-1]]) if len(values) else np.zeros(0, dtype=int)
+        merged = np.bitwise_or.reduceat(masks, starts) if len(values) else masks
+        return cls(values[starts], merged, list(genomes), k, w)
+
+def build_index(targets=None, k=DEFAULT_K, w=DEFAULT_W, directory=INDEX_DIR):
+    """Construye y guarda el índice desde las referencias FASTA de VIRUS_DB."""
+    from src.model.train import VIRUS_DB, load_genome_sequence
+
+    genomes = {}
+    for target in targets or VIRUS_DB:
+        try:
+            genomes[target] = load_genome_sequence(VIRUS_DB[target]['fasta'])
+        except FileNotFoundError as e:
+            print(f"[Índice] {target}: {e}")
+    index = MinimizerIndex.from_genomes(genomes, k, w)
+    index.save(directory)
+    for i, target in enumerate(index.targets):
+        print(f"[Índice] {target}: {int(np.sum(index.masks & (1 << i) != 0)):,} minimizers (k={k}, w={w})")
+    print(f"[Índice] {len(index.minimizers):,} minimizers ({index.minimizers.nbytes / 1024:.0f} KB) en {directory}")
+    return index
+
+_default = None
+_default_lock = threading.Lock()
+
+def default_index(directory=INDEX_DIR):
+    """Índice compartido del proceso, abierto con mmap (None si no se construyó)."""
+    global _default
+    if _default is None and os.path.exists(os.path.join(directory, 'meta.json')):
+        with _default_lock:
+            if _default is None:
+                _default = MinimizerIndex.load(directory)
+    return _default
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Índice exacto de minimizers (vía rápida previa a la CNN).")
+    sub = parser.add_subparsers(dest='command', required=True)
+    build = sub.add_parser('build', help="Construye data/models/minimizer_index/ desde las referencias")
+    build.add_argument('--k', type=int, default=DEFAULT_K)
+    build.add_argument('--w', type=int, default=DEFAULT_W)
+    build.add_argument('--output', type=str, default=INDEX_DIR)
+    query = sub.add_parser('hit-rate', help="Fracción de lecturas de un FASTQ/FASTA decididas por el índice")
+    query.add_argument('reads', type=str)
+    query.add_argument('--targets', type=str, nargs='+', default=None)
+    query.add_argument('--batch-size', type=int, default=4096)
+    args = parser.parse_args(argv)
+
+    if args.command == 'build':
+        build_index(k=args.k, w=args.w, directory=args.output)
+        return 0
+
+    from src.ingestion import iter_read_batches
+    from src.preprocessing.encoder import DNAEncoder
+
+    index = MinimizerIndex.load()
+    targets = args.targets or index.targets
+    encoder = DNAEncoder(method='integer', max_length=100)
+    counts = np.zeros(len(targets) + 1, dtype=np.int64)
+    start = time.perf_counter()
+    for _, seqs in iter_read_batches(args.reads, args.batch_size):
+        counts += np.bincount(index.classify(encoder.encode_batch(seqs), targets), minlength=len(targets) + 1)
+    elapsed = time.perf_counter() - start
+    total = int(counts.sum())
+    decided = ", ".join(f"{target} {int(c):,}" for target, c in zip(targets, counts[1:]))
+    print(f"[Índice] {total:,} lecturas | decididas sin la CNN: {decided} "
+          f"({(total - counts[0]) / max(total, 1):.1%}) | {total / elapsed:,.0f} lecturas/s (codificación + índice)")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
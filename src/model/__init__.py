@@ -1 +1 @@
-from .cnn import create_genomic_cnn
+from .cnn import create_genomic_cnn, feature_length
@@ -1,13 +1,21 @@
 import tensorflow as tf
 from tensorflow.keras import layers, models
 
-def create_genomic_cnn(input_length=100, num_classes=2):
+def create_genomic_cnn(input_length=100, num_classes=2, filters=(32, 16), kernel_sizes=(12, 8),
+                       pool_size=4, dense_units=16, global_pooling=False):
     """
     Crea un modelo de Deep Learning CNN 1D optimizado para clasificación de secuencias.
     
     Args:
         input_length (int): Longitud de la secuencia de ADN (e.g., 100bp).
         num_classes (int): Número de patógenos a clasificar (2: Virus vs Humano).
+        filters (tuple): Filtros de cada bloque convolucional.
+        kernel_sizes (tuple): Tamaño de kernel de cada bloque convolucional.
+        pool_size (int): Tamaño del MaxPooling tras cada convolución.
+        dense_units (int): Neuronas de la capa densa de clasificación.
+        global_pooling (bool): GlobalMaxPooling1D en lugar de Flatten. La cabeza no depende de
+            la longitud: con input_length=None el modelo acepta lecturas de cualquier largo
+            (>= min_input_length) y se evalúa por buckets de longitud.
         
     Returns:
         tf.keras.Model: Modelo compilado.
@@ -22,15 +30,15 @@ def create_genomic_cnn(input_length=100, num_classes=2):
         layers.Embedding(input_dim=5, output_dim=16, input_length=input_length),
         
         # 1. Feature Extraction (Convolutional Layers)
-        layers.Conv1D(filters=32, kernel_size=12, activation='relu'),
-        layers.MaxPooling1D(pool_size=4),
+        layers.Conv1D(filters=filters[0], kernel_size=kernel_sizes[0], activation='relu'),
+        layers.MaxPooling1D(pool_size=pool_size),
         
-        layers.Conv1D(filters=16, kernel_size=8, activation='relu'),
-        layers.MaxPooling1D(pool_size=4),
+        layers.Conv1D(filters=filters[1], kernel_size=kernel_sizes[1], activation='relu'),
+        layers.MaxPooling1D(pool_size=pool_size),
         
         # 2. Classification Head
-        layers.Flatten(),
-        layers.Dense(16, activation='relu'),
+        layers.GlobalMaxPooling1D() if global_pooling else layers.Flatten(),
+        layers.Dense(dense_units, activation='relu'),
         layers.Dropout(0.5), # Regularización
         layers.Dense(num_classes, activation='softmax')
     ])
@@ -41,6 +49,22 @@ def create_genomic_cnn(input_length=100, num_classes=2):
     
     return model
 
+def feature_length(input_length=100, kernel_sizes=(12, 8), pool_size=4):
+    """Longitud de salida del extractor convolucional (antes de Flatten). <= 0 = arquitectura inválida."""
+    length = input_length
+    for kernel in kernel_sizes:
+        if length < kernel:
+            return 0
+        length = (length - kernel + 1) // pool_size
+    return length
+
+def min_input_length(kernel_sizes=(12, 8), pool_size=4):
+    """Longitud mínima de lectura que produce al menos una posición tras el extractor convolucional."""
+    length = 1
+    while feature_length(length, kernel_sizes, pool_size) <= 0:
+        length += 1
+    return length
+
 if __name__ == "__main__":
     model = create_genomic_cnn()
     model.summary()
@@ -0,0 +1,214 @@
+import argparse
+import gzip
+import json
+import os
+import sys
+
+import numpy as np
+import tensorflow as tf
+
+sys.path.append(os.path.join(os.path.dirname(__file__), '..', '..'))
+
+from src.model.cnn import create_genomic_cnn
+from src.model.evaluation import evaluate_tflite
+from src.model.train import MODEL_DIR, VIRUS_DB, generate_synthetic_data
+
+# Capas cuyos kernels se podan por magnitud
+PRUNABLE_LAYERS = (tf.keras.layers.Conv1D, tf.keras.layers.Dense)
+
+# Arquitectura del estudiante: mitad de filtros y de neuronas densas que el modelo completo
+STUDENT_ARCH = {
+    'filters': (16, 8),
+    'kernel_sizes': (12, 8),
+    'pool_size': 4,
+    'dense_units': 8,
+}
+
+def compact_filename(target_virus):
+    """model_covid.tflite -> model_covid_compact.tflite"""
+    base, ext = os.path.splitext(VIRUS_DB[target_virus]['filename'])
+    return f"{base}_compact{ext}"
+
+def magnitude_prune(model, sparsity):
+    """
+    Poda por magnitud (por capa) de los kernels Conv1D/Dense: pone a cero la fracción
+    `sparsity` de pesos con menor |w|. Retorna las máscaras {nombre_capa: máscara}.
+    """
+    masks = {}
+    for layer in model.layers:
+        if not isinstance(layer, PRUNABLE_LAYERS):
+            continue
+        weights = layer.get_weights()
+        kernel = weights[0]
+        threshold = np.quantile(np.abs(kernel), sparsity)
+        mask = (np.abs(kernel) > threshold).astype(kernel.dtype)
+        weights[0] = kernel * mask
+        layer.set_weights(weights)
+        masks[layer.name] = mask
+    return masks
+
+def sparsity_of(model):
+    """Fracción de pesos en cero sobre los kernels podables."""
+    total = zeros = 0
+    for layer in model.layers:
+        if isinstance(layer, PRUNABLE_LAYERS):
+            kernel = layer.get_weights()[0]
+            total += kernel.size
+            zeros += int(np.sum(kernel == 0))
+    return zeros / total if total else 0.0
+
+def estimate_macs(model, nonzero_only=False):
+    """
+    Multiplicaciones-acumulaciones por lectura de las capas Conv1D/Dense.
+    Con nonzero_only=True solo cuenta pesos distintos de cero (cómputo efectivo tras la poda).
+    """
+    macs = 0
+    for layer in model.layers:
+        if not isinstance(layer, PRUNABLE_LAYERS):
+            continue
+        kernel = layer.get_weights()[0]
+        weights = int(np.count_nonzero(kernel)) if nonzero_only else kernel.size
+        if isinstance(layer, tf.keras.layers.Conv1D):
+            macs += weights * int(layer.output.shape[1])
+        else:
+            macs += weights
+    return macs
+
+def distill(teacher_probs, student, X, y, epochs=5, temperature=4.0, alpha=0.3, batch_size=32,
+            masks=None, seed=42):
+    """
+    Knowledge distillation: el estudiante aprende de las etiquetas reales (peso alpha) y de las
+    probabilidades suavizadas del profesor (peso 1 - alpha, KL con temperatura).
+    Si se pasan máscaras de poda, se re-aplican tras cada paso.
+    """
+    # El profesor exporta softmax: recuperamos logits como log(p) para suavizar con temperatura
+    soft_targets = tf.nn.softmax(np.log(teacher_probs + 1e-7) / temperature).numpy()
+    dataset = tf.data.Dataset.from_tensor_slices((X.astype(np.float32), y, soft_targets))
+    dataset = dataset.shuffle(len(X), seed=seed).batch(batch_size)
+
+    optimizer = tf.keras.optimizers.Adam()
+    kl = tf.keras.losses.KLDivergence()
+    mask_vars = []
+    if masks:
+        for layer in student.layers:
+            if layer.name in masks:
+                mask_vars.append((layer.trainable_weights[0], tf.constant(masks[layer.name])))
+
+    for epoch in range(epochs):
+        losses = []
+        for xb, yb, tb in dataset:
+            with tf.GradientTape() as tape:
+                probs = student(xb, training=True)
+                hard = tf.reduce_mean(tf.keras.losses.sparse_categorical_crossentropy(yb, probs))
+                soft = tf.nn.softmax(tf.math.log(probs + 1e-7) / temperature)
+                loss = alpha * hard + (1 - alpha) * kl(tb, soft) * temperature ** 2
+            grads = tape.gradient(loss, student.trainable_variables)
+            optimizer.apply_gradients(zip(grads, student.trainable_variables))
+            for kernel, mask in mask_vars:
+                kernel.assign(kernel * mask)
+            losses.append(float(loss))
+        print(f"[Distill] Época {epoch + 1}/{epochs} - loss: {np.mean(losses):.4f}")
+    return student
+
+def convert_compact(model, quantize=False):
+    """Exporta a TFLite aprovechando la dispersión de pesos (y cuantización dinámica si se pide)."""
+    converter = tf.lite.TFLiteConverter.from_keras_model(model)
+    converter.optimizations = [tf.lite.Optimize.EXPERIMENTAL_SPARSITY]
+    if quantize:
+        converter.optimizations.append(tf.lite.Optimize.DEFAULT)
+    return converter.convert()
+
+def _gzip_size(path):
+    with open(path, 'rb') as f:
+        return len(gzip.compress(f.read()))
+
+def compress_model(target_virus, sparsity=0.5, epochs=5, finetune_epochs=2, temperature=4.0,
+                   alpha=0.3, student_arch=STUDENT_ARCH, quantize=False, num_samples=2000):
+    """
+    Etapa de compresión posterior a train_and_convert:
+    1. Carga el modelo completo (temp_<target>.h5) como profesor.
+    2. Destila a un estudiante más estrecho.
+    3. Poda por magnitud el estudiante y hace fine-tuning con las máscaras fijas.
+    4. Exporta <modelo>_compact.tflite y un reporte JSON con tamaño, latencia y accuracy antes/después.
+    """
+    teacher_path = os.path.join(MODEL_DIR, f'temp_{target_virus}.h5')
+    baseline_path = os.path.join(MODEL_DIR, VIRUS_DB[target_virus]['filename'])
+    if not os.path.exists(teacher_path):
+        raise FileNotFoundError(f"Modelo completo no encontrado en: {teacher_path}. Entrena primero!")
+
+    teacher = tf.keras.models.load_model(teacher_path, compile=False)
+    input_length = teacher.input_shape[1]
+
+    X_train, y_train = generate_synthetic_data(target_virus, num_samples)
+    X_val, y_val = generate_synthetic_data(target_virus, num_samples // 2)
+    teacher_probs = teacher.predict(X_train, batch_size=256, verbose=0)
+
+    print(f"[Compress] Destilando {target_virus} hacia estudiante {student_arch}...")
+    student = create_genomic_cnn(input_length=input_length, num_classes=2, **student_arch)
+    distill(teacher_probs, student, X_train, y_train, epochs, temperature, alpha)
+
+    print(f"[Compress] Poda por magnitud ({sparsity:.0%}) + fine-tuning...")
+    masks = magnitude_prune(student, sparsity)
+    distill(teacher_probs, student, X_train, y_train, finetune_epochs, temperature, alpha, masks=masks)
+
+    compact_path = os.path.join(MODEL_DIR, compact_filename(target_virus))
+    with open(compact_path, 'wb') as f:
+        f.write(convert_compact(student, quantize=quantize))
+
+    before = evaluate_tflite(baseline_path, X_val, y_val)
+    before['size_gzip_bytes'] = _gzip_size(baseline_path)
+    before['macs_per_read'] = estimate_macs(teacher)
+
+    after = evaluate_tflite(compact_path, X_val, y_val)
+    after['size_gzip_bytes'] = _gzip_size(compact_path)
+    after['macs_per_read'] = estimate_macs(student)
+    after['effective_macs_per_read'] = estimate_macs(student, nonzero_only=True)
+    after['sparsity'] = sparsity_of(student)
+
+    report = {
+        'target': target_virus,
+        'student': {k: list(v) if isinstance(v, tuple) else v for k, v in student_arch.items()},
+        'sparsity': sparsity,
+        'quantized': quantize,
+        'before': before,
+        'after': after,
+    }
+    report_path = os.path.splitext(compact_path)[0] + '.json'
+    with open(report_path, 'w') as f:
+        json.dump(report, f, indent=2)
+
+    print_comparison(report)
+    print(f"[Success] Modelo compacto {os.path.basename(compact_path)} guardado (reporte: {report_path}).")
+    return report
+
+def print_comparison(report):
+    before, after = report['before'], report['after']
+    rows = [
+        ("Tamaño (KB)", before['size_bytes'] / 1024, after['size_bytes'] / 1024, "{:.1f}"),
+        ("Tamaño gzip (KB)", before['size_gzip_bytes'] / 1024, after['size_gzip_bytes'] / 1024, "{:.1f}"),
+        ("MACs/lectura", before['macs_per_read'], after['effective_macs_per_read'], "{:,}"),
+        ("Accuracy (%)", before['kpis']['accuracy'] * 100, after['kpis']['accuracy'] * 100, "{:.2f}"),
+        ("Especificidad (%)", before['kpis']['specificity'] * 100, after['kpis']['specificity'] * 100, "{:.2f}"),
+    ]
+    for batch_size in before['latency']:
+        rows.append((f"µs/lectura @{batch_size}", before['latency'][batch_size]['per_read_us'],
+                     after['latency'][batch_size]['per_read_us'], "{:.1f}"))
+
+    print(f"\n{'MÉTRICA':<20} | {'COMPLETO':>12} | {'COMPACTO':>12}")
+    print("-" * 50)
+    for name, b, a, fmt in rows:
+        print(f"{name:<20} | {fmt.format(b):>12} | {fmt.format(a):>12}")
+    print(f"Gates: completo={'OK' if before['passes_gates'] else 'FALLA'} | "
+          f"compacto={'OK' if after['passes_gates'] else 'FALLA'}")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Poda + destilación hacia un modelo TFLite compacto.")
+    parser.add_argument('--target', type=str, default='all', choices=list(VIRUS_DB.keys()) + ['all'])
+    parser.add_argument('--sparsity', type=float, default=0.5)
+    parser.add_argument('--epochs', type=int, default=5)
+    parser.add_argument('--quantize', action='store_true', help="Cuantización dinámica de pesos (int8)")
+    args = parser.parse_args()
+
+    targets = list(VIRUS_DB.keys()) if args.target == 'all' else [args.target]
+    for v in targets:
+        compress_model(v, sparsity=args.sparsity, epochs=args.epochs, quantize=args.quantize)
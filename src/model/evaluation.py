@@ -0,0 +1,71 @@
+import numpy as np
+import os
+import sys
+
+sys.path.append(os.path.join(os.path.dirname(__file__), '..', '..'))
+
+from src.inference import EdgeInference
+
+# Umbrales de aprobación de un modelo (ver src/validate_models.py)
+ACCURACY_GATE = 0.95
+SPECIFICITY_GATE = 0.90
+
+# Tamaños de lote en los que se mide la latencia real del intérprete
+LATENCY_BATCH_SIZES = (1, 64, 1024)
+
+def binary_kpis(y_true, y_pred):
+    """
+    Matriz de confusión y KPIs binarios (clase 1 = virus objetivo), vectorizado con NumPy.
+    Retorna: dict con tp, fn, tn, fp, accuracy, sensitivity y specificity.
+    """
+    y_true = np.asarray(y_true).astype(np.int64).ravel()
+    y_pred = np.asarray(y_pred).astype(np.int64).ravel()
+    tn, fp, fn, tp = np.bincount(y_true * 2 + y_pred, minlength=4)[:4].tolist()
+
+    total = tn + fp + fn + tp
+    return {
+        'tp': tp, 'fn': fn, 'tn': tn, 'fp': fp,
+        'accuracy': (tp + tn) / total if total > 0 else 0.0,
+        'sensitivity': tp / (tp + fn) if (tp + fn) > 0 else 0.0,
+        'specificity': tn / (tn + fp) if (tn + fp) > 0 else 0.0,
+    }
+
+def passes_gates(kpis):
+    """True si el modelo cumple los umbrales de accuracy y especificidad."""
+    return kpis['accuracy'] >= ACCURACY_GATE and kpis['specificity'] >= SPECIFICITY_GATE
+
+def measure_latency(engine, X, batch_sizes=LATENCY_BATCH_SIZES, repeats=5):
+    """
+    Mide la latencia del intérprete para cada tamaño de lote (mediana de `repeats` invocaciones,
+    tras una invocación de calentamiento).
+    Retorna: {batch_size: {'invoke_ms', 'per_read_us'}}
+    """
+    results = {}
+    for batch_size in batch_sizes:
+        batch = np.resize(np.asarray(X), (batch_size, X.shape[1]))
+        engine.predict_encoded(batch, batch_size=batch_size)
+
+        times = [engine.predict_encoded(batch, batch_size=batch_size)[1] for _ in range(repeats)]
+        invoke_ms = float(np.median(times))
+        results[batch_size] = {
+            'invoke_ms': invoke_ms,
+            'per_read_us': invoke_ms * 1000 / batch_size,
+        }
+    return results
+
+def evaluate_tflite(model_path, X_val, y_val, batch_sizes=LATENCY_BATCH_SIZES, repeats=5):
+    """
+    Reporte estándar de una exportación TFLite binaria: tamaño del flatbuffer,
+    KPIs sobre el set de validación y latencia real del intérprete.
+    """
+    engine = EdgeInference(model_path=model_path)
+    probs, _ = engine.predict_encoded(X_val)
+    kpis = binary_kpis(y_val, np.argmax(probs, axis=1))
+
+    return {
+        'path': model_path,
+        'size_bytes': os.path.getsize(model_path),
+        'kpis': kpis,
+        'passes_gates': passes_gates(kpis),
+        'latency': measure_latency(engine, X_val, batch_sizes, repeats),
+    }
@@ -0,0 +1,200 @@
+import argparse
+import itertools
+import json
+import multiprocessing
+import os
+import sys
+from concurrent.futures import ProcessPoolExecutor
+
+sys.path.append(os.path.join(os.path.dirname(__file__), '..', '..'))
+
+from src.model.cnn import feature_length
+from src.model.evaluation import (ACCURACY_GATE, SPECIFICITY_GATE, LATENCY_BATCH_SIZES,
+                                  evaluate_tflite)
+from src.model.train import MODEL_DIR, VIRUS_DB, generate_synthetic_data
+
+SWEEP_DIR = os.path.join(MODEL_DIR, 'sweep')
+
+# Espacio de búsqueda por defecto (la arquitectura actual es 32/16, 12/8, pool 4, dense 16)
+DEFAULT_GRID = {
+    'filters': [(32, 16), (16, 8), (8, 8)],
+    'kernel_sizes': [(12, 8), (8, 6), (6, 4)],
+    'pool_size': [2, 4],
+    'dense_units': [16],
+}
+
+def expand_grid(grid, input_length=100):
+    """Producto cartesiano del grid, descartando arquitecturas que colapsan la secuencia."""
+    keys = list(grid.keys())
+    variants = []
+    for values in itertools.product(*(grid[k] for k in keys)):
+        variant = dict(zip(keys, values))
+        if feature_length(input_length, variant['kernel_sizes'], variant['pool_size']) <= 0:
+            continue
+        variants.append(variant)
+    return variants
+
+def variant_id(variant):
+    """Identificador legible, e.g. f32-16_k12-8_p4_d16"""
+    return "f{}_k{}_p{}_d{}".format(
+        '-'.join(str(f) for f in variant['filters']),
+        '-'.join(str(k) for k in variant['kernel_sizes']),
+        variant['pool_size'],
+        variant['dense_units'],
+    )
+
+def _train_variant(job):
+    """
+    Worker: entrena y convierte una variante. Se ejecuta en un proceso separado
+    (contexto spawn, TensorFlow no es fork-safe). Retorna la ruta del .tflite.
+    """
+    import tensorflow as tf
+    from src.model.cnn import create_genomic_cnn
+    from src.model.train import convert_to_tflite
+
+    if job['threads']:
+        tf.config.threading.set_intra_op_parallelism_threads(job['threads'])
+        tf.config.threading.set_inter_op_parallelism_threads(job['threads'])
+    tf.keras.utils.set_random_seed(job['seed'])
+
+    model = create_genomic_cnn(input_length=job['X_train'].shape[1], num_classes=2, **job['variant'])
+    model.fit(job['X_train'], job['y_train'], epochs=job['epochs'], batch_size=32, verbose=0)
+
+    with open(job['path'], 'wb') as f:
+        f.write(convert_to_tflite(model))
+    return job['path']
+
+def pareto_front(rows, objectives):
+    """
+    Filas no dominadas. `objectives` es una lista de (función_clave, 'min' | 'max').
+    Una fila domina a otra si no es peor en ningún objetivo y es mejor en al menos uno.
+    """
+    def oriented(row):
+        return [key(row) if sense == 'min' else -key(row) for key, sense in objectives]
+
+    scores = [oriented(r) for r in rows]
+    front = []
+    for i, a in enumerate(scores):
+        dominated = any(
+            all(x <= y for x, y in zip(b, a)) and any(x < y for x, y in zip(b, a))
+            for j, b in enumerate(scores) if j != i
+        )
+        if not dominated:
+            front.append(rows[i])
+    return front
+
+def select_recommended(rows, latency_batch):
+    """El modelo más rápido (por lectura) que cumple los umbrales de validación; None si ninguno."""
+    eligible = [r for r in rows if r['passes_gates']]
+    if not eligible:
+        return None
+    return min(eligible, key=lambda r: (r['latency'][latency_batch]['per_read_us'], r['size_bytes']))
+
+def run_sweep(target, grid=DEFAULT_GRID, workers=2, epochs=5, num_samples=2000, val_samples=1000,
+              latency_batch=64, output_dir=SWEEP_DIR, seed=42):
+    """
+    Entrena las variantes del grid en paralelo, las convierte a TFLite y luego mide
+    (en serie, con la máquina en reposo) latencia real del intérprete, tamaño y KPIs.
+    Escribe sweep_<target>.json y sweep_<target>.md en output_dir.
+    """
+    os.makedirs(output_dir, exist_ok=True)
+    variants = expand_grid(grid)
+
+    X_train, y_train = generate_synthetic_data(target, num_samples)
+    X_val, y_val = generate_synthetic_data(target, val_samples)
+
+    jobs = []
+    for i, variant in enumerate(variants):
+        jobs.append({
+            'variant': variant,
+            'X_train': X_train, 'y_train': y_train,
+            'epochs': epochs,
+            'seed': seed + i,
+            'threads': 1 if workers > 1 else 0,
+            'path': os.path.join(output_dir, f"sweep_{target}_{variant_id(variant)}.tflite"),
+        })
+
+    print(f"[Sweep] Entrenando {len(jobs)} variantes con {workers} procesos...")
+    ctx = multiprocessing.get_context('spawn')
+    with ProcessPoolExecutor(max_workers=workers, mp_context=ctx) as pool:
+        paths = list(pool.map(_train_variant, jobs))
+
+    print(f"[Sweep] Midiendo latencia (lotes {list(LATENCY_BATCH_SIZES)}) y accuracy...")
+    rows = []
+    for job, path in zip(jobs, paths):
+        report = evaluate_tflite(path, X_val, y_val)
+        report['id'] = variant_id(job['variant'])
+        report['variant'] = job['variant']
+        rows.append(report)
+
+    front = pareto_front(rows, [
+        (lambda r: r['latency'][latency_batch]['per_read_us'], 'min'),
+        (lambda r: r['size_bytes'], 'min'),
+        (lambda r: r['kpis']['accuracy'], 'max'),
+    ])
+    front_ids = {r['id'] for r in front}
+    for r in rows:
+        r['pareto'] = r['id'] in front_ids
+    recommended = select_recommended(rows, latency_batch)
+
+    report = {
+        'target': target,
+        'gates': {'accuracy': ACCURACY_GATE, 'specificity': SPECIFICITY_GATE},
+        'latency_batch': latency_batch,
+        'recommended': recommended['id'] if recommended else None,
+        'variants': rows,
+    }
+    json_path = os.path.join(output_dir, f"sweep_{target}.json")
+    with open(json_path, 'w') as f:
+        json.dump(report, f, indent=2)
+    with open(os.path.join(output_dir, f"sweep_{target}.md"), 'w') as f:
+        f.write(format_markdown(report))
+
+    print(f"[Sweep] Reporte guardado en {json_path}")
+    if recommended:
+        print(f"[Sweep] Recomendado: {recommended['id']}")
+    else:
+        print("[Sweep] Ninguna variante cumple los umbrales de validación.")
+    return report
+
+def format_markdown(report):
+    """Tabla Markdown del sweep, frente de Pareto primero."""
+    batch_sizes = LATENCY_BATCH_SIZES
+    header = ["Variante", "Pareto", "Gates", "Tamaño (KB)", "Accuracy", "Especificidad"]
+    header += [f"µs/lectura @{b}" for b in batch_sizes]
+    lines = [
+        f"# Sweep de arquitectura: {report['target']}",
+        "",
+        f"Umbrales: accuracy >= {report['gates']['accuracy']:.0%}, "
+        f"especificidad >= {report['gates']['specificity']:.0%}. "
+        f"Recomendado: **{report['recommended'] or 'ninguno'}**",
+        "",
+        "| " + " | ".join(header) + " |",
+        "|" + "---|" * len(header),
+    ]
+    rows = sorted(report['variants'], key=lambda r: (not r['pareto'], r['latency'][report['latency_batch']]['per_read_us']))
+    for r in rows:
+        cells = [
+            r['id'],
+            "★" if r['pareto'] else "",
+            "✅" if r['passes_gates'] else "❌",
+            f"{r['size_bytes'] / 1024:.1f}",
+            f"{r['kpis']['accuracy'] * 100:.2f}%",
+            f"{r['kpis']['specificity'] * 100:.2f}%",
+        ]
+        cells += [f"{r['latency'][b]['per_read_us']:.1f}" for b in batch_sizes]
+        lines.append("| " + " | ".join(cells) + " |")
+    return "\n".join(lines) + "\n"
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Sweep de arquitecturas CNN con reporte de Pareto (latencia/tamaño/accuracy).")
+    parser.add_argument('--target', type=str, default='covid19', choices=list(VIRUS_DB.keys()))
+    parser.add_argument('--workers', type=int, default=2)
+    parser.add_argument('--epochs', type=int, default=5)
+    parser.add_argument('--samples', type=int, default=2000)
+    parser.add_argument('--latency-batch', type=int, default=64, choices=LATENCY_BATCH_SIZES)
+    parser.add_argument('--output', type=str, default=SWEEP_DIR)
+    args = parser.parse_args()
+
+    run_sweep(args.target, workers=args.workers, epochs=args.epochs, num_samples=args.samples,
+              latency_batch=args.latency_batch, output_dir=args.output)
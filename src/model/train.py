@@ -3,12 +3,16 @@ import tensorflow as tf
 import os
 import sys
 import argparse
+import json
 
 # Add src to path to import modules
 sys.path.append(os.path.join(os.path.dirname(__file__), '..', '..'))
 
 from src.preprocessing.encoder import DNAEncoder
 from src.model.cnn import create_genomic_cnn
+from src.inference import LENGTH_BUCKETS
+from src.ingestion import open_reads
+from src.registry import register_model, write_atomic
 
 DATA_DIR = os.path.join(os.path.dirname(__file__), '..', '..', 'data')
 MODEL_DIR = os.path.join(os.path.dirname(__file__), '..', '..', 'data', 'models')
@@ -18,6 +22,11 @@ import random
 
 REF_DIR = os.path.join(DATA_DIR, 'references')
 
+# Modelos de longitud variable (--variable-length): se entrenan con lecturas de MIN_READ_LENGTH
+# hasta el mayor bucket de src.inference.LENGTH_BUCKETS, y se evalúan por buckets de longitud
+MIN_READ_LENGTH = 40
+VARIABLE_READ_LENGTHS = (MIN_READ_LENGTH, LENGTH_BUCKETS[-1])
+
 # Genetic Signatures (Updated for Real Data)
 VIRUS_DB = {
     'covid19': {
@@ -32,21 +41,49 @@ VIRUS_DB = {
     }
 }
 
+# Modelo panel multi-clase: clase 0 = fondo, luego un patógeno por entrada de VIRUS_DB
+PANEL_CLASSES = ['background'] + list(VIRUS_DB.keys())
+PANEL_FILENAME = 'model_panel.tflite'
+
 def load_genome_sequence(filename):
-    """Loads the first sequence from a FASTA file."""
+    """Loads the first sequence from a FASTA file (plain, .gz or BGZF)."""
     path = os.path.join(REF_DIR, filename)
+    if not os.path.exists(path) and os.path.exists(path + '.gz'):
+        path += '.gz'
     if not os.path.exists(path):
         raise FileNotFoundError(f"Reference file not found: {path}. Run src/data/download.py first.")
     
-    # Parse FASTA
-    record = next(SeqIO.parse(path, "fasta"))
+    # Parse FASTA (decompressing on the fly if needed)
+    with open_reads(path) as handle:
+        record = next(SeqIO.parse(handle, "fasta"))
     return str(record.seq).upper()
 
-def generate_synthetic_data(target_virus, num_samples=2000):
+def sample_target_window(genome, length=100, mutation_rate=0.05):
+    """
+    Sliding Window Sampling: toma un fragmento aleatorio del genoma completo
+    y, con 50% de probabilidad, le aplica mutaciones puntuales (Data Augmentation).
+    """
+    max_start = len(genome) - length
+    start = random.randint(0, max_start)
+    seq_list = list(genome[start:start+length])
+    
+    # Data Augmentation (Mutations)
+    if random.random() < 0.5: # 50% chance of mutation
+        num_mutations = int(length * mutation_rate)
+        bases = ['A','C','G','T']
+        for _ in range(num_mutations):
+            idx = random.randint(0, length - 1)
+            seq_list[idx] = random.choice(bases)
+    
+    return "".join(seq_list)
+
+def generate_synthetic_data(target_virus, num_samples=2000, read_lengths=None):
     """
     Genera datos de entrenamiento usando Sliding Window sobre genomas reales.
+    Con `read_lengths` (mín, máx), cada ventana tiene una longitud aleatoria en ese rango y se
+    codifica con padding hasta el máximo; sin él, ventanas de 100 bases.
     """
-    encoder = DNAEncoder(method='integer', max_length=100)
+    encoder = DNAEncoder(method='integer', max_length=read_lengths[1] if read_lengths else 100)
     X = []
     y = []
     
@@ -70,24 +107,11 @@ def generate_synthetic_data(target_virus, num_samples=2000):
     
     for i in range(num_samples):
         is_target = i % 2 == 0
+        length = random.randint(*read_lengths) if read_lengths else 100
         
         if is_target:
             # TARGET CLASS (1)
-            # Sliding Window Sampling: Pick random 100bp chunk from FULL genome
-            max_start = len(target_full_seq) - 100
-            start = random.randint(0, max_start)
-            seq_list = list(target_full_seq[start:start+100])
-            
-            # Data Augmentation (Mutations)
-            if random.random() < 0.5: # 50% chance of mutation
-                mutation_rate = 0.05
-                num_mutations = int(100 * mutation_rate)
-                bases = ['A','C','G','T']
-                for _ in range(num_mutations):
-                    idx = random.randint(0, 99)
-                    seq_list[idx] = random.choice(bases)
-            
-            seq = "".join(seq_list)
+            seq = sample_target_window(target_full_seq, length)
             label = 1
             
         else:
@@ -98,17 +122,17 @@ def generate_synthetic_data(target_virus, num_samples=2000):
             if use_decoy:
                 # Sample from Decoy Genome
                 decoy_genome = random.choice(decoy_seqs)
-                max_start = len(decoy_genome) - 100
+                max_start = len(decoy_genome) - length
                 if max_start > 0:
                     start = random.randint(0, max_start)
-                    seq = decoy_genome[start:start+100]
+                    seq = decoy_genome[start:start+length]
                 else:
                      # Fallback if decoy too short (unlikely for genomes)
-                     seq = decoy_genome.ljust(100, 'N')[:100]
+                     seq = decoy_genome.ljust(length, 'N')[:length]
             else:
                 # Random Noise
                 bases = ['A', 'C', 'G', 'T']
-                seq = "".join([random.choice(bases) for _ in range(100)])
+                seq = "".join([random.choice(bases) for _ in range(length)])
                 
             label = 0
             
@@ -117,14 +141,16 @@ def generate_synthetic_data(target_virus, num_samples=2000):
         
     return np.array(X), np.array(y)
 
-def train_and_convert(target_virus):
+def train_and_convert(target_virus, variable_length=False):
     os.makedirs(MODEL_DIR, exist_ok=True)
     
     # 1. Get Data
-    X_train, y_train = generate_synthetic_data(target_virus, 2000)
+    read_lengths = VARIABLE_READ_LENGTHS if variable_length else None
+    X_train, y_train = generate_synthetic_data(target_virus, 2000, read_lengths)
     
-    # 2. Create Model
-    model = create_genomic_cnn(input_length=100, num_classes=2)
+    # 2. Create Model (longitud variable: entrada dinámica + GlobalMaxPooling)
+    model = create_genomic_cnn(input_length=None if variable_length else 100, num_classes=2,
+                               global_pooling=variable_length)
     
     # 3. Train
     print("[Train] Iniciando entrenamiento de la CNN...")
@@ -137,6 +163,73 @@ def train_and_convert(target_virus):
     
     # 5. Convert to TFLite (Float32 - No Quantization for accuracy)
     print(f"[TFLite] Convirtiendo modelo {target_virus}...")
+    tflite_model = convert_to_tflite(model)
+    
+    final_filename = VIRUS_DB[target_virus]['filename']
+    tflite_path = os.path.join(MODEL_DIR, final_filename)
+    write_atomic(tflite_path, tflite_model)
+    
+    # Publicar en el manifest: los servidores en marcha lo cargan sin reiniciar
+    register_model(target_virus, tflite_path, VIRUS_DB[target_virus]['name'])
+    print(f"[Success] Modelo {final_filename} guardado y registrado.")
+
+def generate_panel_data(num_samples=3000):
+    """
+    Datos para el modelo panel multi-clase: clase 0 = fondo (ruido aleatorio / no objetivo),
+    clase k = k-ésimo patógeno de PANEL_CLASSES. Clases balanceadas.
+    """
+    encoder = DNAEncoder(method='integer', max_length=100)
+    genomes = [load_genome_sequence(VIRUS_DB[k]['fasta']) for k in PANEL_CLASSES[1:]]
+    num_classes = len(PANEL_CLASSES)
+    bases = ['A', 'C', 'G', 'T']
+    X = []
+    y = []
+    
+    print(f"[Train] Generando {num_samples} muestras panel ({num_classes} clases)...")
+    for i in range(num_samples):
+        label = i % num_classes
+        if label == 0:
+            seq = "".join([random.choice(bases) for _ in range(100)])
+        else:
+            seq = sample_target_window(genomes[label - 1])
+        X.append(encoder.encode(seq))
+        y.append(label)
+        
+    return np.array(X), np.array(y)
+
+def train_panel_and_convert(num_samples=3000):
+    """
+    Entrena un único modelo multi-clase (K patógenos + fondo) que reemplaza a los K modelos
+    binarios: una sola invocación del intérprete por lectura para todo el panel.
+    """
+    os.makedirs(MODEL_DIR, exist_ok=True)
+    X_train, y_train = generate_panel_data(num_samples)
+    
+    model = create_genomic_cnn(input_length=100, num_classes=len(PANEL_CLASSES))
+    print(f"[Train] Iniciando entrenamiento del modelo panel {PANEL_CLASSES}...")
+    model.fit(X_train, y_train, epochs=5, batch_size=32, validation_split=0.2, verbose=1)
+    model.save(os.path.join(MODEL_DIR, 'temp_panel.h5'))
+    
+    print("[TFLite] Convirtiendo modelo panel...")
+    tflite_path = os.path.join(MODEL_DIR, PANEL_FILENAME)
+    write_atomic(tflite_path, convert_to_tflite(model))
+    
+    # Etiquetas de salida, en el orden de las neuronas de la capa softmax
+    with open(panel_labels_path(tflite_path), 'w') as f:
+        json.dump({
+            'classes': PANEL_CLASSES,
+            'names': ['Background'] + [VIRUS_DB[k]['name'] for k in PANEL_CLASSES[1:]],
+        }, f, indent=2)
+    
+    register_model('panel', tflite_path, 'Panel', kind='panel', classes=PANEL_CLASSES)
+    print(f"[Success] Modelo {PANEL_FILENAME} guardado y registrado.")
+
+def panel_labels_path(tflite_path):
+    """model_panel.tflite -> model_panel.json"""
+    return os.path.splitext(tflite_path)[0] + '.json'
+
+def convert_to_tflite(model):
+    """Convierte un modelo Keras a flatbuffer TFLite (Float32). Retorna los bytes."""
     converter = tf.lite.TFLiteConverter.from_keras_model(model)
     # converter.optimizations = [tf.lite.Optimize.DEFAULT] # Disabled for accuracy
     
@@ -149,22 +242,32 @@ def train_and_convert(target_virus):
     # converter.inference_input_type = tf.int8
     # converter.inference_output_type = tf.int8
     
-    tflite_model = converter.convert()
-    
-    final_filename = VIRUS_DB[target_virus]['filename']
-    tflite_path = os.path.join(MODEL_DIR, final_filename)
-    with open(tflite_path, 'wb') as f:
-        f.write(tflite_model)
-        
-    print(f"[Success] Modelo {final_filename} guardado.")
+    return converter.convert()
 
 if __name__ == "__main__":
     parser = argparse.ArgumentParser()
     parser.add_argument('--target', type=str, default='all', choices=['covid19', 'h3n2', 'all'])
+    parser.add_argument('--compress', action='store_true', help="Genera además el modelo compacto (poda + destilación)")
+    parser.add_argument('--panel', action='store_true', help="Entrena un único modelo multi-clase para todo el panel")
+    parser.add_argument('--variable-length', action='store_true',
+                        help="Modelos binarios de entrada dinámica (lecturas de 40-152 bp, inferencia por buckets de longitud)")
     args = parser.parse_args()
+    if args.variable_length and args.compress:
+        parser.error("--compress requiere modelos de longitud fija")
     
-    if args.target == 'all':
-        for v in ['covid19', 'h3n2']:
-            train_and_convert(v)
-    else:
-        train_and_convert(args.target)
+    if args.panel:
+        train_panel_and_convert()
+        sys.exit(0)
+    
+    targets = ['covid19', 'h3n2'] if args.target == 'all' else [args.target]
+    for v in targets:
+        train_and_convert(v, variable_length=args.variable_length)
+        if args.compress:
+            from src.model.compress import compress_model
+            compress_model(v)
+
+    # El prefiltro de k-mers y el índice de minimizers se reconstruyen desde las mismas referencias
+    from src.minimizer_index import build_index
+    from src.prefilter import build_prefilter
+    build_prefilter()
+    build_index()
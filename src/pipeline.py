@@ -0,0 +1,271 @@
+import argparse
+import json
+import os
+import sys
+from contextlib import ExitStack
+import numpy as np
+
+sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
+
+from src.ingestion import iter_paired_batches, iter_read_batches
+from src.minimizer_index import default_index
+from src.prefilter import default_prefilter
+from src.preprocessing.encoder import DNAEncoder
+from src.memory import MemoryBudgetExceeded, track_memory
+from src.profiling import profile_run, stage
+
+DEFAULT_BATCH_SIZE = 1024
+
+# Vía que decidió cada lectura (valores de 'decided_by')
+DECIDED_BY = ('model', 'prefilter', 'index')
+PATH_MODEL, PATH_PREFILTER, PATH_INDEX = range(len(DECIDED_BY))
+
+# Probabilidad mínima al combinar mates: una decisión exacta (0 o 1, del prefiltro o del
+# índice) pesa como evidencia fuerte pero no infinita frente al otro mate
+MATE_EPSILON = 1e-3
+
+def combine_mates(probs1, probs2, epsilon=MATE_EPSILON):
+    """
+    Puntaje conjunto de fragmentos pareados: suma de las log-probabilidades de ambos mates
+    (evidencia independiente, prior uniforme), renormalizada por fila.
+    Retorna (n, clases) float32.
+    """
+    joint = np.log(np.clip(probs1, epsilon, 1)) + np.log(np.clip(probs2, epsilon, 1))
+    joint = np.exp(joint - joint.max(axis=1, keepdims=True))
+    return (joint / joint.sum(axis=1, keepdims=True)).astype(np.float32)
+
+def combine_paths(path1, path2):
+    """Vía del fragmento: el índice si decidió algún mate; si no, el modelo si evaluó alguno; si no, el prefiltro."""
+    indexed = (path1 == PATH_INDEX) | (path2 == PATH_INDEX)
+    return np.where(indexed, PATH_INDEX, np.minimum(path1, path2)).astype(np.uint8)
+
+def classify_batches(batches, engines, executor=None, prefilter=None, index=None):
+    """
+    Clasifica lotes de lecturas contra uno o varios modelos.
+    Cada lote se codifica una sola vez y se evalúa con todos los motores.
+
+    Args:
+        batches: iterable de (headers, secuencias), o de (headers, R1, R2) para fragmentos
+            pareados: ambos mates van en el mismo lote (una codificación y una invocación por
+            motor) y sus probabilidades se combinan con combine_mates en una llamada por fragmento.
+        engines (dict): nombre -> EdgeInference.
+        executor: pool de hilos opcional; con varios motores los evalúa en paralelo
+            (cada motor tiene su propio intérprete y TFLite libera el GIL en invoke),
+            de modo que la latencia del panel se acerca a la de un solo modelo.
+        prefilter: KmerPrefilter opcional (src.prefilter). Las lecturas sin k-mers de los
+            patógenos de un motor no pasan por su intérprete y se reportan como clase 0.
+        index: MinimizerIndex opcional (src.minimizer_index). Las lecturas que coinciden casi
+            exactamente con la referencia de un patógeno se reportan como esa clase sin el intérprete.
+
+    Genera por lote: {'headers', 'probs': {nombre: (n, clases)}, 'inference_ms': {nombre: ms},
+    'skipped': {nombre: lecturas (o fragmentos) resueltas por el prefiltro},
+    'decided_by': {nombre: (n,) uint8, índice en DECIDED_BY de la vía que decidió cada lectura}}
+    """
+    # Ancho del lote: el del motor de entrada más larga (cada motor ajusta el lote a la suya)
+    max_length = max(engine.encoder.max_length for engine in engines.values())
+    encoder = DNAEncoder(method='integer', max_length=max_length)
+
+    batches = iter(batches)
+    while True:
+        with stage('ingestion'):
+            batch = next(batches, None)
+        if batch is None:
+            return
+        headers, seqs, *mates = batch
+        if mates:
+            n = len(seqs)
+            seqs = seqs + mates[0]
+
+        with stage('encoding'):
+            X = encoder.encode_batch(seqs)
+        # Clase decidida sin el intérprete (0 = limpia) y vía que la decidió, por motor
+        calls = {name: np.zeros(len(X), dtype=np.int8) for name in engines}
+        decided_by = {name: np.full(len(X), PATH_MODEL, dtype=np.uint8) for name in engines}
+        skipped = {}
+        if prefilter is not None:
+            with stage('prefilter'):
+                for name, engine in engines.items():
+                    targets = getattr(engine, 'pathogens', [name])
+                    if prefilter.covers(targets):
+                        clean = ~prefilter.candidates(X, targets)
+                        decided_by[name][clean] = PATH_PREFILTER
+                        skipped[name] = int(clean.sum())
+        if index is not None:
+            with stage('index'):
+                for name, engine in engines.items():
+                    targets = getattr(engine, 'pathogens', [name])
+                    if index.covers(targets):
+                        pending = np.flatnonzero(decided_by[name] == PATH_MODEL)
+                        hits = index.classify(X[pending], targets)
+                        calls[name][pending] = hits
+                        decided_by[name][pending[hits > 0]] = PATH_INDEX
+
+        def run(name, engine):
+            pending = np.flatnonzero(decided_by[name] == PATH_MODEL)
+            if len(pending) == len(X):
+                return engine.predict_encoded(X)
+            probs = np.eye(engine.num_classes, dtype=np.float32)[calls[name]]
+            if len(pending) == 0:
+                return probs, 0.0
+            probs[pending], ms = engine.predict_encoded(X[pending])
+            return probs, ms
+
+        probs = {}
+        inference_ms = {}
+        with stage('interpreter'):
+            if executor is not None and len(engines) > 1:
+                outputs = executor.map(run, engines, engines.values())
+            else:
+                outputs = (run(name, engine) for name, engine in engines.items())
+            for name, (name_probs, ms) in zip(engines, outputs):
+                probs[name] = name_probs
+                inference_ms[name] = ms
+        if mates:
+            with stage('aggregation'):
+                for name in engines:
+                    probs[name] = combine_mates(probs[name][:n], probs[name][n:])
+                    decided_by[name] = combine_paths(decided_by[name][:n], decided_by[name][n:])
+                skipped = {name: int(np.sum(decided_by[name] == PATH_PREFILTER)) for name in skipped}
+        yield {'headers': headers, 'probs': probs, 'inference_ms': inference_ms, 'skipped': skipped,
+               'decided_by': decided_by}
+
+def summarize(total_reads, hits, min_hits=1):
+    """Veredicto de la muestra: patógenos con al menos `min_hits` lecturas positivas."""
+    detected = [name for name, count in hits.items() if count >= min_hits]
+    return {
+        'total_reads': total_reads,
+        'hits': hits,
+        'detected': detected,
+        'diagnosis': "DETECTADO - " + ", ".join(detected) if detected else "NEGATIVO",
+    }
+
+def add_hits(hits, name, pathogens, predicted):
+    """
+    Suma las lecturas positivas de un lote: un modelo binario (`pathogens` None) aporta su
+    clase 1; un modelo panel, un conteo por patógeno (clases 1..K).
+    """
+    if pathogens is None:
+        hits[name] += int(np.sum(predicted == 1))
+    else:
+        counts = np.bincount(predicted, minlength=len(pathogens) + 1)
+        for i, pathogen in enumerate(pathogens):
+            hits[pathogen] += int(counts[i + 1])
+
+def decided_counts(path):
+    """Lecturas por vía de decisión: {'model': n, 'prefilter': n, 'index': n}."""
+    return dict(zip(DECIDED_BY, np.bincount(path, minlength=len(DECIDED_BY)).tolist()))
+
+def screen_batches(batches, engines, min_hits=1, executor=None, prefilter=None, index=None):
+    """
+    Tamizaje de lotes contra todos los motores: cuenta las lecturas positivas por patógeno.
+    Los modelos binarios aportan su clase 1; un modelo panel multi-clase (PanelInference)
+    aporta un conteo por cada uno de sus patógenos (clases 1..K).
+    Retorna summarize(...) más el tiempo de intérprete acumulado por motor
+    (y, con prefiltro o índice, las lecturas por motor que no llegaron al intérprete y la vía
+    que decidió las lecturas de cada motor).
+    """
+    total_reads = 0
+    hits = {}
+    for name, engine in engines.items():
+        for pathogen in getattr(engine, 'pathogens', [name]):
+            hits[pathogen] = 0
+    inference_ms = {name: 0.0 for name in engines}
+    skipped = {}
+    decided = {name: dict.fromkeys(DECIDED_BY, 0) for name in engines}
+
+    for result in classify_batches(batches, engines, executor, prefilter, index):
+        with stage('aggregation'):
+            total_reads += len(result['headers'])
+            for name, probs in result['probs'].items():
+                add_hits(hits, name, getattr(engines[name], 'pathogens', None), np.argmax(probs, axis=1))
+                inference_ms[name] += result['inference_ms'][name]
+            for name, count in result['skipped'].items():
+                skipped[name] = skipped.get(name, 0) + count
+            for name, path in result['decided_by'].items():
+                for via, count in decided_counts(path).items():
+                    decided[name][via] += count
+
+    summary = summarize(total_reads, hits, min_hits)
+    summary['inference_ms'] = inference_ms
+    if prefilter is not None:
+        summary['prefilter_skipped'] = skipped
+    if prefilter is not None or index is not None:
+        summary['decided_by'] = decided
+    return summary
+
+def classify_file(path, engines, batch_size=DEFAULT_BATCH_SIZE, min_hits=1, executor=None, prefilter=None,
+                  index=None, mate_path=None):
+    """
+    Archivo FASTQ -> diagnóstico. Recorre el archivo en lotes (memoria acotada)
+    y cuenta las lecturas positivas (clase 1) por modelo.
+    Con `mate_path` (R2), `path` es R1: se recorren en paralelo y se cuentan fragmentos.
+    """
+    if mate_path is not None:
+        batches = iter_paired_batches(path, mate_path, batch_size)
+    else:
+        batches = iter_read_batches(path, batch_size)
+    return screen_batches(batches, engines, min_hits, executor, prefilter, index)
+
+def load_engines(targets=None):
+    """Carga los modelos binarios publicados en el registro (data/models/manifest.json)."""
+    from src.registry import ModelRegistry
+
+    registry = ModelRegistry().start(watch=False)
+    engines = {}
+    for target in targets or registry.keys(kind='binary'):
+        if registry.get(target) is not None:
+            engines[target] = registry.get(target)
+    return engines
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Clasifica un archivo FASTQ completo contra el panel de modelos.")
+    parser.add_argument('fastq', type=str)
+    parser.add_argument('--mate', type=str, default=None, help="FASTQ R2 de una corrida pareada (fastq es R1)")
+    parser.add_argument('--targets', type=str, nargs='+', default=None)
+    parser.add_argument('--batch-size', type=int, default=None,
+                        help=f"Lecturas por lote de ingesta (por defecto {DEFAULT_BATCH_SIZE} o el lote del perfil del host)")
+    parser.add_argument('--autotune', action='store_true',
+                        help="Afina hilos y lote de los modelos sin perfil en este host antes de clasificar")
+    parser.add_argument('--profile', type=str, nargs='?', const='profile_pipeline', default=None,
+                        help="Perfila la ejecución y escribe <prefijo>.folded / <prefijo>.txt")
+    parser.add_argument('--memory', action='store_true', help="Reporta pico de RSS y mayores asignaciones por etapa")
+    parser.add_argument('--memory-budget', type=float, default=None, metavar='MB',
+                        help="Falla la ejecución si el RSS supera este presupuesto")
+    parser.add_argument('--no-prefilter', action='store_true',
+                        help="Evalúa todas las lecturas con la CNN (sin el prefiltro de k-mers)")
+    parser.add_argument('--no-index', action='store_true',
+                        help="Sin la vía rápida del índice de minimizers (las coincidencias exactas también van a la CNN)")
+    args = parser.parse_args(argv)
+
+    if args.autotune:
+        from src.autotune import ensure_profile
+
+        ensure_profile(args.targets)
+    engines = load_engines(args.targets)
+    if not engines:
+        print("[Error] No hay modelos disponibles. Entrena primero!")
+        return 1
+    batch_size = args.batch_size or max(DEFAULT_BATCH_SIZE, *(engine.batch_size for engine in engines.values()))
+
+    with ExitStack() as stack:
+        if args.profile:
+            stack.enter_context(profile_run(args.profile))
+        if args.memory or args.memory_budget:
+            stack.enter_context(track_memory(budget_mb=args.memory_budget))
+        try:
+            prefilter = None if args.no_prefilter else default_prefilter()
+            index = None if args.no_index else default_index()
+            summary = classify_file(args.fastq, engines, batch_size, prefilter=prefilter, index=index,
+                                    mate_path=args.mate)
+        except MemoryBudgetExceeded as e:
+            print(f"[Memoria] {e}")
+            return 2
+        except ValueError as e:
+            print(f"[Error] {e}")
+            return 1
+
+    print(json.dumps(summary, indent=2, ensure_ascii=False))
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
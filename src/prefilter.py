@@ -0,0 +1,251 @@
+import argparse
+import os
+import sys
+import threading
+import time
+
+import numpy as np
+
+sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
+
+from src.registry import file_sha256
+
+MODEL_DIR = os.path.join(os.path.dirname(__file__), '..', 'data', 'models')
+PREFILTER_PATH = os.path.join(MODEL_DIR, 'kmer_prefilter.npz')
+
+# k = 15: una lectura de 100 bases aporta 86 k-mers; con 2-5% de mutaciones casi siempre
+# conserva alguno intacto, y una lectura no relacionada rara vez comparte uno por azar
+DEFAULT_K = 15
+
+# ~40 bits por k-mer con 4 funciones hash: ~1e-4 falsos positivos por k-mer consultado
+BITS_PER_KMER = 40
+NUM_HASHES = 4
+
+# Multiplicadores impares de 64 bits (hash multiply-shift), uno por función hash
+HASH_MULTIPLIERS = np.array([
+    0x9E3779B97F4A7C15, 0xC2B2AE3D27D4EB4F, 0x165667B19E3779F9, 0xD6E8FEB86659FD93,
+    0xFF51AFD7ED558CCD, 0xC4CEB9FE1A85EC53, 0x94D049BB133111EB, 0xBF58476D1CE4E5B9,
+], dtype=np.uint64)
+
+def read_kmers(X, k=DEFAULT_K, reverse_complement=False):
+    """
+    K-mers (2 bits por base) de lecturas codificadas (n, L) con los códigos de DNAEncoder
+    (0 = N/padding, 1..4 = ACGT); con `reverse_complement`, los de la hebra complementaria.
+    Retorna: (k-mers (n, L-k+1), válido (n, L-k+1) bool: ventana sin N ni padding)
+    """
+    kmers, valid = kmers_by_position(np.asarray(X), k, reverse_complement)
+    return kmers.T, valid.T
+
+def kmers_by_position(X, k, reverse_complement=False):
+    """
+    Igual que read_kmers pero en layout (L-k+1, n): hash rodante vectorizado, k operaciones
+    en el lugar sobre bloques contiguos y sin bucles por lectura.
+    """
+    n, length = X.shape
+    windows = length - k + 1
+    dtype = np.uint32 if k <= 16 else np.uint64
+    if windows <= 0:
+        return np.zeros((0, n), dtype=dtype), np.zeros((0, n), dtype=bool)
+
+    # Layout transpuesto: cada desplazamiento j es un bloque contiguo de filas
+    by_position = np.ascontiguousarray(X.T)
+    codes = np.clip(by_position - 1, 0, 3).astype(dtype)
+    kmers = np.zeros((windows, n), dtype=dtype)
+    if reverse_complement:
+        # La base j de la ventana ocupa los bits de la posición k-1-j (complemento: 3 - código)
+        high = (3 - codes) << dtype(2 * (k - 1))
+        for j in range(k):
+            kmers >>= dtype(2)
+            kmers |= high[j:j + windows]
+    else:
+        for j in range(k):
+            kmers <<= dtype(2)
+            kmers |= codes[j:j + windows]
+
+    # Ventanas válidas: ninguna base con código 0 dentro de la ventana
+    invalid = np.zeros((length + 1, n), dtype=np.int32)
+    np.cumsum(by_position <= 0, axis=0, out=invalid[1:])
+    valid = (invalid[k:] - invalid[:windows]) == 0
+    return kmers, valid
+
+class KmerBloomFilter:
+    """Filtro de Bloom de k-mers: bits empaquetados (uint8), 2^log2_bits posiciones."""
+    def __init__(self, bits, log2_bits, num_hashes=NUM_HASHES, n_kmers=0):
+        self.bits = bits
+        self.log2_bits = int(log2_bits)
+        self.num_hashes = int(num_hashes)
+        self.n_kmers = int(n_kmers)
+
+    @classmethod
+    def build(cls, kmers, bits_per_kmer=BITS_PER_KMER, num_hashes=NUM_HASHES):
+        kmers = np.unique(np.asarray(kmers).astype(np.uint64))
+        log2_bits = max(10, int(np.ceil(np.log2(max(1, len(kmers)) * bits_per_kmer))))
+        filled = np.zeros(1 << log2_bits, dtype=bool)
+        bloom = cls(None, log2_bits, num_hashes, len(kmers))
+        for h in range(num_hashes):
+            filled[bloom._positions(kmers, h)] = True
+        bloom.bits = np.packbits(filled, bitorder='little')
+        return bloom
+
+    def _positions(self, kmers, h):
+        return ((kmers * HASH_MULTIPLIERS[h]) >> np.uint64(64 - self.log2_bits)).astype(np.intp)
+
+    def _test(self, kmers, h):
+        pos = self._positions(kmers, h)
+        return (self.bits[pos >> 3] >> (pos & 7).astype(np.uint8)) & 1 == 1
+
+    def contains(self, kmers):
+        """Pertenencia (con falsos positivos, sin falsos negativos) de un array 1D de k-mers."""
+        kmers = np.asarray(kmers).astype(np.uint64)
+        # Cada hash se evalúa solo sobre los k-mers que pasaron los anteriores
+        candidates = np.flatnonzero(self._test(kmers, 0))
+        for h in range(1, self.num_hashes):
+            if not len(candidates):
+                break
+            candidates = candidates[self._test(kmers[candidates], h)]
+        present = np.zeros(len(kmers), dtype=bool)
+        present[candidates] = True
+        return present
+
+    @property
+    def fill_ratio(self):
+        return float(np.unpackbits(self.bits).mean())
+
+class KmerPrefilter:
+    """
+    Prefiltro de lecturas antes de la CNN: un filtro de Bloom de k-mers por patógeno,
+    construido desde las referencias de entrenamiento (ambas hebras, así las lecturas se
+    consultan solo en su orientación). Una lectura sin ningún k-mer de los patógenos
+    consultados se declara limpia y no llega al intérprete.
+    Las lecturas sin k-mers válidos (más cortas que k o con N) siempre pasan al modelo.
+    """
+    def __init__(self, filters, k=DEFAULT_K, sha256=''):
+        self.filters = filters
+        self.k = k
+        self.sha256 = sha256  # hash del archivo serializado (clave de caché de resultados)
+
+    def __contains__(self, target):
+        return target in self.filters
+
+    def covers(self, targets):
+        return all(target in self.filters for target in targets)
+
+    def candidates(self, X, targets):
+        """
+        Máscara (n,) de lecturas a evaluar con el modelo de `targets`. Siempre pasan las
+        lecturas sin ventanas válidas (cortas) y las que tienen alguna N dentro de su largo
+        real (código 0 antes de la última base; los 0 finales son padding).
+        """
+        X = np.asarray(X)
+        kmers, valid = kmers_by_position(X, self.k)
+        called = X > 0
+        length = np.where(called.any(axis=1), X.shape[1] - np.argmax(called[:, ::-1], axis=1), 0)
+        keep = ~valid.any(axis=0) | (called.sum(axis=1) < length)
+        flat = kmers[valid]
+        reads = np.broadcast_to(np.arange(len(X)), valid.shape)[valid]
+        for target in targets:
+            hit = self.filters[target].contains(flat)
+            keep[reads[hit]] = True
+            # Los k-mers de lecturas ya aceptadas no se consultan contra el resto del panel
+            pending = ~keep[reads]
+            flat, reads = flat[pending], reads[pending]
+            if not len(flat):
+                break
+        return keep
+
+    # --- Serialización (junto a los modelos) ---
+    def save(self, path=PREFILTER_PATH):
+        arrays = {'k': np.array(self.k), 'targets': np.array(list(self.filters))}
+        for target, bloom in self.filters.items():
+            arrays[f'{target}.bits'] = bloom.bits
+            arrays[f'{target}.meta'] = np.array([bloom.log2_bits, bloom.num_hashes, bloom.n_kmers])
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        tmp = path + '.tmp.npz'
+        np.savez(tmp, **arrays)
+        os.replace(tmp, path)
+        self.sha256 = file_sha256(path)
+        return path
+
+    @classmethod
+    def load(cls, path=PREFILTER_PATH):
+        with np.load(path) as data:
+            filters = {}
+            for target in data['targets'].tolist():
+                log2_bits, num_hashes, n_kmers = data[f'{target}.meta'].tolist()
+                filters[target] = KmerBloomFilter(data[f'{target}.bits'], log2_bits, num_hashes, n_kmers)
+            return cls(filters, int(data['k']), file_sha256(path))
+
+def genome_kmers(sequence, k=DEFAULT_K):
+    """K-mers válidos de un genoma completo (str), de la hebra directa y de la complementaria."""
+    from src.preprocessing.encoder import DNAEncoder
+
+    codes = DNAEncoder(method='integer').lookup[np.frombuffer(sequence.encode('ascii', 'replace'), dtype=np.uint8)]
+    strands = [read_kmers(codes[None, :], k, reverse_complement) for reverse_complement in (False, True)]
+    return np.unique(np.concatenate([kmers[valid] for kmers, valid in strands]))
+
+def build_prefilter(targets=None, k=DEFAULT_K, path=PREFILTER_PATH):
+    """Construye y guarda el prefiltro desde las referencias FASTA de VIRUS_DB."""
+    from src.model.train import VIRUS_DB, load_genome_sequence
+
+    filters = {}
+    for target in targets or VIRUS_DB:
+        try:
+            kmers = genome_kmers(load_genome_sequence(VIRUS_DB[target]['fasta']), k)
+        except FileNotFoundError as e:
+            print(f"[Prefiltro] {target}: {e}")
+            continue
+        filters[target] = KmerBloomFilter.build(kmers)
+        print(f"[Prefiltro] {target}: {len(kmers):,} k-mers (k={k}) -> {filters[target].bits.nbytes / 1024:.0f} KB, "
+              f"ocupación {filters[target].fill_ratio:.1%}")
+    prefilter = KmerPrefilter(filters, k)
+    prefilter.save(path)
+    print(f"[Prefiltro] Guardado en {path}")
+    return prefilter
+
+_default = None
+_default_lock = threading.Lock()
+
+def default_prefilter(path=PREFILTER_PATH):
+    """Prefiltro compartido del proceso (None si no se construyó)."""
+    global _default
+    if _default is None and os.path.exists(path):
+        with _default_lock:
+            if _default is None:
+                _default = KmerPrefilter.load(path)
+    return _default
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Prefiltro de k-mers (Bloom) previo a la CNN.")
+    sub = parser.add_subparsers(dest='command', required=True)
+    build = sub.add_parser('build', help="Construye data/models/kmer_prefilter.npz desde las referencias")
+    build.add_argument('--k', type=int, default=DEFAULT_K)
+    build.add_argument('--output', type=str, default=PREFILTER_PATH)
+    query = sub.add_parser('skip-rate', help="Fracción de lecturas de un FASTQ/FASTA que se saltan la CNN")
+    query.add_argument('reads', type=str)
+    query.add_argument('--targets', type=str, nargs='+', default=None)
+    query.add_argument('--batch-size', type=int, default=4096)
+    args = parser.parse_args(argv)
+
+    if args.command == 'build':
+        build_prefilter(k=args.k, path=args.output)
+        return 0
+
+    from src.ingestion import iter_read_batches
+    from src.preprocessing.encoder import DNAEncoder
+
+    prefilter = KmerPrefilter.load()
+    targets = args.targets or list(prefilter.filters)
+    encoder = DNAEncoder(method='integer', max_length=100)
+    total = kept = 0
+    start = time.perf_counter()
+    for _, seqs in iter_read_batches(args.reads, args.batch_size):
+        keep = prefilter.candidates(encoder.encode_batch(seqs), targets)
+        total += len(keep)
+        kept += int(keep.sum())
+    elapsed = time.perf_counter() - start
+    print(f"[Prefiltro] {total:,} lecturas | saltan la CNN {total - kept:,} ({(total - kept) / max(total, 1):.1%}) | "
+          f"{total / elapsed:,.0f} lecturas/s (codificación + prefiltro)")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -13,6 +13,11 @@ class DNAEncoder:
         self.method = method
         self.max_length = max_length
         self.mapping = {'A': 1, 'C': 2, 'G': 3, 'T': 4, 'N': 0}
+        # Tabla byte -> código para la codificación vectorizada (mayúsculas y minúsculas)
+        self.lookup = np.zeros(256, dtype=np.int8)
+        for base, code in self.mapping.items():
+            self.lookup[ord(base)] = code
+            self.lookup[ord(base.lower())] = code
 
     def encode(self, sequence):
         """
@@ -30,6 +35,25 @@ class DNAEncoder:
         else:
             raise ValueError(f"Método {self.method} no soportado aún.")
 
+    def encode_batch(self, sequences):
+        """
+        Codifica una lista de secuencias en un solo array (n, max_length), vectorizado con NumPy.
+        Equivalente a aplicar encode() a cada secuencia.
+        """
+        length = self.max_length
+        raw = b''.join(
+            seq.strip().encode('ascii', 'replace')[:length].ljust(length, b'\0') for seq in sequences
+        )
+        codes = self.lookup[np.frombuffer(raw, dtype=np.uint8)].reshape(len(sequences), length)
+
+        if self.method == 'integer':
+            return codes
+        elif self.method == 'onehot':
+            # Código 0 (padding / N) -> vector nulo; 1..4 -> A, C, G, T
+            return np.eye(5, dtype=np.float32)[codes][:, :, 1:]
+        else:
+            raise ValueError(f"Método {self.method} no soportado aún.")
+
     def _integer_encoding(self, seq):
         # Convertir a lista de enteros, pad con 0 si es necesario
         encoded = [self.mapping.get(base, 0) for base in seq]
@@ -0,0 +1,197 @@
+import os
+import sys
+import threading
+import time
+from collections import Counter
+from contextlib import contextmanager
+
+# Observadores de etapas por hilo (profiler, medición de memoria, etc.)
+_local = threading.local()
+
+# Etapas estándar del pipeline de clasificación
+STAGES = ('ingestion', 'encoding', 'prefilter', 'index', 'interpreter', 'aggregation', 'persistence', 'django_rendering')
+
+@contextmanager
+def stage(name):
+    """
+    Marca una etapa del pipeline. Sin observadores registrados en el hilo actual
+    el costo es una sola consulta a thread-local.
+    """
+    observers = getattr(_local, 'observers', None)
+    if not observers:
+        yield
+        return
+    for observer in observers:
+        observer.stage_enter(name)
+    try:
+        yield
+    finally:
+        for observer in reversed(observers):
+            observer.stage_exit(name)
+
+def add_observer(observer):
+    if not hasattr(_local, 'observers'):
+        _local.observers = []
+    _local.observers.append(observer)
+
+def remove_observer(observer):
+    observers = getattr(_local, 'observers', [])
+    if observer in observers:
+        observers.remove(observer)
+
+class StageTimer:
+    """
+    Observador de etapas que mide tiempo de pared exclusivo por etapa (una etapa anidada
+    descuenta su duración de la etapa padre) y la duración de cada llamada (acotado a
+    `max_spans` por etapa, e.g. una entrada por lote de 'interpreter').
+    """
+    def __init__(self, max_spans=256):
+        self.max_spans = max_spans
+        self.totals = {}
+        self.calls = Counter()
+        self.spans = {}
+        self._stack = []
+        self._depth = 0
+
+    def stage_enter(self, name):
+        self._stack.append([name, time.perf_counter(), 0.0])
+
+    def stage_exit(self, name):
+        name, started, children = self._stack.pop()
+        elapsed = time.perf_counter() - started
+        self.totals[name] = self.totals.get(name, 0.0) + elapsed - children
+        self.calls[name] += 1
+        if self._stack:
+            self._stack[-1][2] += elapsed
+        spans = self.spans.setdefault(name, [])
+        if len(spans) < self.max_spans:
+            spans.append(elapsed * 1000)
+
+    def ms(self, name):
+        return self.totals.get(name, 0.0) * 1000
+
+    def __enter__(self):
+        # Reentrante: bloques anidados del mismo cronómetro no duplican el registro
+        if not self._depth:
+            add_observer(self)
+        self._depth += 1
+        return self
+
+    def __exit__(self, *exc):
+        self._depth -= 1
+        if not self._depth:
+            remove_observer(self)
+
+def _frame_label(code):
+    return f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})"
+
+class SamplingProfiler:
+    """
+    Profiler por muestreo del hilo que lo inicia: un hilo auxiliar toma el stack cada
+    `interval` segundos y lo atribuye a la etapa activa del pipeline (ver stage()).
+    El costo no depende del número de llamadas, solo de la frecuencia de muestreo.
+    """
+    def __init__(self, interval=0.005, max_depth=64):
+        self.interval = interval
+        self.max_depth = max_depth
+        self.samples = Counter()
+        self.stage_samples = Counter()
+        self._stages = []
+        self._thread_id = None
+        self._sampler = None
+        self._stop = threading.Event()
+        self.wall_seconds = 0.0
+
+    # --- Observador de etapas ---
+    def stage_enter(self, name):
+        self._stages.append(name)
+
+    def stage_exit(self, name):
+        if self._stages:
+            self._stages.pop()
+
+    # --- Control ---
+    def start(self):
+        self._thread_id = threading.get_ident()
+        self._started = time.perf_counter()
+        add_observer(self)
+        self._sampler = threading.Thread(target=self._run, name='edgegen-profiler', daemon=True)
+        self._sampler.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+        self._sampler.join()
+        remove_observer(self)
+        self.wall_seconds = time.perf_counter() - self._started
+        return self
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            frame = sys._current_frames().get(self._thread_id)
+            if frame is None:
+                continue
+            stack = []
+            while frame is not None and len(stack) < self.max_depth:
+                stack.append(_frame_label(frame.f_code))
+                frame = frame.f_back
+            # El hilo perfilado puede cerrar su última etapa entre la comprobación y el acceso
+            try:
+                current = self._stages[-1]
+            except IndexError:
+                current = 'other'
+            stack.append(current)
+            self.samples[';'.join(reversed(stack))] += 1
+            self.stage_samples[current] += 1
+
+    # --- Reportes ---
+    def write_collapsed(self, path):
+        """Formato collapsed-stack (flamegraph.pl, speedscope, inferno): 'etapa;f1;f2 N'"""
+        with open(path, 'w') as f:
+            for stack, count in self.samples.most_common():
+                f.write(f"{stack} {count}\n")
+        return path
+
+    def hotspots(self, top=15):
+        """Funciones con más muestras propias (hoja del stack)."""
+        own = Counter()
+        for stack, count in self.samples.items():
+            own[stack.rsplit(';', 1)[-1]] += count
+        return own.most_common(top)
+
+    def summary(self, top=15):
+        total = sum(self.samples.values()) or 1
+        lines = [f"Profile: {total} muestras cada {self.interval * 1000:.1f} ms ({self.wall_seconds:.2f} s de pared)", "",
+                 "Tiempo por etapa:"]
+        for name, count in self.stage_samples.most_common():
+            lines.append(f"  {name:<20} {count / total * 100:6.1f}%")
+        lines += ["", f"Top {top} hotspots (tiempo propio):"]
+        for label, count in self.hotspots(top):
+            lines.append(f"  {count / total * 100:6.1f}%  {label}")
+        return "\n".join(lines) + "\n"
+
+@contextmanager
+def profile_run(output_prefix, interval=0.005, top=15, verbose=True):
+    """
+    Perfila el bloque y escribe <prefijo>.folded (flamegraph) y <prefijo>.txt (resumen top-N).
+    """
+    os.makedirs(os.path.dirname(os.path.abspath(output_prefix)), exist_ok=True)
+    profiler = SamplingProfiler(interval=interval)
+    profiler.start()
+    try:
+        yield profiler
+    finally:
+        profiler.stop()
+        profiler.write_collapsed(output_prefix + '.folded')
+        summary = profiler.summary(top)
+        with open(output_prefix + '.txt', 'w') as f:
+            f.write(summary)
+        if verbose:
+            print(summary)
+            print(f"[Profile] Flamegraph: {output_prefix}.folded | Resumen: {output_prefix}.txt")
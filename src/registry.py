@@ -0,0 +1,299 @@
+import argparse
+import fcntl
+import hashlib
+import json
+import os
+import sys
+import tempfile
+import threading
+import time
+from contextlib import contextmanager
+
+import numpy as np
+
+sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
+
+MODEL_DIR = os.path.join(os.path.dirname(__file__), '..', 'data', 'models')
+MANIFEST_PATH = os.path.join(MODEL_DIR, 'manifest.json')
+MANIFEST_VERSION = 1
+
+def file_sha256(path):
+    hasher = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1 << 20), b''):
+            hasher.update(chunk)
+    return hasher.hexdigest()
+
+def write_atomic(path, data):
+    """Escribe `data` (bytes) en un temporal del mismo directorio y lo renombra: nunca se lee a medias."""
+    directory = os.path.dirname(os.path.abspath(path))
+    os.makedirs(directory, exist_ok=True)
+    fd, tmp = tempfile.mkstemp(dir=directory, prefix='.tmp-')
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            f.write(data)
+        os.replace(tmp, path)
+    except BaseException:
+        if os.path.exists(tmp):
+            os.remove(tmp)
+        raise
+
+def load_manifest(manifest_path=MANIFEST_PATH):
+    """Manifest del registro: {'version', 'models': {clave: entrada}}; vacío si no existe."""
+    if not os.path.exists(manifest_path):
+        return {'version': MANIFEST_VERSION, 'models': {}}
+    with open(manifest_path) as f:
+        return json.load(f)
+
+@contextmanager
+def _locked_manifest(manifest_path):
+    """Lectura-modificación-escritura del manifest bajo lock (entrenamientos en paralelo)."""
+    with open(manifest_path + '.lock', 'w') as lock:
+        fcntl.flock(lock, fcntl.LOCK_EX)
+        manifest = load_manifest(manifest_path)
+        yield manifest
+        write_atomic(manifest_path, json.dumps(manifest, indent=2).encode())
+
+def model_input_spec(model_path, buckets=None):
+    """
+    Forma y tipo de la entrada del modelo, leídos del flatbuffer TFLite. Un modelo de longitud
+    dinámica se registra con length None y sus buckets de longitud.
+    """
+    import tensorflow as tf
+
+    details = tf.lite.Interpreter(model_path=model_path).get_input_details()[0]
+    spec = {'length': int(details['shape'][-1]), 'dtype': np.dtype(details['dtype']).name, 'encoding': 'integer'}
+    if int(details['shape_signature'][-1]) == -1:
+        from src.inference import LENGTH_BUCKETS
+
+        spec.update(length=None, buckets=list(buckets or LENGTH_BUCKETS))
+    return spec
+
+def register_model(key, model_path, name, kind='binary', classes=None, validation=None,
+                   manifest_path=MANIFEST_PATH, buckets=None):
+    """
+    Agrega o actualiza una entrada del manifest (hash de contenido, entrada y métricas).
+    Los servidores que observan el manifest cargan el modelo nuevo en segundo plano.
+    """
+    entry = {
+        'name': name,
+        'path': os.path.relpath(os.path.abspath(model_path), os.path.dirname(os.path.abspath(manifest_path))),
+        'sha256': file_sha256(model_path),
+        'kind': kind,
+        'classes': classes or ['background', key],
+        'input': model_input_spec(model_path, buckets),
+        'validation': validation,
+        'registered_at': time.strftime('%Y-%m-%dT%H:%M:%S'),
+    }
+    with _locked_manifest(manifest_path) as manifest:
+        previous = manifest['models'].get(key, {})
+        if validation is None and previous.get('sha256') == entry['sha256']:
+            entry['validation'] = previous.get('validation')
+        manifest['models'][key] = entry
+    return entry
+
+def update_validation(results, manifest_path=MANIFEST_PATH):
+    """Guarda las métricas de validación ({clave: resultado de evaluate_model}) en el manifest."""
+    with _locked_manifest(manifest_path) as manifest:
+        for key, result in results.items():
+            entry = manifest['models'].get(key)
+            if entry is None:
+                continue
+            entry['validation'] = {
+                'accuracy': result['kpis']['accuracy'],
+                'sensitivity': result['kpis']['sensitivity'],
+                'specificity': result['kpis']['specificity'],
+                'passes_gates': result['passes_gates'],
+                'n_windows': result['n_windows'],
+            }
+
+def build_manifest(manifest_path=MANIFEST_PATH):
+    """Registra los modelos de VIRUS_DB (y el panel, si existe) presentes en data/models."""
+    from src.model.train import PANEL_CLASSES, PANEL_FILENAME, VIRUS_DB
+
+    model_dir = os.path.dirname(os.path.abspath(manifest_path))
+    for key, info in VIRUS_DB.items():
+        path = os.path.join(model_dir, info['filename'])
+        if os.path.exists(path):
+            register_model(key, path, info['name'], manifest_path=manifest_path)
+    panel_path = os.path.join(model_dir, PANEL_FILENAME)
+    if os.path.exists(panel_path):
+        register_model('panel', panel_path, 'Panel', kind='panel', classes=PANEL_CLASSES, manifest_path=manifest_path)
+    return load_manifest(manifest_path)
+
+class ModelRegistry:
+    """
+    Motores de inferencia definidos por el manifest. Un hilo observa el manifest y, ante
+    cambios, carga y calienta los modelos nuevos en segundo plano; luego reemplaza la
+    instantánea de motores de una sola vez (asignación atómica). Las peticiones leen
+    siempre una instantánea completa: nunca esperan una carga ni ven un intérprete a medias.
+    Un modelo que falla al cargar conserva la versión anterior y se reintenta más tarde.
+    """
+    def __init__(self, manifest_path=MANIFEST_PATH, interval=2.0, retry_interval=30.0, loader=None):
+        self.manifest_path = manifest_path
+        self.interval = interval
+        self.retry_interval = retry_interval
+        self.loader = loader or self._load_engine
+        self._engines = {}      # clave -> motor (instantánea inmutable)
+        self._entries = {}      # clave -> entrada del manifest cargada
+        self.errors = {}
+        self.loaded_at = {}
+        self._manifest_stamp = None
+        self._last_attempt = 0.0
+        self._reload_lock = threading.Lock()
+        self._stop = threading.Event()
+        self._watcher = None
+
+    # --- Consulta (sin bloqueo) ---
+    def get(self, key):
+        return self._engines.get(key)
+
+    def entry(self, key):
+        return self._entries.get(key)
+
+    def keys(self, kind=None):
+        return [k for k, e in self._entries.items() if kind is None or e.get('kind') == kind]
+
+    def status(self):
+        """Estado por modelo: entrada publicada, momento de carga y último error (si lo hay)."""
+        status = {}
+        for key, entry in self._entries.items():
+            status[key] = {
+                'name': entry['name'],
+                'kind': entry.get('kind'),
+                'sha256': entry['sha256'],
+                'input': entry.get('input'),
+                'validation': entry.get('validation'),
+                'loaded_at': self.loaded_at.get(key),
+                'error': self.errors.get(key),
+            }
+        for key, error in self.errors.items():
+            status.setdefault(key, {'loaded_at': None, 'error': error})
+        return status
+
+    # --- Carga ---
+    def _load_engine(self, entry, path):
+        from src.inference import EdgeInference, PanelInference
+
+        spec = entry.get('input', {})
+        engine_cls = PanelInference if entry.get('kind') == 'panel' else EdgeInference
+        engine = engine_cls(model_path=path, buckets=spec.get('buckets'))
+        length = None if engine.buckets else int(engine.input_details[0]['shape'][-1])
+        expected = spec.get('length', length)
+        if length != expected:
+            raise ValueError(f"Entrada del modelo ({length or 'dinámica'}) no coincide con el manifest ({expected})")
+        # Calentamiento: asigna tensores para el lote del motor (el del perfil del host) y ejecuta
+        # una invocación (por bucket, del mayor al menor: el intérprete reserva memoria una sola
+        # vez) antes de publicar el motor
+        for width in sorted(engine.buckets or [length], reverse=True):
+            engine.predict_encoded(np.ones((engine.batch_size, width), dtype=np.int8))
+        return engine
+
+    def _stamp(self):
+        try:
+            stat = os.stat(self.manifest_path)
+            return (stat.st_mtime_ns, stat.st_size)
+        except FileNotFoundError:
+            return None
+
+    def reload(self):
+        """Relee el manifest y publica una nueva instantánea. Retorna las claves (re)cargadas."""
+        with self._reload_lock:
+            self._manifest_stamp = self._stamp()
+            self._last_attempt = time.monotonic()
+            try:
+                manifest = load_manifest(self.manifest_path)
+            except (OSError, ValueError) as e:
+                self.errors['manifest'] = str(e)
+                return []
+            self.errors.pop('manifest', None)
+
+            base = os.path.dirname(os.path.abspath(self.manifest_path))
+            engines = dict(self._engines)
+            entries = dict(self._entries)
+            changed = []
+            for key, entry in manifest.get('models', {}).items():
+                current = self._entries.get(key)
+                if current and current['sha256'] == entry['sha256'] and key in self._engines:
+                    entries[key] = entry  # metadatos (e.g. métricas) actualizados, mismo modelo
+                    continue
+                path = os.path.join(base, entry['path'])
+                try:
+                    if file_sha256(path) != entry['sha256']:
+                        raise ValueError(f"Hash de {entry['path']} no coincide con el manifest")
+                    engines[key] = self.loader(entry, path)
+                    entries[key] = entry
+                    self.loaded_at[key] = time.strftime('%Y-%m-%dT%H:%M:%S')
+                    self.errors.pop(key, None)
+                    changed.append(key)
+                except Exception as e:
+                    # Se conserva la versión anterior (si la hay) y se reintenta más tarde
+                    self.errors[key] = str(e)
+                    print(f"[Registry] Error cargando {key}: {e}")
+
+            for key in set(engines) - set(manifest.get('models', {})):
+                engines.pop(key)
+                entries.pop(key, None)
+                self.loaded_at.pop(key, None)
+                changed.append(key)
+            for key in set(self.errors) - set(manifest.get('models', {})) - {'manifest'}:
+                self.errors.pop(key)
+
+            # Publicación atómica: las peticiones ven la instantánea anterior o la nueva completa
+            self._entries = entries
+            self._engines = engines
+            if changed:
+                print(f"[Registry] Modelos publicados: {sorted(changed)}")
+            return changed
+
+    # --- Observador ---
+    def start(self, watch=True):
+        """Carga inicial (al arrancar el proceso) y, con `watch`, el hilo observador."""
+        self.reload()
+        if watch and self._watcher is None:
+            self._watcher = threading.Thread(target=self._run, name='edgegen-registry', daemon=True)
+            self._watcher.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+        if self._watcher is not None:
+            self._watcher.join()
+            self._watcher = None
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            retry = self.errors and time.monotonic() - self._last_attempt > self.retry_interval
+            if self._stamp() != self._manifest_stamp or retry:
+                self.reload()
+
+_default = None
+_default_lock = threading.Lock()
+
+def default_registry():
+    """Registro compartido del proceso (se inicia en el primer uso; en producción, desde wsgi.py)."""
+    global _default
+    if _default is None:
+        with _default_lock:
+            if _default is None:
+                _default = ModelRegistry().start()
+    return _default
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Registro de modelos (data/models/manifest.json).")
+    sub = parser.add_subparsers(dest='command', required=True)
+    sub.add_parser('build', help="Registra los modelos de VIRUS_DB y el panel presentes en data/models")
+    sub.add_parser('show', help="Muestra el manifest")
+    args = parser.parse_args(argv)
+
+    manifest = build_manifest() if args.command == 'build' else load_manifest()
+    for key, entry in manifest['models'].items():
+        validation = entry.get('validation') or {}
+        accuracy = f"{validation['accuracy'] * 100:.2f}%" if 'accuracy' in validation else "-"
+        length = entry['input']['length'] or '/'.join(map(str, entry['input'].get('buckets', [])))
+        print(f"{key:<10} | {entry['kind']:<6} | {entry['path']:<24} | {entry['sha256'][:12]} | "
+              f"in {length}x{entry['input']['dtype']} | acc {accuracy}")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,155 +1,336 @@
 import os
 import sys
+import json
+import time
+import argparse
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
 import numpy as np
-import tensorflow as tf
-from sklearn.metrics import confusion_matrix, accuracy_score, classification_report
 
 # Add src to path
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
 
-from src.inference import EdgeInference
-from src.model.train import VIRUS_DB
-import random
-
-def generate_batch(signature, count, mutation_rate=0.02):
-    """Genera un lote de secuencias con mutaciones leves sobre una firma base."""
-    batch = []
-    bases = ['A','C','G','T']
-    sig_len = len(signature)
-    
-    for _ in range(count):
-        # Mutar
-        seq_list = list(signature)
-        num_mutations = int(sig_len * mutation_rate)
-        for _ in range(num_mutations):
-            idx = random.randint(0, sig_len-1)
-            seq_list[idx] = random.choice(bases)
-        
-        # Tomar un fragmento aleatorio de 100bp (o rellenar)
-        if sig_len > 100:
-            start = random.randint(0, sig_len - 100)
-            final_seq = "".join(seq_list[start:start+100])
+from src.model.train import VIRUS_DB, MODEL_DIR, load_genome_sequence
+from src.model.evaluation import ACCURACY_GATE, SPECIFICITY_GATE, binary_kpis, passes_gates
+from src.minimizer_index import INDEX_DIR, MinimizerIndex
+from src.prefilter import PREFILTER_PATH, KmerPrefilter
+from src.preprocessing.encoder import DNAEncoder
+from src.registry import MANIFEST_PATH, update_validation
+
+REPORT_PATH = os.path.join(MODEL_DIR, 'validation_report.json')
+
+# Grupos del set de prueba (para el análisis de falsos positivos)
+GROUP_TARGET, GROUP_DECOY, GROUP_NOISE = 0, 1, 2
+
+# Mínimo de ventanas: al menos una por grupo (con menos, KPIs y percentiles quedan sin datos)
+MIN_WINDOWS = 3
+
+def encode_genome(sequence):
+    """Codifica un genoma completo (str) a un array int8 con los códigos de DNAEncoder."""
+    lookup = DNAEncoder(method='integer').lookup
+    return lookup[np.frombuffer(sequence.encode('ascii', 'replace'), dtype=np.uint8)]
+
+def sample_windows(genome_codes, count, rng, length=100, mutation_rate=0.02):
+    """
+    Extrae `count` ventanas aleatorias de `length` bases de un genoma codificado
+    y aplica mutaciones puntuales con probabilidad `mutation_rate` por base (vectorizado).
+    """
+    if len(genome_codes) < length:
+        genome_codes = np.pad(genome_codes, (0, length - len(genome_codes)))
+    starts = rng.integers(0, len(genome_codes) - length + 1, size=count)
+    windows = genome_codes[starts[:, None] + np.arange(length)]
+
+    mutate = rng.random(windows.shape) < mutation_rate
+    windows[mutate] = rng.integers(1, 5, size=int(mutate.sum()), dtype=np.int8)
+    return windows
+
+def build_test_set(target_virus, n_windows=100_000, seed=0, length=100):
+    """
+    Set de prueba fresco (no usado en training), por tercios:
+    Target (clase 1), Decoy = otros virus de VIRUS_DB (clase 0), Ruido aleatorio (clase 0).
+    Retorna: (X (n, length) int8, y (n,), grupo (n,))
+    """
+    rng = np.random.default_rng(seed)
+    n_target = n_windows // 3
+    n_decoy = n_windows // 3
+    n_noise = n_windows - n_target - n_decoy
+
+    target = encode_genome(load_genome_sequence(VIRUS_DB[target_virus]['fasta']))
+    decoys = []
+    for k, v in VIRUS_DB.items():
+        if k != target_virus:
+            try:
+                decoys.append(encode_genome(load_genome_sequence(v['fasta'])))
+            except FileNotFoundError:
+                pass
+
+    parts = [sample_windows(target, n_target, rng, length)]
+    if decoys:
+        # Repartir los decoys entre los genomas disponibles
+        counts = np.bincount(rng.integers(0, len(decoys), size=n_decoy), minlength=len(decoys))
+        parts += [sample_windows(g, int(c), rng, length) for g, c in zip(decoys, counts)]
+    else:
+        n_noise += n_decoy
+        n_decoy = 0
+    parts.append(rng.integers(1, 5, size=(n_noise, length), dtype=np.int8))
+
+    X = np.concatenate(parts).astype(np.int8)
+    group = np.repeat([GROUP_TARGET, GROUP_DECOY, GROUP_NOISE], [n_target, n_decoy, n_noise])
+    y = (group == GROUP_TARGET).astype(np.int8)
+    return X, y, group
+
+def evaluate_prefilter(engine, prefilter, target_virus, X, y_true, group, y_pred, batch_size, inference_s):
+    """
+    Impacto del prefiltro de k-mers sobre el mismo set de prueba: lecturas que se saltan la CNN
+    (global y por grupo), KPIs con las lecturas saltadas como clase 0, verdaderos positivos
+    perdidos y speedup de extremo a extremo (prefiltro + CNN solo sobre lo que pasa vs CNN completa).
+    """
+    keep = np.empty(len(X), dtype=bool)
+    start = time.perf_counter()
+    for i in range(0, len(X), batch_size):
+        keep[i:i + batch_size] = prefilter.candidates(X[i:i + batch_size], [target_virus])
+    prefilter_s = time.perf_counter() - start
+
+    kept = X[keep]
+    kept_ms = 0.0
+    for i in range(0, len(kept), batch_size):
+        kept_ms += engine.predict_encoded(kept[i:i + batch_size], batch_size=batch_size)[1]
+    filtered_s = prefilter_s + kept_ms / 1000
+
+    y_filtered = np.where(keep, y_pred, 0)
+    kpis = binary_kpis(y_true, y_filtered)
+    skip_rate = lambda mask: float(1 - keep[mask].mean()) if mask.any() else 0.0
+    return {
+        'skip_rate': skip_rate(np.ones(len(X), dtype=bool)),
+        'skip_rate_by_group': {
+            'target': skip_rate(group == GROUP_TARGET),
+            'decoy': skip_rate(group == GROUP_DECOY),
+            'noise': skip_rate(group == GROUP_NOISE),
+        },
+        'kpis': kpis,
+        'passes_gates': passes_gates(kpis),
+        'lost_true_positives': int(np.sum((y_pred == 1) & (y_true == 1) & ~keep)),
+        'sensitivity_delta': kpis['sensitivity'] - binary_kpis(y_true, y_pred)['sensitivity'],
+        'prefilter_us_per_read': prefilter_s * 1e6 / len(X),
+        'seconds': filtered_s,
+        'speedup': inference_s / filtered_s if filtered_s > 0 else 0.0,
+    }
+
+def evaluate_index(engine, index, target_virus, X, y_true, group, y_pred, batch_size, inference_s):
+    """
+    Impacto de la vía rápida del índice de minimizers: lecturas que decide sin la CNN (por grupo),
+    llamadas del índice sobre lecturas no objetivo, KPIs con esas decisiones y speedup
+    (índice + CNN sobre las lecturas no decididas vs CNN completa).
+    """
+    calls = np.empty(len(X), dtype=np.int8)
+    start = time.perf_counter()
+    for i in range(0, len(X), batch_size):
+        calls[i:i + batch_size] = index.classify(X[i:i + batch_size], [target_virus])
+    index_s = time.perf_counter() - start
+    decided = calls > 0
+
+    pending = X[~decided]
+    pending_ms = 0.0
+    for i in range(0, len(pending), batch_size):
+        pending_ms += engine.predict_encoded(pending[i:i + batch_size], batch_size=batch_size)[1]
+    fast_s = index_s + pending_ms / 1000
+
+    kpis = binary_kpis(y_true, np.where(decided, 1, y_pred))
+    decided_rate = lambda mask: float(decided[mask].mean()) if mask.any() else 0.0
+    return {
+        'decided_rate': decided_rate(np.ones(len(X), dtype=bool)),
+        'decided_rate_by_group': {
+            'target': decided_rate(group == GROUP_TARGET),
+            'decoy': decided_rate(group == GROUP_DECOY),
+            'noise': decided_rate(group == GROUP_NOISE),
+        },
+        'false_calls': int(np.sum(decided & (y_true == 0))),
+        'kpis': kpis,
+        'passes_gates': passes_gates(kpis),
+        'index_us_per_read': index_s * 1e6 / len(X),
+        'seconds': fast_s,
+        'speedup': inference_s / fast_s if fast_s > 0 else 0.0,
+    }
+
+def evaluate_model(target_virus, model_path, n_windows=100_000, batch_size=1024, seed=0,
+                   prefilter_path=PREFILTER_PATH, index_dir=INDEX_DIR):
+    """
+    Valida un modelo binario con inferencia por lotes.
+    Retorna un dict serializable: KPIs, matriz de confusión, falsos positivos por grupo,
+    throughput y percentiles de latencia (por lote y por lectura). Si existe el prefiltro
+    de k-mers y cubre el modelo, agrega su impacto ('prefilter'); lo mismo con el índice de
+    minimizers ('index'). El gate exige los KPIs de cada variante.
+    """
+    from src.inference import EdgeInference
+
+    start = time.perf_counter()
+    engine = EdgeInference(model_path=model_path)
+    X, y_true, group = build_test_set(target_virus, n_windows, seed, length=engine.encoder.max_length)
+
+    probs = np.empty((len(X), engine.num_classes), dtype=np.float32)
+    batch_ms = []
+    for i in range(0, len(X), batch_size):
+        probs[i:i + batch_size], ms = engine.predict_encoded(X[i:i + batch_size], batch_size=batch_size)
+        batch_ms.append(ms)
+    batch_ms = np.array(batch_ms)
+
+    y_pred = np.argmax(probs, axis=1)
+    kpis = binary_kpis(y_true, y_pred)
+    false_positive = (y_pred == 1) & (y_true == 0)
+    inference_s = batch_ms.sum() / 1000
+
+    prefilter = None
+    if prefilter_path and os.path.exists(prefilter_path):
+        prefilter = KmerPrefilter.load(prefilter_path)
+        if target_virus in prefilter:
+            prefilter = evaluate_prefilter(engine, prefilter, target_virus, X, y_true, group, y_pred,
+                                           batch_size, inference_s)
+        else:
+            prefilter = None
+
+    index = None
+    if index_dir and os.path.exists(os.path.join(index_dir, 'meta.json')):
+        index = MinimizerIndex.load(index_dir)
+        if target_virus in index:
+            index = evaluate_index(engine, index, target_virus, X, y_true, group, y_pred, batch_size, inference_s)
         else:
-            final_seq = "".join(seq_list).ljust(100, 'N') # Padding simple
-            
-        batch.append(final_seq)
-    return batch
+            index = None
+
+    return {
+        'target': target_virus,
+        'name': VIRUS_DB[target_virus]['name'],
+        'model_path': os.path.abspath(model_path),
+        'n_windows': int(len(X)),
+        'kpis': kpis,
+        'passes_gates': passes_gates(kpis) and all(variant['passes_gates'] for variant in (prefilter, index)
+                                                   if variant is not None),
+        'false_positives': {
+            'decoy': int(np.sum(false_positive & (group == GROUP_DECOY))),
+            'noise': int(np.sum(false_positive & (group == GROUP_NOISE))),
+        },
+        'performance': {
+            'batch_size': batch_size,
+            'reads_per_sec': len(X) / inference_s if inference_s > 0 else 0.0,
+            'batch_latency_ms': {p: float(np.percentile(batch_ms, q)) for p, q in (('p50', 50), ('p95', 95), ('p99', 99))},
+            'per_read_latency_us': float(batch_ms.sum() * 1000 / len(X)),
+            'inference_seconds': inference_s,
+            'total_seconds': time.perf_counter() - start,
+        },
+        'prefilter': prefilter,
+        'index': index,
+    }
+
+def _evaluate_job(job):
+    return evaluate_model(**job)
 
-def evaluate_model(virus_name, model_path, target_signature, decoy_signature=None):
+def validate_all(targets=None, n_windows=100_000, batch_size=1024, workers=None, seed=0):
+    """Evalúa todos los modelos disponibles en paralelo (un proceso por modelo)."""
+    jobs = []
+    for target in targets or VIRUS_DB.keys():
+        model_path = os.path.join(MODEL_DIR, VIRUS_DB[target]['filename'])
+        if not os.path.exists(model_path):
+            print(f"❌ Error: Modelo no encontrado en {model_path}")
+            continue
+        jobs.append({'target_virus': target, 'model_path': model_path,
+                     'n_windows': n_windows, 'batch_size': batch_size, 'seed': seed})
+
+    workers = workers or len(jobs) or 1
+    if workers == 1:
+        results = [_evaluate_job(job) for job in jobs]
+    else:
+        # spawn: TensorFlow no es fork-safe
+        ctx = multiprocessing.get_context('spawn')
+        with ProcessPoolExecutor(max_workers=workers, mp_context=ctx) as pool:
+            results = list(pool.map(_evaluate_job, jobs))
+
+    return {
+        'generated_at': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'gates': {'accuracy': ACCURACY_GATE, 'specificity': SPECIFICITY_GATE},
+        'models': {r['target']: r for r in results},
+        'passed': bool(results) and all(r['passes_gates'] for r in results),
+    }
+
+def print_report(result):
+    kpis, perf = result['kpis'], result['performance']
     print(f"\n{'='*60}")
-    print(f"📊 REPORT DE VALIDACIÓN: {virus_name.upper()}")
+    print(f"📊 REPORT DE VALIDACIÓN: {result['name'].upper()}")
     print(f"{'='*60}")
-    
-    if not os.path.exists(model_path):
-        print(f"❌ Error: Modelo no encontrado en {model_path}")
-        return
-
-    # 1. Cargar Motor
-    try:
-        engine = EdgeInference(model_path=model_path)
-    except Exception as e:
-        print(f"❌ Error cargando modelo: {e}")
-        return
-
-    # 2. Generar Dataset de Prueba (Test Set) - Fresco, no usado en training
-    # Generamos 300 muestras: 100 Target, 100 Decoy (Otro Virus), 100 Ruido
-    print(f"🧪 Generando set de prueba sintético (N=300)...")
-    
-    # Target (Class 1)
-    # X_pos, y_pos = generate_synthetic_data(target_signature, num_samples=100, mutation_rate=0.02)
-    sample_seqs = generate_batch(target_signature, 100)
-    y_pos = np.ones(100) 
-    
-    # Decoy (Class 0 - Hard Negative)
-    if decoy_signature:
-        decoy_seqs = generate_batch(decoy_signature, 100)
-    else:
-        decoy_seqs = ["A"*100] * 100
-    y_decoy = np.zeros(100)
-
-    # Noise (Class 0 - Easy Negative)
-    X_noise = []
-    bases = ['A','C','G','T']
-    for _ in range(100):
-        X_noise.append("".join([random.choice(bases) for _ in range(100)]))
-    y_noise = np.zeros(100)
-
-    # Combinar
-    X_test = sample_seqs + decoy_seqs + X_noise
-    y_true = np.concatenate([y_pos, y_decoy, y_noise])
-    
-    # 3. Inferencia Masiva
-    print(f"⚡ Ejecutando inferencia...")
-    y_pred = []
-    latencies = []
-    
-    for seq in X_test:
-        label_text, conf, lat = engine.predict(seq)
-        latencies.append(lat)
-        # Convertir texto a clase (1 o 0)
-        # inference.py returns "Viral" (1) or "Clean" (0)
-        if "Viral" in label_text:
-            y_pred.append(1)
-        else:
-            y_pred.append(0)
-            
-    y_pred = np.array(y_pred)
-
-    # 4. Cálculo de KPIs
-    tn, fp, fn, tp = confusion_matrix(y_true, y_pred).ravel()
-    
-    sensitivity = tp / (tp + fn) if (tp+fn) > 0 else 0 # Recall
-    specificity = tn / (tn + fp) if (tn+fp) > 0 else 0 
-    accuracy = accuracy_score(y_true, y_pred)
-    avg_latency = np.mean(latencies)
-
-    # 5. Imprimir Reporte
+    print(f"🧪 Set de prueba sintético: N={result['n_windows']:,}")
+
     print(f"\n📈 RENDIMIENTO (KPIs):")
-    print(f"   Accuracy Global:   {accuracy*100:.2f}%  (Objetivo: >95%)")
-    print(f"   Sensibilidad (TP): {sensitivity*100:.2f}%  (Detectar el virus correctamente)")
-    print(f"   Especificidad (TN):{specificity*100:.2f}%  (Rechazar otros virus/ruido)")
-    print(f"   Latencia Promedio: {avg_latency:.2f} ms")
+    print(f"   Accuracy Global:   {kpis['accuracy']*100:.2f}%  (Objetivo: >{ACCURACY_GATE:.0%})")
+    print(f"   Sensibilidad (TP): {kpis['sensitivity']*100:.2f}%  (Detectar el virus correctamente)")
+    print(f"   Especificidad (TN):{kpis['specificity']*100:.2f}%  (Rechazar otros virus/ruido)")
+    print(f"   Throughput:        {perf['reads_per_sec']:,.0f} lecturas/s (lote {perf['batch_size']})")
+    print(f"   Latencia por lote: p50 {perf['batch_latency_ms']['p50']:.2f} ms | "
+          f"p95 {perf['batch_latency_ms']['p95']:.2f} ms | p99 {perf['batch_latency_ms']['p99']:.2f} ms")
 
     print(f"\n🔍 MATRIZ DE CONFUSIÓN DETALLADA:")
-    print(f"   [Verdadero Positivo]: {tp}  (Detectados OK)")
-    print(f"   [Falso Negativo]:     {fn}  (Virus perdidos)")
-    print(f"   [Verdadero Negativo]: {tn}  (Sanos/Otros rechazados OK)")
-    print(f"   [Falso Positivo]:     {fp}  (ALERTAS FALSAS - CRÍTICO)")
-
-    # Análisis de fallos específicos (Decoy vs Ruido)
-    # Los primeros 100 son Target, siguientes 100 Decoy, ultimos 100 Ruido
-    fp_decoy = np.sum(y_pred[100:200])
-    fp_noise = np.sum(y_pred[200:300])
-    
-    if fp > 0:
+    print(f"   [Verdadero Positivo]: {kpis['tp']}  (Detectados OK)")
+    print(f"   [Falso Negativo]:     {kpis['fn']}  (Virus perdidos)")
+    print(f"   [Verdadero Negativo]: {kpis['tn']}  (Sanos/Otros rechazados OK)")
+    print(f"   [Falso Positivo]:     {kpis['fp']}  (ALERTAS FALSAS - CRÍTICO)")
+
+    prefilter = result.get('prefilter')
+    if prefilter:
+        skip = prefilter['skip_rate_by_group']
+        print(f"\n🧬 PREFILTRO DE K-MERS:")
+        print(f"   Saltan la CNN:     {prefilter['skip_rate']*100:.1f}%  (target {skip['target']*100:.2f}% | "
+              f"decoy {skip['decoy']*100:.2f}% | ruido {skip['noise']*100:.2f}%)")
+        print(f"   Sensibilidad:      {prefilter['kpis']['sensitivity']*100:.2f}%  "
+              f"({prefilter['sensitivity_delta']*100:+.2f} pp, {prefilter['lost_true_positives']} TP perdidos)")
+        print(f"   Especificidad:     {prefilter['kpis']['specificity']*100:.2f}%")
+        print(f"   Speedup:           {prefilter['speedup']:.2f}x  ({prefilter['prefilter_us_per_read']:.2f} us/lectura de prefiltro)")
+
+    index = result.get('index')
+    if index:
+        decided = index['decided_rate_by_group']
+        print(f"\n⚡ ÍNDICE DE MINIMIZERS (vía rápida):")
+        print(f"   Decididas sin CNN: {index['decided_rate']*100:.1f}%  (target {decided['target']*100:.2f}% | "
+              f"decoy {decided['decoy']*100:.2f}% | ruido {decided['noise']*100:.2f}%)")
+        print(f"   Sensibilidad:      {index['kpis']['sensitivity']*100:.2f}%  ({index['false_calls']} llamadas falsas)")
+        print(f"   Speedup:           {index['speedup']:.2f}x  ({index['index_us_per_read']:.2f} us/lectura de índice)")
+
+    if kpis['fp'] > 0:
         print(f"\n🕵️ ANÁLISIS DE FALSOS POSITIVOS:")
-        print(f"   Confundió el OTRO VIRUS con este: {fp_decoy} veces")
-        print(f"   Confundió RUIDO con este:         {fp_noise} veces")
-    
+        print(f"   Confundió el OTRO VIRUS con este: {result['false_positives']['decoy']} veces")
+        print(f"   Confundió RUIDO con este:         {result['false_positives']['noise']} veces")
+
     # Veredicto
-    limit_acc = 0.95
-    limit_spec = 0.90
-    
-    if accuracy >= limit_acc and specificity >= limit_spec:
+    if result['passes_gates']:
         print(f"\n✅ ESTADO: APROBADO (Listo para Demo)")
     else:
         print(f"\n⚠️ ESTADO: REQUIERE MEJORA (Re-entrenar)")
 
-def main():
-    base_path = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
-    data_path = os.path.join(base_path, 'data')
-    model_dir = os.path.join(data_path, 'models')
-    
-    # Cargar genomas para test desde la DB compartida
-    covid_sig = VIRUS_DB['covid19']['signature']
-    h3n2_sig = VIRUS_DB['h3n2']['signature']
-    
-    # Evaluar COVID (Target=Covid, Decoy=H3N2)
-    # Target label en display, model path, target sig, decoy sig
-    evaluate_model("SARS-CoV-2", os.path.join(model_dir, 'model_covid.tflite'), covid_sig, h3n2_sig)
-
-    # Evaluar H3N2 (Target=H3N2, Decoy=Covid)
-    evaluate_model("Influenza H3N2", os.path.join(model_dir, 'model_h3n2.tflite'), h3n2_sig, covid_sig)
+def windows_arg(value):
+    n = int(value)
+    if n < MIN_WINDOWS:
+        raise argparse.ArgumentTypeError(f"se necesitan al menos {MIN_WINDOWS} ventanas (una por grupo)")
+    return n
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Validación por lotes de los modelos TFLite (reporte JSON).")
+    parser.add_argument('--target', type=str, nargs='+', choices=list(VIRUS_DB.keys()), default=None)
+    parser.add_argument('--windows', type=windows_arg, default=100_000, help="Tamaño del set de prueba por modelo")
+    parser.add_argument('--batch-size', type=int, default=1024)
+    parser.add_argument('--workers', type=int, default=None, help="Procesos (por defecto: uno por modelo)")
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--output', type=str, default=REPORT_PATH)
+    args = parser.parse_args(argv)
+
+    report = validate_all(args.target, args.windows, args.batch_size, args.workers, args.seed)
+    for result in report['models'].values():
+        print_report(result)
+
+    with open(args.output, 'w') as f:
+        json.dump(report, f, indent=2)
+    print(f"\n[Reporte] {args.output}")
+    if os.path.exists(MANIFEST_PATH):
+        update_validation(report['models'])
+        print(f"[Registry] Métricas de validación guardadas en {MANIFEST_PATH}")
+
+    # Código de salida != 0 si algún modelo no cumple los umbrales (gate de despliegue)
+    return 0 if report['passed'] else 1
 
 if __name__ == "__main__":
-    main()
+    sys.exit(main())
@@ -0,0 +1,234 @@
+import argparse
+import itertools
+import json
+import os
+import sys
+import threading
+import time
+
+sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
+
+from src.ingestion import (is_gzip, iter_batches, iter_decompressed, iter_file_chunks, iter_lines, parse_records,
+                           read_fastq_from)
+from src.minimizer_index import default_index
+from src.pipeline import DECIDED_BY, DEFAULT_BATCH_SIZE, load_engines, screen_batches, summarize
+from src.prefilter import default_prefilter
+from src.registry import write_atomic
+
+# Archivos que produce el secuenciador (MinKNOW/MiSeq): FASTQ planos que crecen o chunks .gz
+WATCH_SUFFIXES = ('.fastq', '.fq', '.fastq.gz', '.fq.gz')
+
+# Checkpoint dentro de la carpeta del run (oculto: no se confunde con un chunk)
+CHECKPOINT_NAME = '.edgegen_watch.json'
+CHECKPOINT_VERSION = 1
+
+POLL_INTERVAL = 5.0
+
+# Un .gz se procesa cuando lleva este tiempo sin modificarse (un miembro gzip a medias no se
+# puede leer); un FASTQ plano se lee en cuanto crece, hasta el último registro completo
+SETTLE_SECONDS = 2.0
+
+# Bytes de FASTQ plano por paso (memoria acotada con archivos grandes)
+SLICE_BYTES = 16 << 20
+
+class RunWatcher:
+    """
+    Clasificación incremental de una carpeta de run mientras el secuenciador escribe.
+    Cada sondeo detecta archivos FASTQ nuevos o que crecieron y clasifica solo las lecturas
+    no vistas (por lotes, con prefiltro e índice como el pipeline). El checkpoint guarda, de
+    forma atómica y en un mismo archivo, el avance por archivo (offset en bytes de los planos,
+    lecturas consumidas de los .gz) junto con los conteos y el veredicto acumulados: un
+    reinicio continúa donde quedó sin volver a procesar ni a contar lecturas.
+    """
+    def __init__(self, run_dir, engines, checkpoint_path=None, batch_size=DEFAULT_BATCH_SIZE, min_hits=1,
+                 prefilter=None, index=None, settle=SETTLE_SECONDS, slice_bytes=SLICE_BYTES):
+        self.run_dir = run_dir
+        self.engines = engines
+        self.checkpoint_path = checkpoint_path or os.path.join(run_dir, CHECKPOINT_NAME)
+        self.batch_size = batch_size
+        self.min_hits = min_hits
+        self.prefilter = prefilter
+        self.index = index
+        self.settle = settle
+        self.slice_bytes = slice_bytes
+        self.state = self._load_checkpoint()
+
+    # --- Checkpoint ---
+    def _fresh_state(self):
+        hits = {pathogen: 0 for name, engine in self.engines.items()
+                for pathogen in getattr(engine, 'pathogens', [name])}
+        return {
+            'version': CHECKPOINT_VERSION,
+            'models': sorted(self.engines),
+            'files': {},
+            'summary': {**summarize(0, hits, self.min_hits),
+                        'decided_by': {name: dict.fromkeys(DECIDED_BY, 0) for name in self.engines}},
+            'first_detected': {},
+            'latency': {'last_s': None, 'mean_s': None, 'max_s': None, 'updates': 0},
+            'updated_at': None,
+        }
+
+    def _load_checkpoint(self):
+        if not os.path.exists(self.checkpoint_path):
+            return self._fresh_state()
+        with open(self.checkpoint_path) as f:
+            state = json.load(f)
+        if state.get('models') != sorted(self.engines):
+            raise ValueError(f"El checkpoint {self.checkpoint_path} se generó con otros modelos "
+                             f"({', '.join(state.get('models', []))}); usa otro --checkpoint o bórralo")
+        return state
+
+    def _save(self):
+        self.state['updated_at'] = time.strftime('%Y-%m-%dT%H:%M:%S')
+        write_atomic(self.checkpoint_path, (json.dumps(self.state, indent=2, ensure_ascii=False) + '\n').encode())
+
+    # --- Sondeo ---
+    def scan(self):
+        """Archivos del run con datos sin procesar, del más antiguo al más reciente: [(ruta relativa, stat)]."""
+        found = []
+        for root, dirs, files in os.walk(self.run_dir):
+            dirs[:] = [d for d in dirs if not d.startswith('.')]
+            for name in files:
+                if name.startswith('.') or not name.endswith(WATCH_SUFFIXES):
+                    continue
+                path = os.path.join(root, name)
+                try:
+                    stat = os.stat(path)
+                except FileNotFoundError:
+                    continue  # renombrado o borrado entre listdir y stat
+                rel = os.path.relpath(path, self.run_dir)
+                seen = self.state['files'].get(rel)
+                if seen is None or stat.st_size != seen['size']:
+                    found.append((stat.st_mtime, rel, stat))
+        return [(rel, stat) for _, rel, stat in sorted(found)]
+
+    def poll(self):
+        """Procesa todo lo nuevo en la carpeta. Retorna un resumen por actualización del veredicto."""
+        updates = []
+        for rel, stat in self.scan():
+            updates.extend(self._process(rel, stat))
+        return updates
+
+    def _process(self, rel, stat):
+        path = os.path.join(self.run_dir, rel)
+        entry = self.state['files'].get(rel, {'offset': 0, 'reads': 0, 'size': 0})
+        with open(path, 'rb') as f:
+            compressed = is_gzip(f.read(2))
+
+        if compressed:
+            if time.time() - stat.st_mtime < self.settle:
+                return []  # aún se está escribiendo: se reintenta en el próximo sondeo
+            # gzip admite miembros concatenados: si el archivo crece, se saltan las lecturas ya contadas
+            records = itertools.islice(parse_records(iter_lines(iter_decompressed(iter_file_chunks(path)))),
+                                       entry['reads'], None)
+            return [self._classify(rel, entry, records, stat.st_size, stat)]
+
+        if stat.st_size < entry['offset']:
+            print(f"[Watch] {rel} se truncó ({stat.st_size} < {entry['offset']} bytes). Se ignora.")
+            self.state['files'][rel] = {**entry, 'size': stat.st_size}
+            self._save()
+            return []
+        updates = []
+        while True:
+            records, offset = read_fastq_from(path, entry['offset'], self.slice_bytes)
+            if not records:
+                break
+            updates.append(self._classify(rel, entry, records, offset, stat))
+            entry = self.state['files'][rel]
+        # Registro a medias al final: se relee cuando el archivo vuelva a crecer
+        self.state['files'][rel] = {**entry, 'size': stat.st_size}
+        self._save()
+        return updates
+
+    def _classify(self, rel, entry, records, offset, stat):
+        result = screen_batches(iter_batches(records, self.batch_size), self.engines, self.min_hits,
+                                prefilter=self.prefilter, index=self.index)
+        summary = self.state['summary']
+        hits = {pathogen: count + result['hits'][pathogen] for pathogen, count in summary['hits'].items()}
+        total_reads = summary['total_reads'] + result['total_reads']
+        # Sin prefiltro ni índice, el modelo decide todas las lecturas
+        decided = result.get('decided_by') or {name: {'model': result['total_reads']} for name in self.engines}
+        for name, counts in decided.items():
+            for via, count in counts.items():
+                summary['decided_by'][name][via] += count
+        self.state['summary'] = {**summarize(total_reads, hits, self.min_hits), 'decided_by': summary['decided_by']}
+        for pathogen in self.state['summary']['detected']:
+            self.state['first_detected'].setdefault(
+                pathogen, {'at': time.strftime('%Y-%m-%dT%H:%M:%S'), 'total_reads': total_reads, 'file': rel})
+
+        # Latencia: desde que el chunk llegó (última escritura del archivo) hasta el veredicto actualizado
+        latency = self.state['latency']
+        latency_s = max(0.0, time.time() - stat.st_mtime)
+        updates = latency['updates'] + 1
+        latency.update(last_s=round(latency_s, 3), updates=updates,
+                       mean_s=round(((latency['mean_s'] or 0.0) * (updates - 1) + latency_s) / updates, 3),
+                       max_s=round(max(latency['max_s'] or 0.0, latency_s), 3))
+
+        self.state['files'][rel] = {'offset': offset, 'reads': entry['reads'] + result['total_reads'],
+                                    'size': stat.st_size}
+        self._save()
+        return {'file': rel, 'reads': result['total_reads'], 'total_reads': total_reads,
+                'diagnosis': self.state['summary']['diagnosis'], 'latency_s': round(latency_s, 3)}
+
+    def run(self, interval=POLL_INTERVAL, stop=None, idle_exit=None):
+        """
+        Sondea la carpeta cada `interval` segundos hasta `stop` (threading.Event) o, con
+        `idle_exit`, hasta pasar ese tiempo sin datos nuevos (fin de la corrida).
+        Retorna el estado final.
+        """
+        stop = stop or threading.Event()
+        last_data = time.monotonic()
+        while True:
+            for update in self.poll():
+                last_data = time.monotonic()
+                print(f"[Watch] {update['file']} +{update['reads']} lecturas | total {update['total_reads']} | "
+                      f"{update['diagnosis']} | latencia {update['latency_s']:.2f} s")
+            if idle_exit is not None and time.monotonic() - last_data >= idle_exit:
+                return self.state
+            if stop.wait(interval):
+                return self.state
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description="Vigila la carpeta de un run de secuenciación y actualiza el diagnóstico a medida que llegan lecturas.")
+    parser.add_argument('run_dir', type=str)
+    parser.add_argument('--targets', type=str, nargs='+', default=None)
+    parser.add_argument('--checkpoint', type=str, default=None, help=f"Por defecto <run_dir>/{CHECKPOINT_NAME}")
+    parser.add_argument('--interval', type=float, default=POLL_INTERVAL, help="Segundos entre sondeos")
+    parser.add_argument('--settle', type=float, default=SETTLE_SECONDS,
+                        help="Segundos sin cambios antes de leer un .gz")
+    parser.add_argument('--batch-size', type=int, default=DEFAULT_BATCH_SIZE)
+    parser.add_argument('--min-hits', type=int, default=1, help="Lecturas positivas para declarar un patógeno")
+    parser.add_argument('--no-prefilter', action='store_true', help="Sin el prefiltro de k-mers")
+    parser.add_argument('--no-index', action='store_true', help="Sin la vía rápida del índice de minimizers")
+    parser.add_argument('--once', action='store_true', help="Procesa lo presente y termina")
+    parser.add_argument('--idle-exit', type=float, default=None, metavar='SECONDS',
+                        help="Termina tras este tiempo sin datos nuevos")
+    args = parser.parse_args(argv)
+
+    if not os.path.isdir(args.run_dir):
+        print(f"[Error] {args.run_dir} no es un directorio")
+        return 1
+    engines = load_engines(args.targets)
+    if not engines:
+        print("[Error] No hay modelos disponibles. Entrena primero!")
+        return 1
+    try:
+        watcher = RunWatcher(args.run_dir, engines, args.checkpoint, args.batch_size, args.min_hits,
+                             None if args.no_prefilter else default_prefilter(),
+                             None if args.no_index else default_index(), args.settle)
+    except ValueError as e:
+        print(f"[Error] {e}")
+        return 1
+
+    print(f"[Watch] Vigilando {args.run_dir} (checkpoint {watcher.checkpoint_path})")
+    try:
+        state = watcher.run(args.interval, idle_exit=0 if args.once else args.idle_exit)
+    except KeyboardInterrupt:
+        state = watcher.state
+    print(json.dumps({**state['summary'], 'first_detected': state['first_detected'], 'latency': state['latency']},
+                     indent=2, ensure_ascii=False))
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
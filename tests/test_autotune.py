@@ -0,0 +1,77 @@
+import json
+import os
+import sys
+import tempfile
+import unittest
+from unittest.mock import patch
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from src import autotune
+from src.benchmark import build_untrained_tflite
+from src.inference import DEFAULT_BATCH_SIZE, EdgeInference
+from src.registry import register_model
+
+class TestAutotune(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.tmp = tempfile.TemporaryDirectory()
+        cls.model_path = build_untrained_tflite(os.path.join(cls.tmp.name, 'model_covid.tflite'), 2)
+        cls.manifest_path = os.path.join(cls.tmp.name, 'manifest.json')
+        register_model('covid19', cls.model_path, 'SARS-CoV-2', manifest_path=cls.manifest_path)
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.tmp.cleanup()
+
+    def setUp(self):
+        self.profile_path = os.path.join(self.tmp.name, 'host.json')
+        env = patch.dict(os.environ, {autotune.PROFILE_ENV: self.profile_path})
+        env.start()
+        self.addCleanup(env.stop)
+        self.addCleanup(lambda: os.path.exists(self.profile_path) and os.remove(self.profile_path))
+
+    def tune(self, **kwargs):
+        return autotune.ensure_profile(manifest_path=self.manifest_path, threads=[1, 2], batch_sizes=[16, 64],
+                                       num_reads=128, repeats=1, **kwargs)
+
+    def test_thread_grid_covers_available_cpus(self):
+        self.assertEqual(autotune.thread_grid(1), [1])
+        self.assertEqual(autotune.thread_grid(4), [1, 2, 4])
+        self.assertEqual(autotune.thread_grid(6), [1, 2, 4, 6])
+
+    def test_engines_load_tuned_configuration_from_host_profile(self):
+        self.assertEqual(EdgeInference(self.model_path).batch_size, DEFAULT_BATCH_SIZE)
+
+        profile = self.tune()
+        (entry,) = profile['models'].values()
+        self.assertEqual(entry['key'], 'covid19')
+        self.assertEqual(len(entry['grid']), 4)
+        self.assertIn(entry['batch_size'], (16, 64))
+        engine = EdgeInference(self.model_path)
+        self.assertEqual((engine.num_threads, engine.batch_size), (entry['num_threads'], entry['batch_size']))
+        # Valores explícitos tienen prioridad sobre el perfil, campo por campo
+        engine = EdgeInference(self.model_path, batch_size=8)
+        self.assertEqual((engine.num_threads, engine.batch_size), (entry['num_threads'], 8))
+        engine = EdgeInference(self.model_path, num_threads=1)
+        self.assertEqual((engine.num_threads, engine.batch_size), (1, entry['batch_size']))
+
+        # Modelos ya afinados no se vuelven a medir (salvo con force)
+        with patch('src.autotune.tune_model') as tune_model:
+            self.tune()
+            tune_model.assert_not_called()
+
+    def test_profile_from_other_hardware_is_ignored(self):
+        self.tune()
+        with open(self.profile_path) as f:
+            profile = json.load(f)
+        profile['host']['cpus'] += 1
+        with open(self.profile_path, 'w') as f:
+            json.dump(profile, f)
+        os.utime(self.profile_path, ns=(0, 0))
+
+        self.assertEqual(autotune.tuned_config(self.model_path), {})
+        self.assertEqual(EdgeInference(self.model_path).batch_size, DEFAULT_BATCH_SIZE)
+
+if __name__ == '__main__':
+    unittest.main()
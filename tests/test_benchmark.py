@@ -0,0 +1,53 @@
+import unittest
+import sys
+import os
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from src.benchmark import compare_results
+
+def _results(**cases):
+    return {'results': {case: {'reads_per_sec': rps} for case, rps in cases.items()}}
+
+class TestBenchmarkCompare(unittest.TestCase):
+    def test_flags_regressions_beyond_threshold(self):
+        baseline = _results(**{'inference_batch@1000': 100_000.0, 'fastq_parse@1000': 1_000_000.0})
+        current = _results(**{'inference_batch@1000': 85_000.0, 'fastq_parse@1000': 950_000.0})
+
+        rows = {r['case']: r for r in compare_results(baseline, current, threshold=0.10)}
+
+        self.assertTrue(rows['inference_batch@1000']['regression'])   # -15%
+        self.assertFalse(rows['fastq_parse@1000']['regression'])      # -5%
+        self.assertAlmostEqual(rows['inference_batch@1000']['change'], -0.15)
+
+    def test_cases_missing_from_current_run_are_regressions(self):
+        baseline = _results(**{'encode_batch@100000': 1.0})
+        (row,) = compare_results(baseline, _results())
+        self.assertTrue(row['missing'])
+        self.assertTrue(row['regression'])
+
+    def test_compare_exits_non_zero_on_missing_case(self):
+        import json
+        import tempfile
+        from unittest.mock import patch
+        from src.benchmark import main
+
+        with tempfile.TemporaryDirectory() as tmp:
+            paths = [os.path.join(tmp, name) for name in ('baseline.json', 'current.json')]
+            for path, results in zip(paths, (_results(a=1.0, b=1.0), _results(a=1.0))):
+                with open(path, 'w') as f:
+                    json.dump(results, f)
+            with patch('sys.stdout'):
+                self.assertEqual(main(['compare', *paths]), 1)
+
+    def test_flags_memory_growth(self):
+        baseline = {'results': {'file_to_diagnosis@1000': {'reads_per_sec': 1.0, 'peak_traced_bytes': 1000}}}
+        current = {'results': {'file_to_diagnosis@1000': {'reads_per_sec': 1.0, 'peak_traced_bytes': 1500}}}
+
+        row = compare_results(baseline, current, threshold=0.10)[0]
+
+        self.assertAlmostEqual(row['memory_change'], 0.5)
+        self.assertTrue(row['regression'])
+
+if __name__ == '__main__':
+    unittest.main()
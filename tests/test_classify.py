@@ -0,0 +1,153 @@
+import unittest
+import numpy as np
+import sys
+import os
+import tempfile
+import gzip
+from unittest import mock
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import pandas as pd
+
+from src.classify import ColumnsSink, CsvSink, classify_reads, load_columns, open_sink
+from src.pipeline import PATH_MODEL
+from tests.test_pipeline import FirstBaseEngine, PolyAEngine
+
+MANIFEST = {'models': {
+    'covid19': {'kind': 'binary', 'classes': ['background', 'covid19']},
+    'panel': {'kind': 'panel', 'classes': ['background', 'covid19', 'h3n2']},
+}}
+
+def write_fastq(path, seqs):
+    opener = gzip.open if path.endswith('.gz') else open
+    with opener(path, 'wt') as f:
+        for i, seq in enumerate(seqs):
+            f.write(f"@read_{i} extra\n{seq}\n+\n{'I' * len(seq)}\n")
+
+class TestSinks(unittest.TestCase):
+    def chunk(self, start, n):
+        return {
+            'read_id': [f'r{i}' for i in range(start, start + n)],
+            'm_class_id': np.arange(n, dtype=np.uint8) % 2,
+            'm_prob': np.linspace(0, 1, n, dtype=np.float32),
+            'm_decided_by': np.zeros(n, dtype=np.uint8),
+        }
+
+    def test_columns_roundtrip(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            sink = ColumnsSink(os.path.join(tmp, 'out'))
+            sink.write(self.chunk(0, 3))
+            sink.write(self.chunk(3, 2))
+            sink.close()
+            columns = load_columns(os.path.join(tmp, 'out'))
+            self.assertEqual(columns['read_id'], ['r0', 'r1', 'r2', 'r3', 'r4'])
+            np.testing.assert_array_equal(columns['m_class_id'], [0, 1, 0, 0, 1])
+            self.assertEqual(columns['m_prob'].dtype, np.float32)
+            self.assertEqual(len(columns['m_decided_by']), 5)
+
+    def test_csv_gz_writes_header_once(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, 'out.csv.gz')
+            sink = CsvSink(path)
+            sink.write(self.chunk(0, 3))
+            sink.write(self.chunk(3, 2))
+            sink.close()
+            frame = pd.read_csv(path)
+            self.assertEqual(len(frame), 5)
+            self.assertEqual(set(frame['m_decided_by']), {'model'})
+
+    def test_open_sink_by_extension(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            sink = open_sink(os.path.join(tmp, 'out.csv'))
+            self.assertIsInstance(sink, CsvSink)
+            sink.close()
+            sink = open_sink(os.path.join(tmp, 'out'), fmt='columns')
+            self.assertIsInstance(sink, ColumnsSink)
+            sink.close()
+
+class TestClassifyReads(unittest.TestCase):
+    def run_classify(self, seqs, output, models, engines, **kwargs):
+        with mock.patch('src.classify.load_manifest', return_value=MANIFEST), \
+                mock.patch('src.classify.load_engines', return_value=engines):
+            input_path = os.path.join(os.path.dirname(output), 'sample.fastq.gz')
+            write_fastq(input_path, seqs)
+            return classify_reads([input_path], output, models, use_prefilter=False, use_index=False, **kwargs)
+
+    def test_per_read_columns_and_summary(self):
+        seqs = ["AAAA", "CCCC", "ACGT", "TTTT", "AGGA"]
+        with tempfile.TemporaryDirectory() as tmp:
+            output = os.path.join(tmp, 'results')
+            summary = self.run_classify(seqs, output, ['covid19'], {'covid19': PolyAEngine()},
+                                        batch_size=2, chunk_reads=2, fmt='columns')
+            columns = load_columns(output)
+
+        self.assertEqual(columns['read_id'], [f'read_{i}' for i in range(5)])
+        np.testing.assert_array_equal(columns['covid19_class_id'], [1, 0, 1, 0, 1])
+        np.testing.assert_array_equal(columns['covid19_prob'], [1, 0, 1, 0, 1])
+        self.assertTrue(np.all(columns['covid19_decided_by'] == PATH_MODEL))
+        self.assertEqual(summary['total_reads'], 5)
+        self.assertEqual(summary['hits'], {'covid19': 3})
+        self.assertEqual(summary['decided_by']['covid19']['model'], 5)
+        self.assertEqual(summary['format'], 'columns')
+
+    def test_panel_gets_one_probability_per_pathogen(self):
+        seqs = ["AAAA", "CCCC", "GGGG"]
+        with tempfile.TemporaryDirectory() as tmp:
+            output = os.path.join(tmp, 'results.csv')
+            summary = self.run_classify(seqs, output, ['panel'], {'panel': FirstBaseEngine()})
+            frame = pd.read_csv(output)
+
+        self.assertEqual(list(frame.columns), ['read_id', 'panel_class_id', 'panel_prob_covid19',
+                                               'panel_prob_h3n2', 'panel_decided_by'])
+        self.assertEqual(frame['panel_class_id'].tolist(), [1, 2, 0])
+        self.assertEqual(summary['hits'], {'covid19': 1, 'h3n2': 1})
+        self.assertEqual(summary['detected'], ['covid19', 'h3n2'])
+
+    def test_paired_runs_write_one_row_per_fragment(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            r1, r2 = os.path.join(tmp, 'R1.fastq'), os.path.join(tmp, 'R2.fastq.gz')
+            write_fastq(r1, ["AAAA", "AAAA", "CCCC"])
+            write_fastq(r2, ["AAAA", "CCCC", "CCCC"])
+            output = os.path.join(tmp, 'results.csv')
+            with mock.patch('src.classify.load_manifest', return_value=MANIFEST), \
+                    mock.patch('src.classify.load_engines', return_value={'covid19': PolyAEngine()}):
+                summary = classify_reads([r1, r2], output, ['covid19'], use_prefilter=False, use_index=False,
+                                         paired=True)
+            frame = pd.read_csv(output)
+
+        self.assertEqual(frame['read_id'].tolist(), ['read_0', 'read_1', 'read_2'])
+        self.assertEqual(frame['covid19_class_id'].tolist(), [1, 0, 0])
+        self.assertEqual(summary['total_reads'], 3)
+        self.assertTrue(summary['paired'])
+
+    def test_unknown_model_is_rejected(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            with self.assertRaises(ValueError):
+                self.run_classify(["AAAA"], os.path.join(tmp, 'out.csv'), ['ebola'], {})
+
+    def test_output_format_is_checked_before_loading_engines(self):
+        with tempfile.TemporaryDirectory() as tmp, mock.patch.dict(sys.modules, {'pyarrow': None}):
+            with mock.patch('src.classify.load_manifest', return_value=MANIFEST), \
+                    mock.patch('src.classify.load_engines') as load_engines:
+                with self.assertRaisesRegex(ValueError, 'pyarrow'):
+                    classify_reads([os.path.join(tmp, 'in.fastq')], os.path.join(tmp, 'out.parquet'), ['covid19'])
+            load_engines.assert_not_called()
+
+    def test_engine_that_fails_to_load_is_an_error(self):
+        from src import classify
+
+        init = (['covid19', 'panel'], False, False)
+        with mock.patch('src.classify.load_engines', return_value={'covid19': PolyAEngine()}):
+            with self.assertRaisesRegex(ValueError, 'panel'):
+                classify._init_worker(*init)
+            # En los workers del pool, el error llega con el primer lote
+            classify._init_pool_worker(*init)
+        try:
+            with self.assertRaisesRegex(ValueError, 'panel'):
+                classify._classify_seqs(["AAAA"])
+        finally:
+            classify._worker.clear()
+
+if __name__ == '__main__':
+    unittest.main()
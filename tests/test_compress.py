@@ -0,0 +1,29 @@
+import unittest
+import sys
+import os
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from src.model.cnn import create_genomic_cnn
+from src.model.compress import compact_filename, estimate_macs, magnitude_prune, sparsity_of
+
+class TestModelCompression(unittest.TestCase):
+    def test_magnitude_prune_reaches_target_sparsity(self):
+        """La poda deja en cero ~50% de los kernels Conv1D/Dense"""
+        model = create_genomic_cnn(filters=(8, 8), dense_units=8)
+        masks = magnitude_prune(model, 0.5)
+
+        self.assertEqual(len(masks), 4)  # 2 Conv1D + 2 Dense
+        self.assertAlmostEqual(sparsity_of(model), 0.5, delta=0.05)
+
+    def test_effective_macs_drop_after_pruning(self):
+        model = create_genomic_cnn(filters=(8, 8), dense_units=8)
+        dense_macs = estimate_macs(model)
+        magnitude_prune(model, 0.75)
+        self.assertLess(estimate_macs(model, nonzero_only=True), dense_macs * 0.3)
+
+    def test_compact_filename(self):
+        self.assertEqual(compact_filename('covid19'), 'model_covid_compact.tflite')
+
+if __name__ == '__main__':
+    unittest.main()
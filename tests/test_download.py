@@ -0,0 +1,162 @@
+import unittest
+import hashlib
+import json
+import sys
+import os
+import tempfile
+import threading
+from unittest import mock
+from http.server import HTTPServer, SimpleHTTPRequestHandler
+from functools import partial
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from src.data import download
+from src.data.download import ChecksumError, fetch, pin, sources, sync
+
+class RangeHandler(SimpleHTTPRequestHandler):
+    """Espejo HTTP local con soporte de Range (http.server no lo implementa)."""
+    requests = []
+
+    def do_GET(self):
+        path = self.translate_path(self.path)
+        if not os.path.isfile(path):
+            self.send_error(404)
+            return
+        with open(path, 'rb') as f:
+            data = f.read()
+        start = 0
+        header = self.headers.get('Range')
+        RangeHandler.requests.append((self.path, header))
+        if header:
+            start = int(header.split('=')[1].rstrip('-'))
+            self.send_response(206)
+            self.send_header('Content-Range', f'bytes {start}-{len(data) - 1}/{len(data)}')
+        else:
+            self.send_response(200)
+        self.send_header('Content-Length', str(len(data) - start))
+        self.end_headers()
+        self.wfile.write(data[start:])
+
+    def log_message(self, *args):
+        pass
+
+class TestReferenceDownload(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.mirror = os.path.join(self.tmp.name, 'mirror')
+        self.refs = os.path.join(self.tmp.name, 'refs')
+        os.makedirs(self.mirror)
+        self.genomes = {f'virus{i}': (f">virus{i}\n" + "ACGT" * (5000 + i)).encode() for i in range(3)}
+        references = {}
+        for key, data in self.genomes.items():
+            with open(os.path.join(self.mirror, f'{key}.fasta'), 'wb') as f:
+                f.write(data)
+            references[key] = {'accession': None, 'filename': f'{key}.fasta',
+                               'sha256': hashlib.sha256(data).hexdigest(), 'size': len(data)}
+        self.manifest = os.path.join(self.tmp.name, 'references.json')
+        with open(self.manifest, 'w') as f:
+            json.dump({'version': 1, 'references': references}, f)
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def sync(self, **kwargs):
+        return sync(ref_dir=self.refs, manifest_path=self.manifest, retries=1, **kwargs)
+
+    def test_sync_from_mirror_directory_and_reuse_cache(self):
+        results = self.sync(mirror=self.mirror, connections=2)
+        self.assertEqual({r['status'] for r in results.values()}, {'downloaded'})
+        for key, data in self.genomes.items():
+            with open(os.path.join(self.refs, f'{key}.fasta'), 'rb') as f:
+                self.assertEqual(f.read(), data)
+        self.assertEqual({r['status'] for r in self.sync().values()}, {'cached'})
+
+    def test_corrupt_reference_is_replaced_and_bad_mirror_rejected(self):
+        self.sync(mirror=self.mirror)
+        with open(os.path.join(self.refs, 'virus0.fasta'), 'ab') as f:
+            f.write(b"NNNN")
+        with open(os.path.join(self.mirror, 'virus1.fasta'), 'wb') as f:
+            f.write(b">tampered\nACGT\n")
+        os.remove(os.path.join(self.refs, 'virus1.fasta'))
+
+        results = self.sync(mirror=self.mirror)
+        self.assertEqual(results['virus0']['status'], 'downloaded')
+        self.assertEqual(results['virus1']['status'], 'failed')
+        self.assertFalse(os.path.exists(os.path.join(self.refs, 'virus1.fasta')))
+        self.assertFalse(os.path.exists(os.path.join(self.refs, 'virus1.fasta.part')))
+        self.assertEqual(results['virus2']['status'], 'cached')
+
+    def test_resume_partial_download_over_http(self):
+        server = HTTPServer(('127.0.0.1', 0), partial(RangeHandler, directory=self.mirror))
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        try:
+            url = f'http://127.0.0.1:{server.server_port}/'
+            data = self.genomes['virus0']
+            os.makedirs(self.refs)
+            with open(os.path.join(self.refs, 'virus0.fasta.part'), 'wb') as f:
+                f.write(data[:1000])
+            RangeHandler.requests = []
+            results = self.sync(mirror=url, targets=['virus0'])
+        finally:
+            server.shutdown()
+            server.server_close()
+
+        self.assertEqual(results['virus0']['status'], 'downloaded')
+        self.assertEqual(RangeHandler.requests, [('/virus0.fasta', 'bytes=1000-')])
+        with open(os.path.join(self.refs, 'virus0.fasta'), 'rb') as f:
+            self.assertEqual(f.read(), data)
+
+    def test_resume_truncated_part_from_mirror_directory_and_reject_mismatch(self):
+        data = self.genomes['virus1']
+        os.makedirs(self.refs)
+        with open(os.path.join(self.refs, 'virus1.fasta.part'), 'wb') as f:
+            f.write(data[:len(data) // 2])
+        with mock.patch.object(download, '_open', wraps=download._open) as opened:
+            results = self.sync(mirror=self.mirror, targets=['virus1'])
+        self.assertEqual(results['virus1']['status'], 'downloaded')
+        opened.assert_called_once_with(os.path.join(self.mirror, 'virus1.fasta'), len(data) // 2)
+        with open(os.path.join(self.refs, 'virus1.fasta'), 'rb') as f:
+            self.assertEqual(f.read(), data)
+
+        # Espejo con contenido distinto al del manifest: se rechaza y no queda nada a medias
+        os.remove(os.path.join(self.refs, 'virus1.fasta'))
+        with open(os.path.join(self.mirror, 'virus1.fasta'), 'wb') as f:
+            f.write(data[:-4] + b"NNNN")
+        results = self.sync(mirror=self.mirror, targets=['virus1'])
+        self.assertEqual(results['virus1']['status'], 'failed')
+        self.assertIn('sha256', results['virus1']['errors'][0])
+        self.assertFalse(os.path.exists(os.path.join(self.refs, 'virus1.fasta')))
+        self.assertFalse(os.path.exists(os.path.join(self.refs, 'virus1.fasta.part')))
+
+    def test_fetch_restarts_when_partial_file_is_stale(self):
+        source = os.path.join(self.mirror, 'virus0.fasta')
+        dest = os.path.join(self.tmp.name, 'virus0.fasta')
+        data = self.genomes['virus0']
+        with open(dest + '.part', 'wb') as f:
+            f.write(b"X" * 100)
+        digest = fetch(source, dest, hashlib.sha256(data).hexdigest(), len(data))
+        self.assertEqual(digest, hashlib.sha256(data).hexdigest())
+        with self.assertRaises(ChecksumError):
+            fetch(source, dest, '0' * 64)
+
+    def test_pin_records_checksums_and_sources_order(self):
+        with open(self.manifest) as f:
+            manifest = json.load(f)
+        for entry in manifest['references'].values():
+            entry['sha256'] = entry['size'] = None
+        with open(self.manifest, 'w') as f:
+            json.dump(manifest, f)
+
+        pin(self.sync(mirror=self.mirror), self.manifest)
+        with open(self.manifest) as f:
+            entry = json.load(f)['references']['virus2']
+        self.assertEqual(entry['sha256'], hashlib.sha256(self.genomes['virus2']).hexdigest())
+        self.assertEqual(entry['size'], len(self.genomes['virus2']))
+
+        found = sources({'accession': 'NC_045512.2', 'filename': 'a b.fasta'}, 'http://mirror:8000/')
+        self.assertEqual(found[0], 'http://mirror:8000/a%20b.fasta')
+        self.assertIn('id=NC_045512.2', found[1])
+
+if __name__ == '__main__':
+    unittest.main()
@@ -34,5 +34,13 @@ class TestDNAEncoder(unittest.TestCase):
         self.assertEqual(encoded[1], 0)
         self.assertEqual(encoded[2], 0)
 
+    def test_encode_batch_matches_encode(self):
+        """La codificación vectorizada equivale a codificar lectura por lectura"""
+        seqs = ["ACGT", "acgtnx", "ACGT" * 10, ""]
+        batch = self.encoder.encode_batch(seqs)
+        self.assertEqual(batch.shape, (4, 10))
+        for row, seq in zip(batch, seqs):
+            np.testing.assert_array_equal(row, self.encoder.encode(seq))
+
 if __name__ == '__main__':
     unittest.main()
@@ -1,16 +1,19 @@
 import unittest
 from unittest.mock import MagicMock, patch
 import numpy as np
+import json
 import sys
 import os
+import tempfile
 
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
 
 # Importar condicionalmente para evitar errores si TF no está instalado en CI
 try:
-    from src.inference import EdgeInference
+    from src.inference import EdgeInference, PanelInference
 except ImportError:
     EdgeInference = None
+    PanelInference = None
 
 class TestInferenceEngine(unittest.TestCase):
     def setUp(self):
@@ -49,5 +52,84 @@ class TestInferenceEngine(unittest.TestCase):
         self.assertAlmostEqual(confidence, 0.9)
         self.assertIsInstance(latency, float)
 
+    @patch('src.inference.tf.lite.Interpreter')
+    def test_predict_encoded_batches(self, mock_interpreter_cls):
+        """predict_encoded invoca una vez por lote y redimensiona el tensor de entrada"""
+        mock_interpreter = MagicMock()
+        mock_interpreter_cls.return_value = mock_interpreter
+        mock_interpreter.get_input_details.return_value = [{'index': 0, 'dtype': np.float32}]
+        mock_interpreter.get_output_details.return_value = [{'index': 1, 'quantization': (0.0, 0)}]
+        mock_interpreter.get_tensor.side_effect = lambda idx: np.tile([[0.2, 0.8]], (4, 1)).astype(np.float32)
+
+        with patch('os.path.exists', return_value=True):
+            engine = EdgeInference(model_path="dummy.tflite")
+
+        X = np.ones((8, 100), dtype=np.int8)
+        probs, latency = engine.predict_encoded(X, batch_size=4)
+
+        self.assertEqual(probs.shape, (8, 2))
+        self.assertEqual(mock_interpreter.invoke.call_count, 2)
+        mock_interpreter.resize_tensor_input.assert_called_once_with(0, [4, 100])
+        self.assertIsInstance(latency, float)
+
+        # predict() individual tras un lote vuelve a dimensionar la entrada a (1, 100)
+        mock_interpreter.get_tensor.side_effect = None
+        mock_interpreter.get_tensor.return_value = np.array([[0.2, 0.8]], dtype=np.float32)
+        engine.predict("ACGT")
+        mock_interpreter.resize_tensor_input.assert_called_with(0, [1, 100])
+
+    @patch('src.inference.tf.lite.Interpreter')
+    def test_panel_single_invoke(self, mock_interpreter_cls):
+        """El modelo panel entrega probabilidades de todos los patógenos en una sola invocación"""
+        mock_interpreter = MagicMock()
+        mock_interpreter_cls.return_value = mock_interpreter
+        mock_interpreter.get_input_details.return_value = [{'index': 0, 'dtype': np.float32}]
+        mock_interpreter.get_output_details.return_value = [{'index': 1, 'quantization': (0.0, 0), 'shape': np.array([1, 3])}]
+        mock_interpreter.get_tensor.return_value = np.array([[0.1, 0.7, 0.2], [0.8, 0.1, 0.1]], dtype=np.float32)
+
+        with tempfile.TemporaryDirectory() as tmp:
+            model_path = os.path.join(tmp, 'model_panel.tflite')
+            with open(model_path, 'wb') as f:
+                f.write(b'')
+            with open(os.path.join(tmp, 'model_panel.json'), 'w') as f:
+                json.dump({'classes': ['background', 'covid19', 'h3n2']}, f)
+            engine = PanelInference(model_path=model_path)
+
+        per_pathogen, predicted, _ = engine.predict_panel(["ACGT", "TTTT"])
+
+        mock_interpreter.invoke.assert_called_once()
+        self.assertEqual(set(per_pathogen), {'covid19', 'h3n2'})
+        np.testing.assert_allclose(per_pathogen['covid19'], [0.7, 0.1])
+        np.testing.assert_array_equal(predicted, [1, 0])
+
+    def test_dynamic_length_model_runs_reads_by_bucket(self):
+        """Un modelo de entrada dinámica evalúa cada lectura a su bucket y respeta el orden"""
+        import tensorflow as tf
+        from src.inference import fit_width
+        from src.model.cnn import create_genomic_cnn
+
+        tf.keras.utils.set_random_seed(0)
+        model = create_genomic_cnn(input_length=None, num_classes=2, global_pooling=True)
+        with tempfile.TemporaryDirectory() as tmp:
+            model_path = os.path.join(tmp, 'model_dynamic.tflite')
+            with open(model_path, 'wb') as f:
+                f.write(tf.lite.TFLiteConverter.from_keras_model(model).convert())
+            engine = EdgeInference(model_path=model_path)
+
+        self.assertEqual(engine.buckets, (64, 100, 152))
+        self.assertEqual(engine.encoder.max_length, 152)
+        rng = np.random.default_rng(0)
+        lengths = [150, 45, 100, 60, 101, 64, 30]
+        seqs = ["".join(rng.choice(list("ACGT"), size=n)) for n in lengths]
+        X = engine.encoder.encode_batch(seqs)
+
+        with patch.object(engine, '_invoke_batch', wraps=engine._invoke_batch) as invoke:
+            probs, _ = engine.predict_encoded(X)
+        self.assertEqual(sorted(call.args[0].shape for call in invoke.call_args_list),
+                         [(1, 100), (2, 152), (4, 64)])
+        for i, width in enumerate([152, 64, 100, 64, 152, 64, 64]):
+            expected, _ = engine._invoke_batch(fit_width(X[i:i + 1], width))
+            np.testing.assert_allclose(probs[i], expected[0], rtol=1e-5, atol=1e-6)
+
 if __name__ == '__main__':
     unittest.main()
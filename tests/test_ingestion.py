@@ -4,12 +4,17 @@ import sys
 import os
 
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
-from src.ingestion import download_reference_genome, SARS_COV_2_REF_URL
+import io
+import gzip
+import tempfile
+from src.ingestion import (download_reference_genome, iter_decompressed, iter_lines, iter_mates,
+                           iter_paired_batches, iter_read_batches, parse_fastq, parse_records, read_fastq_from,
+                           SARS_COV_2_REF_URL)
 
 class TestDataIngestion(unittest.TestCase):
     
-    @patch('src.ingestion.urllib.request.urlretrieve')
-    def test_download_reference_genome_calls_correct_url(self, mock_urlretrieve):
+    @patch('src.data.download.fetch')
+    def test_download_reference_genome_calls_correct_url(self, mock_fetch):
         """
         Verifica que la función intente descargar desde la URL correcta de NCBI.
         No realiza la descarga real para no consumir ancho de banda en CI/Test.
@@ -19,7 +24,7 @@ class TestDataIngestion(unittest.TestCase):
             download_reference_genome()
             
         # Verificar llamada
-        args, _ = mock_urlretrieve.call_args
+        args, _ = mock_fetch.call_args
         download_url = args[0]
         
         self.assertEqual(download_url, SARS_COV_2_REF_URL)
@@ -31,5 +36,109 @@ class TestDataIngestion(unittest.TestCase):
         """
         self.assertIn("ncbi.nlm.nih.gov", SARS_COV_2_REF_URL)
         
+    def test_parse_fastq(self):
+        """El parser entrega (header, secuencia) por cada registro de 4 líneas"""
+        handle = io.StringIO("@r1\nACGT\n+\nIIII\n@r2\nTTGA\n+\nIIII\n")
+        self.assertEqual(list(parse_fastq(handle)), [("@r1", "ACGT"), ("@r2", "TTGA")])
+
+    def test_parse_records_from_arbitrary_chunks(self):
+        """Los registros no dependen de dónde corten los chunks del upload"""
+        data = b"@r1\nACGT\n+\n@III\n@r2\nTTGA\n+\nIIII\n"
+        for size in (1, 3, 7, len(data)):
+            chunks = [data[i:i + size] for i in range(0, len(data), size)]
+            self.assertEqual(list(parse_records(iter_lines(chunks))), [("@r1", "ACGT"), ("@r2", "TTGA")])
+
+        fasta = [b">a\nAC", b"GT\n>b\nTT"]
+        self.assertEqual(list(parse_records(iter_lines(fasta))), [(">a", "ACGT"), (">b", "TT")])
+
+    def test_read_fastq_from_stops_at_last_complete_record(self):
+        """Un FASTQ en escritura se lee hasta el último registro completo y se reanuda desde ese offset"""
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, 'growing.fastq')
+            with open(path, 'wb') as f:
+                f.write(b"@r1\nACGT\n+\nIIII\n@r2\nTTGA\n+\nII")
+            records, offset = read_fastq_from(path)
+            self.assertEqual((records, offset), ([("@r1", "ACGT")], 16))
+
+            with open(path, 'ab') as f:
+                f.write(b"II\n")
+            self.assertEqual(read_fastq_from(path, offset), ([("@r2", "TTGA")], 32))
+            with self.assertRaises(ValueError):
+                read_fastq_from(path, 1)
+
+    def _fastq_bytes(self, n):
+        return "".join(f"@r{i}\n{'ACGT' * 25}\n+\n{'I' * 100}\n" for i in range(n)).encode()
+
+    def test_decompress_gzip_and_bgzf_streams(self):
+        """gzip (incluido multi-miembro) y BGZF se descomprimen igual sin importar el tamaño de chunk"""
+        from Bio import bgzf
+
+        raw = self._fastq_bytes(2000)
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, 'sample.fastq.bgz')
+            with bgzf.BgzfWriter(path, 'wb') as writer:
+                writer.write(raw)
+            with open(path, 'rb') as f:
+                bgzf_data = f.read()
+        payloads = {
+            'plano': raw,
+            'gzip': gzip.compress(raw),
+            'multi': gzip.compress(raw[:1000]) + gzip.compress(raw[1000:]),
+            'bgzf': bgzf_data,
+        }
+        for name, data in payloads.items():
+            for size in (7, 4096, len(data)):
+                chunks = [data[i:i + size] for i in range(0, len(data), size)]
+                self.assertEqual(b"".join(iter_decompressed(chunks, workers=2)), raw, f"{name}/{size}")
+
+    def test_prefetch_thread_stops_when_consumer_stops(self):
+        """Si el consumidor abandona el stream, el hilo auxiliar no queda bloqueado en la cola llena"""
+        import threading
+        import time
+        from src.ingestion import _prefetch
+
+        for tail in ([], [ValueError("chunk corrupto")]):  # fin normal o con error tras la cola llena
+            def source():
+                yield b'a'
+                yield b'b'
+                for error in tail:
+                    raise error
+
+            stream = _prefetch(source(), depth=1)
+            self.assertEqual(next(stream), b'a')
+            time.sleep(0.3)  # el productor llena la cola y espera para entregar el fin/el error
+            stream.close()
+            deadline = time.monotonic() + 5
+            while any(t.name == 'edgegen-decompress' for t in threading.enumerate()) and time.monotonic() < deadline:
+                time.sleep(0.05)
+            self.assertFalse(any(t.name == 'edgegen-decompress' for t in threading.enumerate()))
+
+    def test_iter_read_batches_reads_fastq_gz(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, 'sample.fastq.gz')
+            with gzip.open(path, 'wb') as f:
+                f.write(self._fastq_bytes(2500))
+            sizes = [len(seqs) for _, seqs in iter_read_batches(path, batch_size=1000)]
+        self.assertEqual(sizes, [1000, 1000, 500])
+
+    def test_iter_paired_batches_walks_mates_in_lockstep(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            r1, r2 = os.path.join(tmp, 'R1.fastq.gz'), os.path.join(tmp, 'R2.fastq')
+            with gzip.open(r1, 'wt') as f:
+                f.write("".join(f"@frag{i}/1\nAAAA\n+\nIIII\n" for i in range(5)))
+            with open(r2, 'w') as f:
+                f.write("".join(f"@frag{i} 2:N:0:1\nCCCC\n+\nIIII\n" for i in range(5)))
+            batches = list(iter_paired_batches(r1, r2, batch_size=2))
+        self.assertEqual([len(headers) for headers, _, _ in batches], [2, 2, 1])
+        headers, first, second = batches[0]
+        self.assertEqual((headers[0], first[0], second[0]), ("@frag0/1", "AAAA", "CCCC"))
+
+    def test_iter_mates_rejects_mismatched_or_unbalanced_files(self):
+        r1 = [("@a/1", "A"), ("@b/1", "C")]
+        with self.assertRaisesRegex(ValueError, "desalineados"):
+            list(iter_mates(r1, [("@a/2", "A"), ("@c/2", "C")]))
+        with self.assertRaisesRegex(ValueError, "R2"):
+            list(iter_mates(r1, r1[:1]))
+
 if __name__ == '__main__':
     unittest.main()
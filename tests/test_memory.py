@@ -0,0 +1,34 @@
+import unittest
+import numpy as np
+import sys
+import os
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from src.memory import MemoryBudgetExceeded, track_memory
+from src.profiling import stage
+
+class TestMemoryTracker(unittest.TestCase):
+    def test_peak_attributed_to_stage(self):
+        """Un buffer NumPy de 8 MB creado en 'encoding' aparece en el pico de esa etapa"""
+        with track_memory(verbose=False) as tracker:
+            with stage('ingestion'):
+                small = np.zeros(1000)
+            with stage('encoding'):
+                big = np.ones(1024 * 1024)  # 8 MB float64
+                del big
+
+        stages = tracker.report()['stages']
+        self.assertGreaterEqual(stages['encoding']['peak_traced'], 8 * 1024 * 1024)
+        self.assertLess(stages['ingestion']['peak_traced'], 1024 * 1024)
+        self.assertTrue(stages['encoding']['top_allocations'])
+        self.assertGreater(tracker.peak_rss, 0)
+
+    def test_budget_exceeded_fails_run(self):
+        with self.assertRaises(MemoryBudgetExceeded):
+            with track_memory(budget_mb=1, verbose=False):
+                with stage('encoding'):
+                    pass
+
+if __name__ == '__main__':
+    unittest.main()
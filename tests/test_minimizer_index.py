@@ -0,0 +1,88 @@
+import unittest
+import numpy as np
+import sys
+import os
+import tempfile
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from src.minimizer_index import MinimizerIndex, _reverse_complement, minimizers_by_position
+from src.prefilter import kmers_by_position
+from src.preprocessing.encoder import DNAEncoder
+
+COMPLEMENT = str.maketrans("ACGT", "TGCA")
+
+def random_seqs(rng, n, length):
+    return ["".join(rng.choice(list("ACGT"), size=length)) for _ in range(n)]
+
+class TestMinimizerIndex(unittest.TestCase):
+    def setUp(self):
+        self.rng = np.random.default_rng(0)
+        self.encoder = DNAEncoder(method='integer', max_length=100)
+        self.genomes = dict(zip(['covid19', 'h3n2'], random_seqs(self.rng, 2, 5000)))
+        self.index = MinimizerIndex.from_genomes(self.genomes)
+
+    def reads_from(self, genome, n):
+        starts = self.rng.integers(0, len(genome) - 100, size=n)
+        return [genome[s:s + 100] for s in starts]
+
+    def test_reverse_complement_bit_trick(self):
+        X = self.encoder.encode_batch(random_seqs(self.rng, 20, 100))
+        for k in (5, 15, 16, 21):
+            forward, valid = kmers_by_position(X, k)
+            reverse, _ = kmers_by_position(X, k, reverse_complement=True)
+            np.testing.assert_array_equal(_reverse_complement(forward, k)[valid], reverse[valid])
+
+    def test_minimizers_are_strand_independent(self):
+        seq = self.reads_from(self.genomes['covid19'], 1)[0]
+        X = self.encoder.encode_batch([seq, seq.translate(COMPLEMENT)[::-1]])
+        minimizers, new = minimizers_by_position(X)
+        self.assertEqual(set(minimizers[:, 0][new[:, 0]]), set(minimizers[:, 1][new[:, 1]]))
+
+    def test_exact_reads_are_decided_for_their_target(self):
+        covid = self.reads_from(self.genomes['covid19'], 100)
+        flu = [s.translate(COMPLEMENT)[::-1] for s in self.reads_from(self.genomes['h3n2'], 100)]
+        calls = self.index.classify(self.encoder.encode_batch(covid + flu), ['covid19', 'h3n2'])
+        np.testing.assert_array_equal(calls, [1] * 100 + [2] * 100)
+        # Un modelo binario solo recibe llamadas de su propio patógeno
+        self.assertTrue(np.all(self.index.classify(self.encoder.encode_batch(flu), ['covid19']) == 0))
+
+    def test_unrelated_and_divergent_reads_go_to_the_model(self):
+        noise = random_seqs(self.rng, 200, 100)
+        # Una mutación cada 10 bases: ningún 15-mer intacto
+        divergent = ["".join("A" if i % 10 == 5 and b != "A" else ("C" if i % 10 == 5 else b) for i, b in enumerate(s))
+                     for s in self.reads_from(self.genomes['covid19'], 50)]
+        calls = self.index.classify(self.encoder.encode_batch(noise + divergent + ["ACGT"]), ['covid19'])
+        self.assertTrue(np.all(calls == 0))
+
+    def test_shared_reference_is_ambiguous(self):
+        shared = self.genomes['covid19'][:300]
+        index = MinimizerIndex.from_genomes({'covid19': self.genomes['covid19'], 'h3n2': shared})
+        calls = index.classify(self.encoder.encode_batch([shared[:100]]), ['covid19', 'h3n2'])
+        self.assertEqual(calls.tolist(), [0])
+
+    def test_mask_width_follows_number_of_targets(self):
+        self.assertEqual(self.index.masks.dtype, np.uint16)
+        genomes = {f'virus{i}': seq for i, seq in enumerate(random_seqs(self.rng, 40, 300))}
+        index = MinimizerIndex.from_genomes(genomes)
+        self.assertEqual(index.masks.dtype, np.uint64)
+        reads = [genomes['virus39'][:100], genomes['virus17'][100:200]]
+        calls = index.classify(self.encoder.encode_batch(reads), ['virus17', 'virus39'])
+        self.assertEqual(calls.tolist(), [2, 1])
+        with self.assertRaises(ValueError):
+            MinimizerIndex.from_genomes({f'virus{i}': 'ACGT' * 30 for i in range(65)})
+
+    def test_save_and_load_with_mmap(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            self.index.save(tmp)
+            loaded = MinimizerIndex.load(tmp)
+            self.assertIsInstance(loaded.minimizers, np.memmap)
+            self.assertEqual(loaded.sha256, self.index.sha256)
+            self.assertEqual(loaded.targets, ['covid19', 'h3n2'])
+            X = self.encoder.encode_batch(self.reads_from(self.genomes['h3n2'], 20) + random_seqs(self.rng, 20, 100))
+            np.testing.assert_array_equal(loaded.classify(X, ['covid19', 'h3n2']),
+                                          self.index.classify(X, ['covid19', 'h3n2']))
+            del loaded
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,174 @@
+import unittest
+import numpy as np
+import sys
+import os
+import tempfile
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from concurrent.futures import ThreadPoolExecutor
+
+from src.pipeline import (PATH_INDEX, PATH_MODEL, PATH_PREFILTER, classify_batches, classify_file, combine_mates,
+                          combine_paths, screen_batches)
+from src.profiling import StageTimer, stage
+from src.preprocessing.encoder import DNAEncoder
+
+class PolyAEngine:
+    """Motor falso: 'Viral' (clase 1) si la lectura empieza con A."""
+    num_classes = 2
+
+    def __init__(self):
+        self.encoder = DNAEncoder(method='integer', max_length=100)
+        self.calls = 0
+        self.reads = 0
+
+    def predict_encoded(self, X, batch_size=1024):
+        self.calls += 1
+        self.reads += len(X)
+        viral = (X[:, 0] == 1).astype(np.float32)
+        return np.stack([1 - viral, viral], axis=1), 0.1
+
+class FirstBaseEngine(PolyAEngine):
+    """Motor panel falso: clase = código de la primera base (A=1 -> covid19, C=2 -> h3n2, resto fondo)."""
+    pathogens = ['covid19', 'h3n2']
+
+    def predict_encoded(self, X, batch_size=1024):
+        self.calls += 1
+        classes = np.where(X[:, 0] <= 2, X[:, 0], 0)
+        return np.eye(3, dtype=np.float32)[classes], 0.1
+
+class TestPipeline(unittest.TestCase):
+    def test_classify_file_counts_hits_per_model(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, 'sample.fastq')
+            with open(path, 'w') as f:
+                for i, seq in enumerate(["AAAA", "CCCC", "ACGT", "TTTT", "AGGA"]):
+                    f.write(f"@read_{i}\n{seq}\n+\nIIII\n")
+
+            engines = {'covid19': PolyAEngine(), 'h3n2': PolyAEngine()}
+            summary = classify_file(path, engines, batch_size=2)
+
+        self.assertEqual(summary['total_reads'], 5)
+        self.assertEqual(summary['hits'], {'covid19': 3, 'h3n2': 3})
+        self.assertEqual(engines['covid19'].calls, 3)  # 3 lotes (2 + 2 + 1)
+        self.assertTrue(summary['diagnosis'].startswith("DETECTADO"))
+
+    def test_screen_batches_panel_and_parallel_engines(self):
+        """Modelo panel y modelos binarios en paralelo producen conteos por patógeno equivalentes"""
+        batches = [(["r0", "r1", "r2"], ["AAAA", "CCCC", "GGGG"]), (["r3"], ["ACGT"])]
+
+        panel = screen_batches(batches, {'panel': FirstBaseEngine()})
+        self.assertEqual(panel['hits'], {'covid19': 2, 'h3n2': 1})
+        self.assertEqual(panel['total_reads'], 4)
+
+        with ThreadPoolExecutor(max_workers=2) as pool:
+            binary = screen_batches(batches, {'covid19': PolyAEngine(), 'h3n2': PolyAEngine()}, executor=pool)
+        self.assertEqual(binary['hits'], {'covid19': 2, 'h3n2': 2})
+        self.assertEqual(set(binary['inference_ms']), {'covid19', 'h3n2'})
+
+    def test_stage_timer_measures_each_batch(self):
+        batches = [(["r0", "r1"], ["AAAA", "CCCC"]), (["r2"], ["ACGT"])]
+        with StageTimer() as timer, timer:
+            with stage('aggregation'):
+                summary = screen_batches(iter(batches), {'covid19': PolyAEngine()})
+        self.assertEqual(summary['total_reads'], 3)
+        self.assertEqual(timer.calls['interpreter'], 2)
+        self.assertEqual(len(timer.spans['interpreter']), 2)
+        # Tiempo exclusivo: la etapa externa no cuenta el de las anidadas
+        self.assertLess(timer.ms('aggregation'), timer.spans['aggregation'][-1])
+        with stage('encoding'):
+            pass
+        self.assertEqual(timer.calls['encoding'], 2)  # fuera del bloque ya no se mide
+
+    def test_prefilter_skips_reads_for_covered_engines(self):
+        """Las lecturas descartadas por el prefiltro no llegan al intérprete y se reportan como clase 0"""
+        class OnlyFirstRead:
+            def covers(self, targets):
+                return targets == ['covid19']
+
+            def candidates(self, X, targets):
+                return np.arange(len(X)) == 0
+
+        batches = [(["r0", "r1", "r2"], ["AAAA", "ACGT", "CCCC"])]
+        engines = {'covid19': PolyAEngine(), 'h3n2': PolyAEngine()}
+        result = next(classify_batches(batches, engines, prefilter=OnlyFirstRead()))
+        self.assertEqual(result['skipped'], {'covid19': 2})
+        self.assertEqual(engines['covid19'].reads, 1)
+        self.assertEqual(engines['h3n2'].reads, 3)  # sin filtro para h3n2: evalúa todo
+        np.testing.assert_array_equal(np.argmax(result['probs']['covid19'], axis=1), [1, 0, 0])
+
+        summary = screen_batches(batches, {'covid19': PolyAEngine()}, prefilter=OnlyFirstRead())
+        self.assertEqual(summary['hits'], {'covid19': 1})
+        self.assertEqual(summary['prefilter_skipped'], {'covid19': 2})
+
+    def test_index_decides_reads_before_the_model(self):
+        """El índice decide las coincidencias exactas; cada lectura registra la vía que la decidió"""
+        class FirstReadClean:
+            def covers(self, targets):
+                return True
+
+            def candidates(self, X, targets):
+                return np.arange(len(X)) != 0
+
+        class CallsSecondRead:
+            def covers(self, targets):
+                return True
+
+            def classify(self, X, targets):
+                return (X[:, 0] == 3).astype(np.int8)  # G -> primer objetivo
+
+        batches = [(["r0", "r1", "r2"], ["AAAA", "GGGG", "CCCC"])]
+        engine = PolyAEngine()
+        result = next(classify_batches(batches, {'covid19': engine}, prefilter=FirstReadClean(),
+                                       index=CallsSecondRead()))
+        np.testing.assert_array_equal(result['decided_by']['covid19'], [PATH_PREFILTER, PATH_INDEX, PATH_MODEL])
+        np.testing.assert_array_equal(np.argmax(result['probs']['covid19'], axis=1), [0, 1, 0])
+        self.assertEqual(engine.reads, 1)
+
+        summary = screen_batches(batches, {'covid19': PolyAEngine()}, index=CallsSecondRead())
+        self.assertEqual(summary['hits'], {'covid19': 2})
+        self.assertEqual(summary['decided_by'], {'covid19': {'model': 2, 'prefilter': 0, 'index': 1}})
+
+    def test_paired_mates_share_one_batch_and_one_call(self):
+        """Ambos mates van en un solo lote; la llamada es por fragmento y combina su evidencia"""
+        with tempfile.TemporaryDirectory() as tmp:
+            paths = [os.path.join(tmp, 'R1.fastq'), os.path.join(tmp, 'R2.fastq')]
+            for path, mate, seqs in zip(paths, (1, 2), (["AAAA", "AAAA", "CCCC"], ["AAAA", "CCCC", "CCCC"])):
+                with open(path, 'w') as f:
+                    f.write("".join(f"@frag{i}/{mate}\n{seq}\n+\nIIII\n" for i, seq in enumerate(seqs)))
+            engine = PolyAEngine()
+            summary = classify_file(paths[0], {'covid19': engine}, mate_path=paths[1])
+
+        self.assertEqual(summary['total_reads'], 3)
+        self.assertEqual(summary['hits'], {'covid19': 1})  # el fragmento discordante se anula
+        self.assertEqual((engine.calls, engine.reads), (1, 6))
+
+    def test_combine_mates(self):
+        confident = np.array([[0.1, 0.9], [0.4, 0.6], [1.0, 0.0]], dtype=np.float32)
+        mate = np.array([[0.2, 0.8], [0.6, 0.4], [0.3, 0.7]], dtype=np.float32)
+        joint = combine_mates(confident, mate)
+        np.testing.assert_allclose(joint.sum(axis=1), 1, rtol=1e-6)
+        self.assertGreater(joint[0, 1], 0.9)  # dos mates positivos refuerzan la llamada
+        self.assertAlmostEqual(float(joint[1, 1]), 0.5, places=6)
+        self.assertEqual(int(np.argmax(joint[2])), 0)  # una decisión exacta domina sin dar NaN
+
+        first = np.array([PATH_MODEL, PATH_PREFILTER, PATH_PREFILTER, PATH_INDEX])
+        second = np.array([PATH_PREFILTER, PATH_PREFILTER, PATH_INDEX, PATH_MODEL])
+        np.testing.assert_array_equal(combine_paths(first, second),
+                                      [PATH_MODEL, PATH_PREFILTER, PATH_INDEX, PATH_INDEX])
+
+    def test_main_exits_with_2_when_over_memory_budget(self):
+        from unittest.mock import patch
+        from src import pipeline
+
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, 'reads.fastq')
+            with open(path, 'w') as f:
+                f.write("".join(f"@r{i}\nACGTACGT\n+\nIIIIIIII\n" for i in range(10)))
+            with patch('src.pipeline.load_engines', return_value={'covid19': PolyAEngine()}):
+                code = pipeline.main([path, '--memory-budget', '1', '--batch-size', '4', '--no-prefilter',
+                                      '--no-index'])
+        self.assertEqual(code, 2)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,76 @@
+import unittest
+import numpy as np
+import sys
+import os
+import tempfile
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from src.prefilter import KmerBloomFilter, KmerPrefilter, genome_kmers, read_kmers
+from src.preprocessing.encoder import DNAEncoder
+
+COMPLEMENT = str.maketrans("ACGT", "TGCA")
+
+def naive_kmers(seq, k):
+    """K-mers válidos de una lectura (str) en 2 bits por base, uno por ventana sin N."""
+    value = {'A': 0, 'C': 1, 'G': 2, 'T': 3}
+    return [sum(value[b] << (2 * (k - 1 - j)) for j, b in enumerate(seq[i:i + k]))
+            for i in range(len(seq) - k + 1) if set(seq[i:i + k]) <= set("ACGT")]
+
+def random_seqs(rng, n, length):
+    return ["".join(rng.choice(list("ACGT"), size=length)) for _ in range(n)]
+
+class TestPrefilter(unittest.TestCase):
+    def setUp(self):
+        self.rng = np.random.default_rng(0)
+        self.encoder = DNAEncoder(method='integer', max_length=100)
+        self.genome = random_seqs(self.rng, 1, 3000)[0]
+        self.prefilter = KmerPrefilter({'covid19': KmerBloomFilter.build(genome_kmers(self.genome, 15))}, k=15)
+
+    def test_read_kmers_match_naive(self):
+        seqs = ["ACGTNACGTACGTTTGCA", "GATTACA", "TTTTTTTTTTTTTTTTTTTT"]
+        kmers, valid = read_kmers(self.encoder.encode_batch(seqs), k=5)
+        for i, seq in enumerate(seqs):
+            self.assertEqual(kmers[i][valid[i]].tolist(), naive_kmers(seq, 5))
+
+        rc_kmers, rc_valid = read_kmers(self.encoder.encode_batch(seqs[:1]), k=5, reverse_complement=True)
+        expected = naive_kmers(seqs[0].translate(COMPLEMENT)[::-1], 5)[::-1]
+        self.assertEqual(rc_kmers[0][rc_valid[0]].tolist(), expected)
+
+    def test_no_false_negatives_on_either_strand(self):
+        """Toda lectura tomada del genoma (o de su complementaria inversa) pasa al modelo"""
+        starts = self.rng.integers(0, len(self.genome) - 100, size=200)
+        forward = [self.genome[s:s + 100] for s in starts]
+        reverse = [s.translate(COMPLEMENT)[::-1] for s in forward]
+        for seqs in (forward, reverse):
+            self.assertTrue(self.prefilter.candidates(self.encoder.encode_batch(seqs), ['covid19']).all())
+
+    def test_unrelated_reads_are_skipped(self):
+        keep = self.prefilter.candidates(self.encoder.encode_batch(random_seqs(self.rng, 500, 100)), ['covid19'])
+        self.assertLess(keep.mean(), 0.05)
+
+    def test_reads_without_valid_kmers_always_pass(self):
+        keep = self.prefilter.candidates(self.encoder.encode_batch(["ACGT", "N" * 100]), ['covid19'])
+        self.assertTrue(keep.all())
+
+    def test_reads_with_n_always_pass(self):
+        """Una N dentro de la lectura la manda al modelo aunque sus otras ventanas no coincidan; el padding no"""
+        unrelated = random_seqs(self.rng, 2, 100)
+        seqs = [unrelated[0][:50] + "N" + unrelated[0][51:], "N" + unrelated[1][1:], unrelated[1][:60]]
+        keep = self.prefilter.candidates(self.encoder.encode_batch(seqs), ['covid19'])
+        self.assertEqual(keep.tolist(), [True, True, False])
+
+    def test_save_and_load(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, 'kmer_prefilter.npz')
+            self.prefilter.save(path)
+            loaded = KmerPrefilter.load(path)
+        self.assertEqual(loaded.k, 15)
+        self.assertEqual(loaded.sha256, self.prefilter.sha256)
+        self.assertTrue(loaded.covers(['covid19']))
+        self.assertFalse(loaded.covers(['covid19', 'h3n2']))
+        X = self.encoder.encode_batch(random_seqs(self.rng, 200, 100) + [self.genome[:100]])
+        np.testing.assert_array_equal(loaded.candidates(X, ['covid19']), self.prefilter.candidates(X, ['covid19']))
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,98 @@
+import json
+import os
+import sys
+import tempfile
+import unittest
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from src.registry import ModelRegistry, file_sha256, load_manifest, update_validation, write_atomic
+
+class TestModelRegistry(unittest.TestCase):
+    """Registro con un cargador falso: el 'motor' es el contenido del archivo del modelo."""
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.manifest_path = os.path.join(self.tmp.name, 'manifest.json')
+        self.fail = set()
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def loader(self, entry, path):
+        with open(path, 'rb') as f:
+            content = f.read()
+        if content in self.fail:
+            raise RuntimeError("modelo corrupto")
+        return content
+
+    def publish(self, models):
+        manifest = {'version': 1, 'models': {}}
+        for key, content in models.items():
+            path = os.path.join(self.tmp.name, f'{key}.tflite')
+            write_atomic(path, content)
+            manifest['models'][key] = {'name': key.upper(), 'path': f'{key}.tflite', 'sha256': file_sha256(path),
+                                       'kind': 'binary', 'classes': ['background', key]}
+        write_atomic(self.manifest_path, json.dumps(manifest).encode())
+
+    def test_reload_swaps_changed_models_only(self):
+        self.publish({'covid19': b'v1', 'h3n2': b'v1'})
+        registry = ModelRegistry(self.manifest_path, loader=self.loader).start(watch=False)
+        self.assertEqual(registry.get('covid19'), b'v1')
+        self.assertEqual(sorted(registry.keys(kind='binary')), ['covid19', 'h3n2'])
+
+        self.publish({'covid19': b'v2', 'h3n2': b'v1'})
+        self.assertEqual(registry.reload(), ['covid19'])
+        self.assertEqual(registry.get('covid19'), b'v2')
+
+        self.publish({'covid19': b'v2'})
+        registry.reload()
+        self.assertIsNone(registry.get('h3n2'))
+        self.assertNotIn('h3n2', registry.status())
+
+    def test_failed_load_keeps_previous_engine(self):
+        self.publish({'covid19': b'v1'})
+        registry = ModelRegistry(self.manifest_path, loader=self.loader).start(watch=False)
+
+        self.fail.add(b'v2')
+        self.publish({'covid19': b'v2'})
+        self.assertEqual(registry.reload(), [])
+        self.assertEqual(registry.get('covid19'), b'v1')
+        self.assertIn('corrupto', registry.status()['covid19']['error'])
+
+        # Reintento: el error no queda cacheado
+        self.fail.clear()
+        self.assertEqual(registry.reload(), ['covid19'])
+        self.assertEqual(registry.get('covid19'), b'v2')
+        self.assertIsNone(registry.status()['covid19']['error'])
+
+    def test_hash_mismatch_is_rejected(self):
+        self.publish({'covid19': b'v1'})
+        with open(os.path.join(self.tmp.name, 'covid19.tflite'), 'wb') as f:
+            f.write(b'v1-modificado')
+        registry = ModelRegistry(self.manifest_path, loader=self.loader).start(watch=False)
+        self.assertIsNone(registry.get('covid19'))
+        self.assertIn('Hash', registry.errors['covid19'])
+
+    def test_watcher_picks_up_manifest_changes(self):
+        self.publish({'covid19': b'v1'})
+        registry = ModelRegistry(self.manifest_path, interval=0.01, loader=self.loader).start()
+        try:
+            self.publish({'covid19': b'v2'})
+            for _ in range(500):
+                if registry.get('covid19') == b'v2':
+                    break
+                registry._stop.wait(0.01)
+            self.assertEqual(registry.get('covid19'), b'v2')
+        finally:
+            registry.stop()
+
+    def test_update_validation_keeps_model_entry(self):
+        self.publish({'covid19': b'v1'})
+        update_validation({'covid19': {'kpis': {'accuracy': 0.99, 'sensitivity': 0.98, 'specificity': 0.97},
+                                       'passes_gates': True, 'n_windows': 10}}, self.manifest_path)
+        entry = load_manifest(self.manifest_path)['models']['covid19']
+        self.assertEqual(entry['validation']['accuracy'], 0.99)
+        self.assertEqual(entry['sha256'], file_sha256(os.path.join(self.tmp.name, 'covid19.tflite')))
+
+if __name__ == '__main__':
+    unittest.main()
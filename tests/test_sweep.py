@@ -0,0 +1,43 @@
+import unittest
+import sys
+import os
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from src.model.sweep import expand_grid, pareto_front, select_recommended, variant_id
+from src.model.evaluation import binary_kpis
+
+class TestArchitectureSweep(unittest.TestCase):
+    def test_expand_grid_discards_collapsed_architectures(self):
+        """Kernels/pooling que reducen la secuencia a 0 posiciones no se entrenan"""
+        grid = {'filters': [(8, 8)], 'kernel_sizes': [(12, 8), (60, 40)], 'pool_size': [4], 'dense_units': [16]}
+        variants = expand_grid(grid, input_length=100)
+        self.assertEqual([variant_id(v) for v in variants], ['f8-8_k12-8_p4_d16'])
+
+    def test_pareto_front(self):
+        rows = [
+            {'id': 'rapido', 'lat': 1.0, 'acc': 0.90},
+            {'id': 'preciso', 'lat': 3.0, 'acc': 0.99},
+            {'id': 'dominado', 'lat': 4.0, 'acc': 0.95},
+        ]
+        front = pareto_front(rows, [(lambda r: r['lat'], 'min'), (lambda r: r['acc'], 'max')])
+        self.assertEqual({r['id'] for r in front}, {'rapido', 'preciso'})
+
+    def test_select_recommended_respects_gates(self):
+        """El recomendado es el más rápido que aprueba, no el más rápido en absoluto"""
+        rows = [
+            {'id': 'a', 'passes_gates': False, 'size_bytes': 10, 'latency': {64: {'per_read_us': 1.0}}},
+            {'id': 'b', 'passes_gates': True, 'size_bytes': 20, 'latency': {64: {'per_read_us': 2.0}}},
+            {'id': 'c', 'passes_gates': True, 'size_bytes': 20, 'latency': {64: {'per_read_us': 3.0}}},
+        ]
+        self.assertEqual(select_recommended(rows, 64)['id'], 'b')
+        self.assertIsNone(select_recommended(rows[:1], 64))
+
+    def test_binary_kpis(self):
+        kpis = binary_kpis([1, 1, 0, 0, 0], [1, 0, 0, 0, 1])
+        self.assertEqual((kpis['tp'], kpis['fn'], kpis['tn'], kpis['fp']), (1, 1, 2, 1))
+        self.assertAlmostEqual(kpis['accuracy'], 0.6)
+        self.assertAlmostEqual(kpis['specificity'], 2 / 3)
+
+if __name__ == '__main__':
+    unittest.main()
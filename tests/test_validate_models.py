@@ -0,0 +1,50 @@
+import unittest
+from unittest.mock import patch
+import numpy as np
+import sys
+import os
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from src.validate_models import (build_test_set, encode_genome, sample_windows,
+                                 GROUP_TARGET, GROUP_DECOY, GROUP_NOISE)
+
+GENOMES = {
+    'sars_cov_2_genomic.fasta': "ACGT" * 500,
+    'h3n2_segment4.fasta': "TTGCA" * 300,
+}
+
+class TestValidationHarness(unittest.TestCase):
+    def test_encode_genome(self):
+        np.testing.assert_array_equal(encode_genome("ACGTN"), [1, 2, 3, 4, 0])
+
+    def test_sample_windows_are_genome_slices(self):
+        """Sin mutaciones, cada ventana es un fragmento exacto del genoma"""
+        genome = encode_genome("ACGT" * 100)
+        rng = np.random.default_rng(0)
+        windows = sample_windows(genome, 50, rng, length=20, mutation_rate=0.0)
+        self.assertEqual(windows.shape, (50, 20))
+        for w in windows:
+            self.assertIn(bytes(w), bytes(genome))
+
+    @patch('src.validate_models.load_genome_sequence', side_effect=lambda name: GENOMES[name])
+    def test_build_test_set_thirds(self, _):
+        X, y, group = build_test_set('covid19', n_windows=3000, seed=1)
+        self.assertEqual(X.shape, (3000, 100))
+        self.assertEqual(int(y.sum()), 1000)
+        np.testing.assert_array_equal(np.bincount(group), [1000, 1000, 1000])
+        self.assertTrue(np.all(y[group == GROUP_TARGET] == 1))
+        self.assertTrue(np.all(y[(group == GROUP_DECOY) | (group == GROUP_NOISE)] == 0))
+
+    def test_too_few_windows_are_rejected(self):
+        from src.validate_models import main
+
+        for windows in ('0', '2'):
+            with patch('sys.stderr'), patch('src.validate_models.validate_all') as validate_all:
+                with self.assertRaises(SystemExit) as exit:
+                    main(['--windows', windows])
+            self.assertEqual(exit.exception.code, 2)
+            validate_all.assert_not_called()
+
+if __name__ == '__main__':
+    unittest.main()
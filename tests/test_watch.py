@@ -0,0 +1,75 @@
+import gzip
+import json
+import os
+import sys
+import tempfile
+import unittest
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from src.watch import CHECKPOINT_NAME, RunWatcher
+from tests.test_pipeline import FirstBaseEngine, PolyAEngine
+
+def fastq(seqs, start=0):
+    return "".join(f"@read_{start + i}\n{seq}\n+\n{'I' * len(seq)}\n" for i, seq in enumerate(seqs))
+
+class TestRunWatcher(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.run_dir = self.tmp.name
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def watcher(self, engines=None):
+        return RunWatcher(self.run_dir, engines or {'covid19': PolyAEngine()}, batch_size=2, settle=0)
+
+    def test_growing_fastq_is_classified_incrementally_and_resumes_from_checkpoint(self):
+        path = os.path.join(self.run_dir, 'reads.fastq')
+        with open(path, 'w') as f:
+            f.write(fastq(["CCCC", "GGGG", "TTTT"]) + "@read_3\nAAA")  # último registro a medias
+        watcher = self.watcher()
+        self.assertEqual([u['reads'] for u in watcher.poll()], [3])
+        self.assertEqual(watcher.state['summary']['diagnosis'], "NEGATIVO")
+        self.assertEqual(watcher.poll(), [])  # sin cambios: no se vuelve a leer
+
+        with open(path, 'a') as f:
+            f.write("A\n+\nIIII\n" + fastq(["ACGT", "CCCC"], start=4))
+        (update,) = watcher.poll()
+        self.assertEqual((update['reads'], update['total_reads']), (3, 6))
+        self.assertGreaterEqual(update['latency_s'], 0.0)
+        self.assertEqual(watcher.state['summary']['hits'], {'covid19': 2})
+        self.assertEqual(watcher.state['first_detected']['covid19']['total_reads'], 6)
+
+        # Reinicio: el checkpoint conserva offsets y conteos; nada se reprocesa
+        engine = PolyAEngine()
+        restarted = self.watcher({'covid19': engine})
+        self.assertEqual(restarted.poll(), [])
+        self.assertEqual(engine.reads, 0)
+        self.assertEqual(restarted.state['summary']['total_reads'], 6)
+        self.assertEqual(restarted.state['summary']['decided_by']['covid19']['model'], 6)
+
+    def test_gzip_chunks_skip_reads_already_counted(self):
+        path = os.path.join(self.run_dir, 'pass', 'chunk_0.fastq.gz')
+        os.makedirs(os.path.dirname(path))
+        with gzip.open(path, 'wt') as f:
+            f.write(fastq(["AAAA", "CCCC"]))
+        engines = {'panel': FirstBaseEngine()}
+        watcher = self.watcher(engines)
+        watcher.poll()
+
+        with gzip.open(path, 'at') as f:  # nuevo miembro gzip al final del mismo archivo
+            f.write(fastq(["CCCC", "GGGG", "ACGT"], start=2))
+        (update,) = watcher.poll()
+        self.assertEqual((update['file'], update['reads']), (os.path.join('pass', 'chunk_0.fastq.gz'), 3))
+        summary = watcher.state['summary']
+        self.assertEqual(summary['hits'], {'covid19': 2, 'h3n2': 2})
+        self.assertEqual(summary['detected'], ['covid19', 'h3n2'])
+
+        with open(os.path.join(self.run_dir, CHECKPOINT_NAME)) as f:
+            self.assertEqual(json.load(f)['files'][os.path.join('pass', 'chunk_0.fastq.gz')]['reads'], 5)
+        with self.assertRaises(ValueError):
+            self.watcher({'covid19': PolyAEngine()})  # checkpoint de otros modelos
+
+if __name__ == '__main__':
+    unittest.main()
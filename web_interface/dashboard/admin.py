@@ -1,3 +1,19 @@
 from django.contrib import admin
 
-# Register your models here.
+from .models import AnalysisJob, Run, Sample
+
+
+@admin.register(AnalysisJob)
+class AnalysisJobAdmin(admin.ModelAdmin):
+    list_display = ('id', 'virus_type', 'status', 'reads_processed', 'virus_count', 'attempts', 'created_at')
+    list_filter = ('status', 'virus_type')
+
+
+@admin.register(Run)
+class RunAdmin(admin.ModelAdmin):
+    list_display = ('id', 'name', 'created_at')
+
+
+@admin.register(Sample)
+class SampleAdmin(admin.ModelAdmin):
+    list_display = ('id', 'run', 'name', 'total_reads', 'flagged_reads', 'finished_at')
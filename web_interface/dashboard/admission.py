@@ -0,0 +1,185 @@
+"""
+Control de admisión delante de los motores de inferencia (uno por proceso/worker de gunicorn).
+
+Cada petición declara cuántas lecturas pone en el intérprete a la vez. Si caben en
+EDGEGEN_ADMISSION_MAX_INFLIGHT_READS, se admite. Si no, espera en una cola FIFO acotada
+(EDGEGEN_ADMISSION_MAX_QUEUE) como mucho EDGEGEN_ADMISSION_QUEUE_TIMEOUT segundos. Con la
+cola llena o el plazo vencido se descarta con 503 + Retry-After. Así la latencia de las
+peticiones admitidas queda acotada por (espera máxima + servicio), aunque la carga ofrecida
+supere con creces la capacidad.
+"""
+import math
+import threading
+import time
+from collections import deque
+
+import numpy as np
+from django.conf import settings
+from django.http import JsonResponse
+
+# Ventana de esperas recientes para los percentiles de /metrics/admission
+WAIT_WINDOW = 1024
+
+# Suavizado de la duración media de un permiso (estimación de Retry-After)
+HOLD_EWMA_ALPHA = 0.2
+
+MAX_RETRY_AFTER = 60
+
+
+class Overloaded(Exception):
+    """La petición no se admitió: cola llena o plazo de espera vencido."""
+    def __init__(self, reason, retry_after):
+        super().__init__(f"Server overloaded ({reason}), retry in {retry_after}s")
+        self.reason = reason
+        self.retry_after = retry_after
+
+
+class Permit:
+    """Lecturas admitidas en el intérprete; se liberan con release() (o al salir del `with`)."""
+    def __init__(self, controller, cost):
+        self.controller = controller
+        self.cost = cost
+        self.started = time.monotonic()
+        self._released = False
+
+    def release(self):
+        if not self._released:
+            self._released = True
+            self.controller._release(self)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.release()
+
+
+class AdmissionController:
+    def __init__(self, max_inflight_reads, max_queue, queue_timeout):
+        self.max_inflight_reads = max_inflight_reads
+        self.max_queue = max_queue
+        self.queue_timeout = queue_timeout
+        self.in_flight = 0
+        self.peak_queue = 0
+        self.counters = {'admitted': 0, 'queued': 0, 'rejected_full': 0, 'rejected_timeout': 0}
+        self._queue = deque()   # (ticket, costo) en orden de llegada
+        self._waits = deque(maxlen=WAIT_WINDOW)
+        self._hold_ewma = None
+        self._cond = threading.Condition()
+
+    def acquire(self, reads):
+        """
+        Admite `reads` lecturas simultáneas (una petición mayor que el límite ocupa el límite
+        completo: se ejecuta sola). Retorna un Permit o lanza Overloaded.
+        """
+        cost = max(1, min(int(reads), self.max_inflight_reads))
+        with self._cond:
+            if not self._queue and self.in_flight + cost <= self.max_inflight_reads:
+                return self._admit(cost, 0.0)
+            if len(self._queue) >= self.max_queue:
+                self.counters['rejected_full'] += 1
+                raise Overloaded('queue_full', self.retry_after())
+
+            ticket = (object(), cost)
+            self._queue.append(ticket)
+            self.counters['queued'] += 1
+            self.peak_queue = max(self.peak_queue, len(self._queue))
+            start = time.monotonic()
+            deadline = start + self.queue_timeout
+            try:
+                # FIFO: solo la cabeza de la cola puede entrar (sin inanición de lotes grandes)
+                while self._queue[0] is not ticket or self.in_flight + cost > self.max_inflight_reads:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        self.counters['rejected_timeout'] += 1
+                        raise Overloaded('queue_timeout', self.retry_after())
+                    self._cond.wait(remaining)
+            finally:
+                self._queue.remove(ticket)
+                self._cond.notify_all()
+            return self._admit(cost, time.monotonic() - start)
+
+    def _admit(self, cost, waited):
+        self.in_flight += cost
+        self.counters['admitted'] += 1
+        self._waits.append(waited)
+        return Permit(self, cost)
+
+    def _release(self, permit):
+        held = time.monotonic() - permit.started
+        with self._cond:
+            self.in_flight -= permit.cost
+            self._hold_ewma = held if self._hold_ewma is None else (
+                HOLD_EWMA_ALPHA * held + (1 - HOLD_EWMA_ALPHA) * self._hold_ewma)
+            self._cond.notify_all()
+
+    def retry_after(self):
+        """Segundos estimados hasta vaciar la cola: una 'capacidad completa' dura ~un permiso medio."""
+        queued_reads = sum(cost for _, cost in self._queue)
+        hold = self._hold_ewma or 1.0
+        estimate = hold * (1 + queued_reads / self.max_inflight_reads)
+        return int(min(MAX_RETRY_AFTER, max(1, math.ceil(estimate))))
+
+    def metrics(self):
+        with self._cond:
+            waits_ms = np.array(self._waits) * 1000 if self._waits else np.zeros(1)
+            return dict(
+                self.counters,
+                in_flight_reads=self.in_flight,
+                max_inflight_reads=self.max_inflight_reads,
+                queue_depth=len(self._queue),
+                queued_reads=sum(cost for _, cost in self._queue),
+                max_queue=self.max_queue,
+                peak_queue_depth=self.peak_queue,
+                queue_timeout_s=self.queue_timeout,
+                wait_ms={p: round(float(np.percentile(waits_ms, q)), 3)
+                         for p, q in (('p50', 50), ('p95', 95), ('p99', 99), ('max', 100))},
+                mean_hold_ms=round(self._hold_ewma * 1000, 3) if self._hold_ewma is not None else None,
+                retry_after_s=self.retry_after(),
+            )
+
+
+_controller = None
+_controller_lock = threading.Lock()
+
+
+def controller():
+    """Controlador del proceso (cada worker de gunicorn admite por separado)."""
+    global _controller
+    if _controller is None:
+        with _controller_lock:
+            if _controller is None:
+                _controller = AdmissionController(
+                    settings.EDGEGEN_ADMISSION_MAX_INFLIGHT_READS,
+                    settings.EDGEGEN_ADMISSION_MAX_QUEUE,
+                    settings.EDGEGEN_ADMISSION_QUEUE_TIMEOUT,
+                )
+    return _controller
+
+
+def overloaded_response(error, **extra):
+    response = JsonResponse(dict(extra, error=str(error), reason=error.reason, retry_after=error.retry_after),
+                            status=503)
+    response['Retry-After'] = str(error.retry_after)
+    return response
+
+
+class ReleaseOnClose:
+    """
+    Mantiene el permiso mientras se genera una respuesta en streaming. Django llama a close()
+    al terminar la respuesta (también si el cliente se desconecta antes de empezar a leer).
+    """
+    def __init__(self, stream, permit):
+        self.stream = stream
+        self.permit = permit
+
+    def __iter__(self):
+        try:
+            yield from self.stream
+        finally:
+            self.close()
+
+    def close(self):
+        self.permit.release()
+        if hasattr(self.stream, 'close'):
+            self.stream.close()
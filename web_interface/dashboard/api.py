@@ -0,0 +1,184 @@
+"""
+API versionada para clientes máquina (LIMS). Sin formato de presentación: entrada por lotes
+(JSON o binario pre-codificado) y salida columnar con ids de clase y probabilidades.
+
+    POST /api/v1/classify?model=<nombre>
+        application/json          {"model": "covid19", "sequences": ["ACGT...", ...]}
+        application/octet-stream  n * L bytes uint8 (0=N/pad, 1=A, 2=C, 3=G, 4=T), L = read_length del modelo
+    GET  /api/v1                  modelos disponibles y límites de la API
+"""
+import json
+
+import numpy as np
+from django.conf import settings
+from django.http import HttpResponse, JsonResponse
+from django.views.decorators.csrf import csrf_exempt
+from django.views.decorators.http import require_GET, require_POST
+
+from . import admission
+from .timing import RequestTiming
+from .views import get_engine
+
+from src.profiling import stage
+from src.registry import default_registry
+
+API_VERSION = 1
+
+# Códigos válidos de las lecturas pre-codificadas (DNAEncoder: N/pad, A, C, G, T)
+MAX_BASE_CODE = 4
+
+BINARY_CONTENT_TYPE = 'application/octet-stream'
+
+
+def _error(message, status=400):
+    return JsonResponse({'api_version': API_VERSION, 'error': message}, status=status)
+
+
+def _limits(engines):
+    """Límites de la API; largo de lectura (y buckets, si es dinámico) de cada modelo cargado."""
+    read_length = {}
+    for name, engine in engines.items():
+        read_length[name] = {'read_length': engine.encoder.max_length}
+        if engine.buckets is not None:
+            read_length[name]['buckets'] = list(engine.buckets)
+    return {
+        'max_reads': settings.EDGEGEN_API_MAX_READS,
+        'max_body_bytes': settings.EDGEGEN_API_MAX_BODY_BYTES,
+        'models': read_length,
+    }
+
+
+def _classes(name):
+    entry = default_registry().entry(name)
+    return entry['classes'] if entry else []
+
+
+def _read_body(request):
+    """
+    Lee el cuerpo respetando EDGEGEN_API_MAX_BODY_BYTES (sin el límite de formularios de Django).
+    Retorna (cuerpo, None) o (None, respuesta de error).
+    """
+    limit = settings.EDGEGEN_API_MAX_BODY_BYTES
+    try:
+        declared = int(request.META.get('CONTENT_LENGTH') or 0)
+    except ValueError:
+        return None, _error("Invalid Content-Length")
+    body = request.read(limit + 1) if declared <= limit else b''
+    if declared > limit or len(body) > limit:
+        return None, _error(f"Body exceeds {limit} bytes", status=413)
+    return body, None
+
+
+@require_GET
+def api_index(request):
+    engines = {key: get_engine(key) for key in default_registry().keys()}
+    engines = {key: engine for key, engine in engines.items() if engine is not None}
+    return JsonResponse({'api_version': API_VERSION, 'models': list(engines), 'limits': _limits(engines)})
+
+
+@csrf_exempt
+@require_POST
+def classify(request):
+    """
+    Clasificación por lotes. Respuesta columnar (JSON por defecto; binaria con
+    `Accept: application/octet-stream`): class_id (n,) y una columna de probabilidades por clase.
+    """
+    timing = RequestTiming(request)
+    with timing.upload():
+        body, error = _read_body(request)
+    if error is not None:
+        return error
+    with timing.stages:
+        return _classify(request, body, timing)
+
+
+def _classify(request, body, timing):
+    content_type = request.content_type or ''
+    model = request.GET.get('model')
+    if content_type == 'application/json':
+        with stage('ingestion'):
+            try:
+                payload = json.loads(body)
+            except ValueError:
+                return _error("Invalid JSON body")
+            if not isinstance(payload, dict):
+                return _error("JSON body must be an object with 'sequences'")
+            sequences = payload.get('sequences')
+            model = payload.get('model', model)
+            if not isinstance(sequences, list) or not all(isinstance(s, str) for s in sequences):
+                return _error("'sequences' must be a list of strings")
+    elif content_type == BINARY_CONTENT_TYPE:
+        sequences = None
+    else:
+        return _error(f"Unsupported Content-Type '{content_type}' (use application/json or {BINARY_CONTENT_TYPE})",
+                      status=415)
+
+    model = model or 'covid19'
+    engine = get_engine(model)
+    if engine is None:
+        return _error(f"Model '{model}' not available", status=404)
+    length = engine.encoder.max_length
+
+    # --- Decodificación ---
+    if sequences is not None:
+        if len(sequences) > settings.EDGEGEN_API_MAX_READS:
+            return _error(f"At most {settings.EDGEGEN_API_MAX_READS} reads per request", status=413)
+        with stage('encoding'):
+            X = engine.encoder.encode_batch(sequences)
+    else:
+        try:
+            read_length = int(request.headers.get('X-EdgeGen-Read-Length', length))
+        except ValueError:
+            return _error("X-EdgeGen-Read-Length must be an integer")
+        # Los modelos de longitud dinámica aceptan cualquier largo hasta su mayor bucket
+        if getattr(engine, 'buckets', None) and 0 < read_length <= length:
+            length = read_length
+        if read_length != length:
+            return _error(f"Model '{model}' expects reads of {length} codes")
+        if len(body) % length:
+            return _error(f"Binary body must be a multiple of {length} bytes (one uint8 code per base)")
+        with stage('encoding'):
+            codes = np.frombuffer(body, dtype=np.uint8).reshape(-1, length)
+            if len(codes) > settings.EDGEGEN_API_MAX_READS:
+                return _error(f"At most {settings.EDGEGEN_API_MAX_READS} reads per request", status=413)
+            if codes.size and codes.max() > MAX_BASE_CODE:
+                return _error(f"Base codes must be in 0..{MAX_BASE_CODE}")
+            X = codes.astype(np.int8)
+
+    # --- Inferencia por lotes (con control de admisión) ---
+    try:
+        with timing.queued():
+            permit = admission.controller().acquire(len(X))
+    except admission.Overloaded as e:
+        return admission.overloaded_response(e, api_version=API_VERSION)
+    outputs = []
+    with permit:
+        for start in range(0, len(X), engine.batch_size):
+            with stage('interpreter'):
+                outputs.append(engine.predict_encoded(X[start:start + engine.batch_size])[0])
+    n = len(X)
+    with stage('aggregation'):
+        probs = np.concatenate(outputs) if outputs else np.zeros((0, engine.num_classes), dtype=np.float32)
+        class_ids = np.argmax(probs, axis=1).astype(np.uint8) if n else np.zeros(0, dtype=np.uint8)
+
+    if BINARY_CONTENT_TYPE in request.headers.get('Accept', ''):
+        # uint8 class_id[n] seguido de float32 little-endian probs[clases][n] (columna por clase)
+        with stage('django_rendering'):
+            columns = np.ascontiguousarray(probs.T, dtype='<f4')
+            content = class_ids.tobytes() + columns.tobytes()
+        response = HttpResponse(content, content_type=BINARY_CONTENT_TYPE)
+        response['X-EdgeGen-Api-Version'] = str(API_VERSION)
+        response['X-EdgeGen-Reads'] = str(n)
+        response['X-EdgeGen-Classes'] = ",".join(_classes(model))
+        response['X-EdgeGen-Timing'] = json.dumps(timing.finish(n, model=model, api_version=API_VERSION))
+        return response
+
+    return timing.json_response({
+        'api_version': API_VERSION,
+        'model': model,
+        'n': n,
+        'classes': _classes(model),
+        'class_id': class_ids.tolist(),
+        'probs': [np.round(column, 6).tolist() for column in probs.T],
+    }, reads=n, model=model, api_version=API_VERSION)
+
@@ -1,5 +1,21 @@
 from django.apps import AppConfig
+from django.db.backends.signals import connection_created
+
+
+def sqlite_pragmas(sender, connection, **kwargs):
+    """
+    WAL en cada conexión SQLite: las consultas de resultados no bloquean (ni esperan) a las
+    inserciones por lotes. Vía señal y no OPTIONS['init_command'] (solo existe desde Django 5.1).
+    """
+    if connection.vendor == 'sqlite':
+        with connection.cursor() as cursor:
+            cursor.execute('PRAGMA journal_mode=WAL')
+            cursor.execute('PRAGMA synchronous=NORMAL')
 
 
 class DashboardConfig(AppConfig):
+    default_auto_field = 'django.db.models.BigAutoField'
     name = 'dashboard'
+
+    def ready(self):
+        connection_created.connect(sqlite_pragmas, dispatch_uid='dashboard.sqlite_pragmas')
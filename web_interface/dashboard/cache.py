@@ -0,0 +1,73 @@
+"""
+Caché persistente de resultados direccionada por contenido: la clave combina el SHA-256
+del upload, el SHA-256 del modelo .tflite (del manifest del registro) y los parámetros del análisis. Vive en la base
+SQLite del proyecto, con desalojo LRU por tamaño (EDGEGEN_RESULT_CACHE_MAX_BYTES).
+"""
+import hashlib
+import json
+
+from django.conf import settings
+from django.db.models import F, Sum
+from django.utils import timezone
+
+from .models import CacheStat, ResultCacheEntry
+
+def cache_key(input_digest, model_sha, **params):
+    payload = json.dumps({'input': input_digest, 'model': model_sha, 'params': params}, sort_keys=True)
+    return hashlib.sha256(payload.encode()).hexdigest()
+
+
+def _bump(name, amount=1):
+    if not CacheStat.objects.filter(name=name).update(value=F('value') + amount):
+        CacheStat.objects.get_or_create(name=name)
+        CacheStat.objects.filter(name=name).update(value=F('value') + amount)
+
+
+def lookup(key, input_bytes=0):
+    """Resultado cacheado para `key` (o None). Registra hit/miss y bytes no reprocesados."""
+    updated = ResultCacheEntry.objects.filter(key=key).update(hits=F('hits') + 1, last_used_at=timezone.now())
+    if not updated:
+        _bump('misses')
+        return None
+    _bump('hits')
+    _bump('bytes_saved', input_bytes)
+    return ResultCacheEntry.objects.values_list('result', flat=True).get(key=key)
+
+
+def store(key, result, input_bytes=0, max_bytes=None):
+    size = len(json.dumps(result))
+    ResultCacheEntry.objects.update_or_create(key=key, defaults={
+        'result': result, 'size_bytes': size, 'input_bytes': input_bytes, 'last_used_at': timezone.now()})
+    evict(settings.EDGEGEN_RESULT_CACHE_MAX_BYTES if max_bytes is None else max_bytes)
+
+
+def evict(max_bytes):
+    """Desaloja las entradas usadas hace más tiempo hasta que el total quepa en max_bytes."""
+    total = ResultCacheEntry.objects.aggregate(total=Sum('size_bytes'))['total'] or 0
+    if total <= max_bytes:
+        return 0
+    doomed = []
+    for key, size in ResultCacheEntry.objects.order_by('last_used_at').values_list('key', 'size_bytes'):
+        if total <= max_bytes:
+            break
+        doomed.append(key)
+        total -= size
+    ResultCacheEntry.objects.filter(key__in=doomed).delete()
+    _bump('evictions', len(doomed))
+    return len(doomed)
+
+
+def metrics():
+    stats = dict(CacheStat.objects.values_list('name', 'value'))
+    hits, misses = stats.get('hits', 0), stats.get('misses', 0)
+    usage = ResultCacheEntry.objects.aggregate(size=Sum('size_bytes'))
+    return {
+        'hits': hits,
+        'misses': misses,
+        'hit_rate': hits / (hits + misses) if hits + misses else 0.0,
+        'bytes_saved': stats.get('bytes_saved', 0),
+        'evictions': stats.get('evictions', 0),
+        'entries': ResultCacheEntry.objects.count(),
+        'size_bytes': usage['size'] or 0,
+        'max_bytes': settings.EDGEGEN_RESULT_CACHE_MAX_BYTES,
+    }
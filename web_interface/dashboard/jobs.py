@@ -0,0 +1,219 @@
+"""
+Cola de análisis en segundo plano sobre la base SQLite del proyecto (sin broker externo).
+Los workers (ver `manage.py run_workers`) reclaman jobs con una actualización condicional
+(compare-and-set) y guardan un checkpoint al terminar cada lote: si un worker muere,
+otro reanuda el job desde el último lote completado.
+"""
+import itertools
+import os
+import socket
+import sys
+import time
+from datetime import timedelta
+
+import numpy as np
+from django.conf import settings
+from django.db import transaction
+from django.db.models import F, Q
+from django.utils import timezone
+
+sys.path.append(str(settings.BASE_DIR.parent))
+
+from src.ingestion import iter_batches, iter_decompressed, iter_file_chunks, iter_lines, parse_records
+from src.pipeline import classify_batches
+
+from . import cache
+from . import results
+from .models import AnalysisJob
+
+# Reintentos antes de marcar como fallido un job que tumba a sus workers
+MAX_JOB_ATTEMPTS = 3
+
+# IDs de lecturas positivas guardadas en el resultado
+JOB_MAX_FLAGGED = 100
+
+
+def worker_id():
+    return f"{socket.gethostname()}:{os.getpid()}"
+
+
+def result_cache_key(input_digest, model_sha, shortcuts_sha=''):
+    """
+    Clave de caché del análisis completo de una muestra con un modelo (hash del manifest)
+    y las vías que deciden lecturas sin el modelo (hashes del prefiltro y del índice).
+    """
+    return cache.cache_key(input_digest, model_sha, analysis='full', max_flagged=JOB_MAX_FLAGGED,
+                           shortcuts=shortcuts_sha)
+
+
+def analysis_result(virus_type, total_reads, virus_count, flagged):
+    """Resultado final de un análisis completo (mismo formato para jobs, streaming y caché)."""
+    from .views import _display_name
+
+    return {
+        'diagnosis': f"DETECTADO - {_display_name(virus_type)}" if virus_count > 0 else "NEGATIVO",
+        'total_reads': total_reads,
+        'virus_count': virus_count,
+        'flagged': flagged[:JOB_MAX_FLAGGED],
+    }
+
+
+def submit_job(chunks, virus_type='covid19', batch_size=1024, cache_key='', input_bytes=0, sample=None):
+    """
+    Guarda el upload (chunks de bytes) en EDGEGEN_JOB_DIR y encola el job. Con `cache_key`,
+    una muestra ya analizada crea el job directamente terminado, sin escribir ni procesar nada.
+    Los resultados por lectura se guardan en `sample` (por defecto, una muestra en una corrida
+    nueva si EDGEGEN_PERSIST_RESULTS está activo).
+    """
+    if sample is None and settings.EDGEGEN_PERSIST_RESULTS:
+        sample = results.create_sample([virus_type], cache_key=cache_key)
+    job = AnalysisJob(virus_type=virus_type, batch_size=batch_size, cache_key=cache_key, sample=sample)
+    cached = cache.lookup(cache_key, input_bytes) if cache_key else None
+    if cached is not None:
+        now = timezone.now()
+        job.status = AnalysisJob.DONE
+        job.result = dict(cached, cached=True)
+        job.reads_processed = cached['total_reads']
+        job.virus_count = cached['virus_count']
+        job.started_at = job.finished_at = now
+        job.save()
+        if sample is not None:
+            results.copy_results(sample, job.result)
+        return job
+
+    os.makedirs(settings.EDGEGEN_JOB_DIR, exist_ok=True)
+    job.input_path = os.path.join(settings.EDGEGEN_JOB_DIR, f"{job.id}.reads")
+    with open(job.input_path, 'wb') as f:
+        for chunk in chunks:
+            f.write(chunk)
+    job.save()
+    return job
+
+
+def claim_next_job(worker, stale_after=None):
+    """
+    Reclama el job en cola más antiguo, o uno en proceso cuyo worker dejó de dar señales
+    hace más de `stale_after` segundos. Retorna el job reclamado o None.
+    """
+    stale_after = settings.EDGEGEN_JOB_STALE_SECONDS if stale_after is None else stale_after
+    now = timezone.now()
+    candidates = (AnalysisJob.objects
+                  .filter(Q(status=AnalysisJob.QUEUED) |
+                          Q(status=AnalysisJob.RUNNING, heartbeat_at__lt=now - timedelta(seconds=stale_after)))
+                  .values_list('pk', 'status', 'heartbeat_at')[:10])
+
+    for pk, status, heartbeat_at in candidates:
+        claimed = AnalysisJob.objects.filter(pk=pk, status=status, heartbeat_at=heartbeat_at).update(
+            status=AnalysisJob.RUNNING, worker=worker, heartbeat_at=now, attempts=F('attempts') + 1)
+        if claimed:
+            if status == AnalysisJob.QUEUED:
+                AnalysisJob.objects.filter(pk=pk).update(started_at=now)
+            return AnalysisJob.objects.get(pk=pk)
+    return None
+
+
+def requeue_worker_jobs(worker):
+    """Devuelve a la cola los jobs de un worker que murió (reanudan desde su checkpoint)."""
+    return AnalysisJob.objects.filter(status=AnalysisJob.RUNNING, worker=worker).update(status=AnalysisJob.QUEUED)
+
+
+def _finish(job, worker, **fields):
+    """Cierra el job si sigue siendo de `worker`; si otro lo reclamó, su upload sigue en uso y no se borra."""
+    updated = AnalysisJob.objects.filter(pk=job.pk, worker=worker).update(finished_at=timezone.now(), **fields)
+    if updated and os.path.exists(job.input_path):
+        os.remove(job.input_path)
+    return updated
+
+
+def run_job(job, worker, get_engine, stop=None, prefilter=None, index=None):
+    """
+    Procesa un job reclamado desde su checkpoint (reads_processed). Tras cada lote guarda
+    el progreso; si otro worker reclamó el job entretanto, se detiene sin escribir más.
+    Con resultados persistidos, el checkpoint se guarda cada EDGEGEN_RESULTS_FLUSH_READS
+    lecturas, en la misma transacción que sus resultados: al reanudar no hay lecturas
+    duplicadas ni faltantes.
+    Con `stop` activado (apagado ordenado) devuelve el job a la cola tras el lote en curso.
+    Retorna el estado final del job desde el punto de vista de este worker.
+    """
+    if job.attempts > MAX_JOB_ATTEMPTS:
+        _finish(job, worker, status=AnalysisJob.FAILED, error=f"Abortado tras {MAX_JOB_ATTEMPTS} intentos")
+        return AnalysisJob.FAILED
+
+    engine = get_engine(job.virus_type)
+    if engine is None:
+        _finish(job, worker, status=AnalysisJob.FAILED, error=f"Model for {job.virus_type} not available")
+        return AnalysisJob.FAILED
+
+    try:
+        records = parse_records(iter_lines(iter_decompressed(iter_file_chunks(job.input_path))))
+        # Reanudar: saltar las lecturas ya contabilizadas en el checkpoint
+        records = itertools.islice(records, job.reads_processed, None)
+
+        flagged = list(job.flagged)
+        writer = results.ResultWriter(job.sample, start=job.reads_processed) if job.sample_id else None
+
+        def checkpoint():
+            with transaction.atomic():
+                if writer is not None:
+                    writer.flush()
+                saved = AnalysisJob.objects.filter(pk=job.pk, worker=worker, status=AnalysisJob.RUNNING).update(
+                    batches_done=job.batches_done, reads_processed=job.reads_processed,
+                    virus_count=job.virus_count, processing_seconds=job.processing_seconds,
+                    flagged=flagged, heartbeat_at=timezone.now())
+                if not saved:
+                    transaction.set_rollback(True)  # sin los resultados de este worker
+            return saved
+
+        last = time.perf_counter()
+        batches = iter_batches(records, job.batch_size)
+        for result in classify_batches(batches, {job.virus_type: engine}, prefilter=prefilter, index=index):
+            viral = np.argmax(result['probs'][job.virus_type], axis=1) == 1
+            room = JOB_MAX_FLAGGED - len(flagged)
+            if room > 0:
+                flagged += [result['headers'][j] for j in np.flatnonzero(viral)[:room]]
+            if writer is not None:
+                writer.add(result['headers'], result['probs'], result['decided_by'])
+
+            now = time.perf_counter()
+            job.batches_done += 1
+            job.reads_processed += len(viral)
+            job.virus_count += int(viral.sum())
+            job.processing_seconds += now - last
+            last = now
+
+            stopping = stop is not None and stop.is_set()
+            if writer is None or writer.due or stopping:
+                if not checkpoint():
+                    return None  # el job fue reclamado por otro worker
+            if stopping:
+                requeue_worker_jobs(worker)
+                return AnalysisJob.QUEUED
+        if writer is not None and writer.pending_reads and not checkpoint():
+            return None
+    except Exception as e:
+        _finish(job, worker, status=AnalysisJob.FAILED, error=str(e))
+        return AnalysisJob.FAILED
+
+    result = analysis_result(job.virus_type, job.reads_processed, job.virus_count, flagged)
+    if job.cache_key:
+        cache.store(job.cache_key, result, input_bytes=os.path.getsize(job.input_path))
+    if writer is not None:
+        writer.finish(result)
+    _finish(job, worker, status=AnalysisJob.DONE, result=result)
+    return AnalysisJob.DONE
+
+
+def worker_loop(get_engine, poll_interval=1.0, stop=None, max_jobs=None, get_prefilter=lambda: None,
+                get_index=lambda: None):
+    """Bucle de un worker: reclama y procesa jobs hasta `stop` (threading/multiprocessing Event)."""
+    worker = worker_id()
+    processed = 0
+    while not (stop and stop.is_set()) and (max_jobs is None or processed < max_jobs):
+        job = claim_next_job(worker)
+        if job is None:
+            time.sleep(poll_interval)
+            continue
+        print(f"[Worker {worker}] Job {job.id} ({job.virus_type}) desde la lectura {job.reads_processed}", flush=True)
+        status = run_job(job, worker, get_engine, stop, prefilter=get_prefilter(), index=get_index())
+        print(f"[Worker {worker}] Job {job.id}: {status or 'reclamado por otro worker'}", flush=True)
+        processed += 1
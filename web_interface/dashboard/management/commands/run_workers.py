@@ -0,0 +1,61 @@
+import multiprocessing
+import signal
+import socket
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+
+def _worker_process(poll_interval, stop):
+    # Proceso hijo (spawn): inicializa Django antes de importar modelos
+    import django
+    django.setup()
+    from dashboard.jobs import worker_loop
+    from dashboard.views import get_engine, get_index, get_prefilter
+
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    worker_loop(get_engine, poll_interval=poll_interval, stop=stop, get_prefilter=get_prefilter,
+                get_index=get_index)
+
+
+class Command(BaseCommand):
+    help = "Ejecuta los workers locales de la cola de análisis (jobs en SQLite, sin broker)."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--workers', type=int, default=settings.EDGEGEN_JOB_WORKERS)
+        parser.add_argument('--poll', type=float, default=1.0, help="Segundos entre consultas a la cola")
+
+    def handle(self, *args, **options):
+        from dashboard.jobs import requeue_worker_jobs
+
+        # spawn: TensorFlow no es fork-safe
+        ctx = multiprocessing.get_context('spawn')
+        stop = ctx.Event()
+        signal.signal(signal.SIGTERM, lambda *_: stop.set())
+
+        def start():
+            proc = ctx.Process(target=_worker_process, args=(options['poll'], stop), daemon=True)
+            proc.start()
+            return proc
+
+        procs = [start() for _ in range(options['workers'])]
+        self.stdout.write(f"[Jobs] {len(procs)} workers iniciados")
+        self.stdout.flush()
+        try:
+            while not stop.is_set():
+                time.sleep(1.0)
+                for i, proc in enumerate(procs):
+                    if not proc.is_alive() and not stop.is_set():
+                        # Worker caído: sus jobs vuelven a la cola y reanudan desde el último lote
+                        requeued = requeue_worker_jobs(f"{socket.gethostname()}:{proc.pid}")
+                        self.stdout.write(f"[Jobs] Worker {proc.pid} terminó (código {proc.exitcode}); "
+                                          f"{requeued} job(s) re-encolados")
+                        self.stdout.flush()
+                        procs[i] = start()
+        except KeyboardInterrupt:
+            stop.set()
+        for proc in procs:
+            proc.join(timeout=30)
+            if proc.is_alive():
+                proc.terminate()
@@ -0,0 +1,41 @@
+# Generated by Django 5.2.18 on 2026-10-19 12:18
+
+import uuid
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='AnalysisJob',
+            fields=[
+                ('id', models.UUIDField(default=uuid.uuid4, editable=False, primary_key=True, serialize=False)),
+                ('virus_type', models.CharField(default='covid19', max_length=32)),
+                ('input_path', models.CharField(max_length=512)),
+                ('batch_size', models.PositiveIntegerField(default=1024)),
+                ('status', models.CharField(choices=[('queued', 'En cola'), ('running', 'Procesando'), ('done', 'Terminado'), ('failed', 'Fallido')], db_index=True, default='queued', max_length=16)),
+                ('batches_done', models.PositiveIntegerField(default=0)),
+                ('reads_processed', models.PositiveBigIntegerField(default=0)),
+                ('virus_count', models.PositiveBigIntegerField(default=0)),
+                ('flagged', models.JSONField(default=list)),
+                ('processing_seconds', models.FloatField(default=0.0)),
+                ('result', models.JSONField(blank=True, null=True)),
+                ('error', models.TextField(blank=True, default='')),
+                ('attempts', models.PositiveIntegerField(default=0)),
+                ('worker', models.CharField(blank=True, default='', max_length=64)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('started_at', models.DateTimeField(blank=True, null=True)),
+                ('heartbeat_at', models.DateTimeField(blank=True, null=True)),
+                ('finished_at', models.DateTimeField(blank=True, null=True)),
+            ],
+            options={
+                'ordering': ['created_at'],
+            },
+        ),
+    ]
@@ -0,0 +1,83 @@
+# Generated by Django 5.2.18 on 2026-10-19 13:19
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('dashboard', '0002_result_cache'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Run',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(blank=True, default='', max_length=128)),
+                ('created_at', models.DateTimeField(auto_now_add=True, db_index=True)),
+            ],
+            options={
+                'ordering': ['-created_at'],
+            },
+        ),
+        migrations.CreateModel(
+            name='Sample',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(blank=True, default='', max_length=256)),
+                ('model_names', models.JSONField(default=list)),
+                ('input_digest', models.CharField(blank=True, default='', max_length=64)),
+                ('cache_key', models.CharField(blank=True, db_index=True, default='', max_length=64)),
+                ('total_reads', models.PositiveBigIntegerField(default=0)),
+                ('flagged_reads', models.PositiveBigIntegerField(default=0)),
+                ('summary', models.JSONField(blank=True, null=True)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('finished_at', models.DateTimeField(blank=True, null=True)),
+                ('run', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='samples', to='dashboard.run')),
+            ],
+            options={
+                'ordering': ['pk'],
+            },
+        ),
+        migrations.AddField(
+            model_name='analysisjob',
+            name='sample',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='jobs', to='dashboard.sample'),
+        ),
+        migrations.CreateModel(
+            name='ReadResult',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('model', models.CharField(max_length=32)),
+                ('read_index', models.PositiveBigIntegerField()),
+                ('read_id', models.CharField(max_length=128)),
+                ('class_id', models.PositiveSmallIntegerField()),
+                ('confidence', models.FloatField()),
+                ('decided_by', models.PositiveSmallIntegerField(default=0)),
+                ('run', models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, related_name='+', to='dashboard.run')),
+                ('sample', models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, related_name='flagged', to='dashboard.sample')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['sample', 'model', 'class_id'], name='readresult_sample_model_class'), models.Index(fields=['run', 'id'], name='readresult_run')],
+            },
+        ),
+        migrations.CreateModel(
+            name='ReadBatch',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('model', models.CharField(max_length=32)),
+                ('first_read', models.PositiveBigIntegerField()),
+                ('n', models.PositiveIntegerField()),
+                ('read_ids', models.BinaryField()),
+                ('class_ids', models.BinaryField()),
+                ('confidence', models.BinaryField()),
+                ('decided_by', models.BinaryField()),
+                ('sample', models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, related_name='batches', to='dashboard.sample')),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('sample', 'model', 'first_read'), name='readbatch_position')],
+            },
+        ),
+    ]
@@ -1,3 +1,182 @@
+import uuid
+
 from django.db import models
 
-# Create your models here.
+
+class AnalysisJob(models.Model):
+    """
+    Análisis en segundo plano de una muestra completa. El progreso (lecturas, lotes,
+    positivas) se guarda al terminar cada lote: es el checkpoint desde el que un worker
+    reanuda el job si el anterior murió.
+    """
+    QUEUED = 'queued'
+    RUNNING = 'running'
+    DONE = 'done'
+    FAILED = 'failed'
+    STATUS_CHOICES = [(QUEUED, 'En cola'), (RUNNING, 'Procesando'), (DONE, 'Terminado'), (FAILED, 'Fallido')]
+
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    virus_type = models.CharField(max_length=32, default='covid19')
+    input_path = models.CharField(max_length=512)
+    batch_size = models.PositiveIntegerField(default=1024)
+    cache_key = models.CharField(max_length=64, blank=True, default='')
+    status = models.CharField(max_length=16, choices=STATUS_CHOICES, default=QUEUED, db_index=True)
+
+    # Checkpoint (último lote completado)
+    batches_done = models.PositiveIntegerField(default=0)
+    reads_processed = models.PositiveBigIntegerField(default=0)
+    virus_count = models.PositiveBigIntegerField(default=0)
+    flagged = models.JSONField(default=list)
+    processing_seconds = models.FloatField(default=0.0)
+
+    result = models.JSONField(null=True, blank=True)
+    error = models.TextField(blank=True, default='')
+    attempts = models.PositiveIntegerField(default=0)
+    worker = models.CharField(max_length=64, blank=True, default='')
+    # Resultados por lectura persistidos (EDGEGEN_PERSIST_RESULTS)
+    sample = models.ForeignKey('Sample', null=True, blank=True, on_delete=models.SET_NULL, related_name='jobs')
+
+    created_at = models.DateTimeField(auto_now_add=True)
+    started_at = models.DateTimeField(null=True, blank=True)
+    heartbeat_at = models.DateTimeField(null=True, blank=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        ordering = ['created_at']
+
+    @property
+    def reads_per_sec(self):
+        return self.reads_processed / self.processing_seconds if self.processing_seconds > 0 else 0.0
+
+    def as_dict(self):
+        return {
+            'job_id': str(self.id),
+            'status': self.status,
+            'virus_type': self.virus_type,
+            'progress': {
+                'batches_done': self.batches_done,
+                'reads_processed': self.reads_processed,
+                'virus_count': self.virus_count,
+                'reads_per_sec': self.reads_per_sec,
+            },
+            'attempts': self.attempts,
+            'sample_id': self.sample_id,
+            'result': self.result,
+            'error': self.error or None,
+            'created_at': self.created_at.isoformat() if self.created_at else None,
+            'finished_at': self.finished_at.isoformat() if self.finished_at else None,
+        }
+
+
+class ResultCacheEntry(models.Model):
+    """Resultado de un análisis completo, direccionado por contenido (ver dashboard.cache)."""
+    key = models.CharField(max_length=64, primary_key=True)
+    result = models.JSONField()
+    size_bytes = models.PositiveIntegerField(default=0)
+    input_bytes = models.PositiveBigIntegerField(default=0)
+    hits = models.PositiveIntegerField(default=0)
+    created_at = models.DateTimeField(auto_now_add=True)
+    last_used_at = models.DateTimeField(db_index=True)
+
+
+class CacheStat(models.Model):
+    """Contadores persistentes de la caché (hits, misses, bytes_saved, evictions)."""
+    name = models.CharField(max_length=32, primary_key=True)
+    value = models.BigIntegerField(default=0)
+
+
+class Run(models.Model):
+    """Corrida de secuenciación: agrupa las muestras analizadas juntas (para comparar corridas)."""
+    name = models.CharField(max_length=128, blank=True, default='')
+    created_at = models.DateTimeField(auto_now_add=True, db_index=True)
+
+    class Meta:
+        ordering = ['-created_at']
+
+    def as_dict(self):
+        return {'run_id': self.pk, 'name': self.name,
+                'created_at': self.created_at.isoformat() if self.created_at else None}
+
+
+class Sample(models.Model):
+    """
+    Muestra analizada dentro de una corrida. Los resultados por lectura viven en ReadBatch
+    (todas las lecturas, por columnas) y ReadResult (lecturas positivas, indexadas).
+    """
+    run = models.ForeignKey(Run, on_delete=models.CASCADE, related_name='samples')
+    name = models.CharField(max_length=256, blank=True, default='')
+    model_names = models.JSONField(default=list)
+    input_digest = models.CharField(max_length=64, blank=True, default='')
+    cache_key = models.CharField(max_length=64, blank=True, default='', db_index=True)
+    total_reads = models.PositiveBigIntegerField(default=0)
+    flagged_reads = models.PositiveBigIntegerField(default=0)
+    summary = models.JSONField(null=True, blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        ordering = ['pk']
+
+    def as_dict(self):
+        return {
+            'sample_id': self.pk,
+            'run_id': self.run_id,
+            'name': self.name,
+            'models': self.model_names,
+            'total_reads': self.total_reads,
+            'flagged_reads': self.flagged_reads,
+            'summary': self.summary,
+            'created_at': self.created_at.isoformat() if self.created_at else None,
+            'finished_at': self.finished_at.isoformat() if self.finished_at else None,
+        }
+
+
+class ReadBatch(models.Model):
+    """
+    Resultados de un lote de lecturas contra un modelo, por columnas: una fila por lote en
+    vez de una por lectura (insertar un millón de filas costaría tanto como el análisis).
+    read_ids: ids separados por salto de línea (zlib); class_ids y decided_by: uint8;
+    confidence: float16 (probabilidad de la clase predicha).
+    """
+    sample = models.ForeignKey(Sample, on_delete=models.CASCADE, related_name='batches', db_index=False)
+    model = models.CharField(max_length=32)
+    first_read = models.PositiveBigIntegerField()
+    n = models.PositiveIntegerField()
+    read_ids = models.BinaryField()
+    class_ids = models.BinaryField()
+    confidence = models.BinaryField()
+    decided_by = models.BinaryField()
+
+    class Meta:
+        constraints = [models.UniqueConstraint(fields=['sample', 'model', 'first_read'], name='readbatch_position')]
+
+
+class ReadResult(models.Model):
+    """Lectura positiva (clase > 0) para un modelo: una fila indexada por lectura."""
+    run = models.ForeignKey(Run, on_delete=models.CASCADE, related_name='+', db_index=False)
+    sample = models.ForeignKey(Sample, on_delete=models.CASCADE, related_name='flagged', db_index=False)
+    model = models.CharField(max_length=32)
+    read_index = models.PositiveBigIntegerField()
+    read_id = models.CharField(max_length=128)
+    class_id = models.PositiveSmallIntegerField()
+    confidence = models.FloatField()
+    decided_by = models.PositiveSmallIntegerField(default=0)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['sample', 'model', 'class_id'], name='readresult_sample_model_class'),
+            # Positivas de una corrida en orden de inserción (paginación por id)
+            models.Index(fields=['run', 'id'], name='readresult_run'),
+        ]
+
+    def as_dict(self):
+        return {
+            'id': self.pk,
+            'sample_id': self.sample_id,
+            'model': self.model,
+            'read_index': self.read_index,
+            'read_id': self.read_id,
+            'class_id': self.class_id,
+            'confidence': self.confidence,
+            'decided_by': self.decided_by,
+        }
@@ -0,0 +1,162 @@
+"""
+Persistencia de resultados por lectura en la base SQLite del proyecto (modo WAL).
+Todas las lecturas se guardan por columnas, en una fila ReadBatch por lote y modelo. Las
+positivas (clase > 0) se guardan además como filas ReadResult indexadas por muestra, modelo
+y clase, para consultarlas en milisegundos. Las escrituras se acumulan y se insertan con
+bulk_create en transacciones grandes (EDGEGEN_RESULTS_FLUSH_READS lecturas).
+"""
+import sys
+import zlib
+
+import numpy as np
+from django.conf import settings
+from django.db import connection, transaction
+from django.utils import timezone
+
+sys.path.append(str(settings.BASE_DIR.parent))
+
+from src.ingestion import read_id
+
+from .models import ReadBatch, ReadResult, Run, Sample
+
+# Máximo de filas por página en los endpoints de consulta
+MAX_PAGE_SIZE = 1000
+
+# Las positivas se insertan con executemany: bulk_create prepara cada campo de cada fila en
+# Python (~33 µs por fila contra ~7 µs; con muchas positivas dominaba el costo de persistir)
+FLAGGED_COLUMNS = ('run', 'sample', 'model', 'read_index', 'read_id', 'class_id', 'confidence', 'decided_by')
+
+
+def _insert_flagged(rows):
+    """Inserta filas ReadResult dadas como tuplas en el orden de FLAGGED_COLUMNS."""
+    if not rows:
+        return
+    quote = connection.ops.quote_name
+    columns = ", ".join(quote(ReadResult._meta.get_field(name).column) for name in FLAGGED_COLUMNS)
+    placeholders = ", ".join(['%s'] * len(FLAGGED_COLUMNS))
+    with connection.cursor() as cursor:
+        cursor.executemany(f"INSERT INTO {quote(ReadResult._meta.db_table)} ({columns}) VALUES ({placeholders})", rows)
+
+
+def create_sample(model_names, name='', run=None, input_digest='', cache_key=''):
+    """Muestra nueva dentro de `run` (o de una corrida propia con el mismo nombre)."""
+    run = run or Run.objects.create(name=name)
+    return Sample.objects.create(run=run, name=name, model_names=list(model_names), input_digest=input_digest,
+                                 cache_key=cache_key)
+
+
+class ResultWriter:
+    """
+    Acumula los resultados por lote de una muestra; `due` indica que ya hay `flush_reads`
+    lecturas para insertar. `start` es el índice de la primera lectura (al reanudar un job,
+    su checkpoint).
+    """
+    def __init__(self, sample, start=0, flush_reads=None):
+        self.sample = sample
+        self.position = start
+        self.flush_reads = flush_reads or settings.EDGEGEN_RESULTS_FLUSH_READS
+        self.flagged = sample.flagged_reads
+        self._batches = []
+        self._flagged = []
+        self.pending_reads = 0
+
+    def add(self, headers, probs, decided_by):
+        """Un lote de classify_batches: headers, {modelo: probabilidades (n, clases)}, {modelo: vía (n,)}."""
+        ids = [read_id(header) for header in headers]
+        packed_ids = zlib.compress("\n".join(ids).encode(), 1)
+        for model, model_probs in probs.items():
+            class_ids = np.argmax(model_probs, axis=1).astype(np.uint8)
+            confidence = model_probs[np.arange(len(class_ids)), class_ids].astype(np.float16)
+            path = decided_by[model].astype(np.uint8)
+            self._batches.append(ReadBatch(
+                sample_id=self.sample.pk, model=model, first_read=self.position, n=len(ids), read_ids=packed_ids,
+                class_ids=class_ids.tobytes(), confidence=confidence.tobytes(), decided_by=path.tobytes()))
+            self._flagged += [(self.sample.run_id, self.sample.pk, model, self.position + int(j), ids[j][:128],
+                               int(class_ids[j]), float(confidence[j]), int(path[j])) for j in np.flatnonzero(class_ids)]
+        self.position += len(ids)
+        self.pending_reads += len(ids)
+
+    @property
+    def due(self):
+        """Hay suficientes lecturas acumuladas para una inserción (el llamador decide cuándo hacer flush)."""
+        return self.pending_reads >= self.flush_reads
+
+    def flush(self):
+        """Inserta lo acumulado en una transacción (o en la del llamador, e.g. el checkpoint de un job)."""
+        if not self._batches:
+            return
+        with transaction.atomic():
+            ReadBatch.objects.bulk_create(self._batches)
+            _insert_flagged(self._flagged)
+            self.flagged += len(self._flagged)
+            Sample.objects.filter(pk=self.sample.pk).update(total_reads=self.position, flagged_reads=self.flagged)
+        self._batches.clear()
+        self._flagged.clear()
+        self.pending_reads = 0
+
+    def finish(self, summary):
+        """Inserta lo pendiente y cierra la muestra con el resumen del análisis."""
+        self.flush()
+        Sample.objects.filter(pk=self.sample.pk).update(
+            total_reads=self.position, flagged_reads=self.flagged, summary=summary, finished_at=timezone.now())
+
+
+def copy_results(sample, summary):
+    """
+    Muestra servida desde la caché de resultados: copia las lecturas de la última muestra
+    terminada con la misma clave (mismo contenido, modelos y atajos) en lugar de reanalizar.
+    Si no hay una (la caché es anterior a la persistencia), solo registra el resumen.
+    """
+    source = (Sample.objects.filter(cache_key=sample.cache_key, finished_at__isnull=False)
+              .exclude(pk=sample.pk).order_by('-pk').first()) if sample.cache_key else None
+    with transaction.atomic():
+        if source is not None:
+            batches = []
+            for batch in source.batches.iterator(chunk_size=100):
+                batch.pk, batch.sample_id = None, sample.pk
+                batches.append(batch)
+                if len(batches) == 100:
+                    ReadBatch.objects.bulk_create(batches)
+                    batches.clear()
+            ReadBatch.objects.bulk_create(batches)
+            _insert_flagged([(sample.run_id, sample.pk, *row)
+                             for row in source.flagged.values_list(*FLAGGED_COLUMNS[2:]).iterator()])
+        Sample.objects.filter(pk=sample.pk).update(
+            total_reads=source.total_reads if source else summary.get('total_reads', 0),
+            flagged_reads=source.flagged_reads if source else 0, summary=summary, finished_at=timezone.now())
+
+
+def page_size(request, default=100):
+    try:
+        return max(1, min(int(request.GET.get('limit', default)), MAX_PAGE_SIZE))
+    except ValueError:
+        return default
+
+
+def flagged_page(run, after=0, limit=100, sample=None, model=None):
+    """Lecturas positivas de una corrida, en orden de inserción, desde el id `after` (paginación por cursor)."""
+    rows = ReadResult.objects.filter(run=run, id__gt=after)
+    if sample is not None:
+        rows = rows.filter(sample_id=sample)
+    if model:
+        rows = rows.filter(model=model)
+    page = [row.as_dict() for row in rows.order_by('id')[:limit]]
+    return {'reads': page, 'next': page[-1]['id'] if len(page) == limit else None}
+
+
+def reads_page(sample, model, start=0, limit=100):
+    """Todas las lecturas de una muestra para `model`, desde la lectura `start` (decodifica solo los lotes necesarios)."""
+    batches = ReadBatch.objects.filter(sample=sample, model=model)
+    first = batches.filter(first_read__lte=start).order_by('-first_read').values_list('first_read', flat=True).first()
+    reads = []
+    for batch in batches.filter(first_read__gte=first or 0).order_by('first_read').iterator(chunk_size=4):
+        ids = zlib.decompress(batch.read_ids).decode().split("\n")
+        class_ids = np.frombuffer(batch.class_ids, dtype=np.uint8)
+        confidence = np.frombuffer(batch.confidence, dtype=np.float16)
+        decided_by = np.frombuffer(batch.decided_by, dtype=np.uint8)
+        for j in range(max(0, start - batch.first_read), batch.n):
+            reads.append({'read_index': batch.first_read + j, 'read_id': ids[j], 'class_id': int(class_ids[j]),
+                          'confidence': float(confidence[j]), 'decided_by': int(decided_by[j])})
+            if len(reads) == limit:
+                return {'reads': reads, 'next': reads[-1]['read_index'] + 1}
+    return {'reads': reads, 'next': None}
@@ -1,3 +1,529 @@
-from django.test import TestCase
+import json
+import os
+import tempfile
 
-# Create your tests here.
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.test import TestCase, override_settings
+
+SEQ_COVID = "ATGTTTGTTTTTCTTGTTTTATTGCCACTAGTCTCTAGTCAGTGTGTTAATCTTACAACCAGAACTCAATTACCCCCTGCATACACTAATTCTTTCACAC"
+
+
+class RunAnalysisProfilingTests(TestCase):
+    def test_profile_flag_writes_flamegraph(self):
+        """Con profile=1 la respuesta indica el archivo collapsed-stack generado"""
+        with tempfile.TemporaryDirectory() as tmp:
+            with override_settings(EDGEGEN_PROFILING_ENABLED=True, EDGEGEN_PROFILE_DIR=tmp):
+                response = self.client.post('/run_analysis', {'sequence': SEQ_COVID, 'profile': '1'})
+            self.assertEqual(response.status_code, 200)
+            folded = response['X-EdgeGen-Profile']
+            self.assertTrue(os.path.exists(folded))
+            self.assertTrue(os.path.exists(folded.replace('.folded', '.txt')))
+
+    def test_profiles_in_the_same_second_do_not_collide(self):
+        from unittest import mock
+
+        with tempfile.TemporaryDirectory() as tmp:
+            with override_settings(EDGEGEN_PROFILING_ENABLED=True, EDGEGEN_PROFILE_DIR=tmp), \
+                    mock.patch('time.strftime', return_value='run_analysis_20240101_000000'):
+                responses = [self.client.post('/run_analysis', {'sequence': SEQ_COVID, 'profile': '1'})
+                             for _ in range(2)]
+            paths = {response['X-EdgeGen-Profile'] for response in responses}
+            self.assertEqual(len(paths), 2)
+            self.assertTrue(all(os.path.exists(path) for path in paths))
+
+    def test_profile_flag_ignored_when_disabled(self):
+        with override_settings(EDGEGEN_PROFILING_ENABLED=False):
+            response = self.client.post('/run_analysis', {'sequence': SEQ_COVID, 'profile': '1'})
+        self.assertEqual(response.status_code, 200)
+        self.assertFalse(response.has_header('X-EdgeGen-Profile'))
+
+
+class RunAnalysisStreamTests(TestCase):
+    def test_stream_covers_whole_file(self):
+        """El endpoint NDJSON procesa todas las lecturas (sin el límite de 20) y cierra con un resumen"""
+        fastq = "".join(f"@r{i}\n{SEQ_COVID}\n+\n{'I' * len(SEQ_COVID)}\n" for i in range(300))
+        upload = SimpleUploadedFile('sample.fastq', fastq.encode())
+        response = self.client.post('/run_analysis/stream', {'virus_type': 'covid19', 'file': upload})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['Content-Type'], 'application/x-ndjson')
+
+        events = [json.loads(line) for line in b"".join(response.streaming_content).splitlines()]
+        self.assertEqual(events[-1]['type'], 'summary')
+        self.assertEqual(events[-1]['total_reads'], 300)
+        self.assertEqual(sum(e['reads'] for e in events if e['type'] == 'batch'), 300)
+
+    def test_stream_accepts_fastq_gz(self):
+        import gzip
+        fastq = "".join(f"@r{i}\n{SEQ_COVID}\n+\n{'I' * len(SEQ_COVID)}\n" for i in range(40))
+        upload = SimpleUploadedFile('sample.fastq.gz', gzip.compress(fastq.encode()))
+        response = self.client.post('/run_analysis/stream', {'virus_type': 'covid19', 'file': upload})
+        events = [json.loads(line) for line in b"".join(response.streaming_content).splitlines()]
+        self.assertEqual(events[-1]['total_reads'], 40)
+
+    def test_prefilter_skips_unrelated_reads(self):
+        """Las lecturas sin k-mers del patógeno no pasan por la CNN; el conteo viral no cambia"""
+        import random
+        from unittest import mock
+        from src.prefilter import KmerBloomFilter, KmerPrefilter, genome_kmers
+
+        prefilter = KmerPrefilter({'covid19': KmerBloomFilter.build(genome_kmers(SEQ_COVID))}, sha256='test')
+        rng = random.Random(0)
+        noise = ["".join(rng.choice("ACGT") for _ in range(100)) for _ in range(60)]
+        seqs = [SEQ_COVID] * 20 + noise
+        fastq = "".join(f"@r{i}\n{s}\n+\n{'I' * len(s)}\n" for i, s in enumerate(seqs))
+
+        summaries = {}
+        for active in (prefilter, None):
+            with mock.patch('dashboard.views.get_prefilter', return_value=active):
+                upload = SimpleUploadedFile('sample.fastq', fastq.encode())
+                response = self.client.post('/run_analysis/stream', {'virus_type': 'covid19', 'file': upload})
+                events = [json.loads(line) for line in b"".join(response.streaming_content).splitlines()]
+            summaries[active is not None] = events[-1]
+        self.assertGreaterEqual(summaries[True]['prefilter_skipped'], 55)
+        self.assertEqual(summaries[False]['prefilter_skipped'], 0)
+        self.assertEqual(summaries[True]['virus_count'], summaries[False]['virus_count'])
+
+    def test_index_decides_exact_matches(self):
+        """Las lecturas idénticas a la referencia las decide el índice de minimizers, sin la CNN"""
+        from unittest import mock
+        from src.minimizer_index import MinimizerIndex
+
+        index = MinimizerIndex.from_genomes({'covid19': SEQ_COVID})
+        index.sha256 = 'test'
+        fastq = "".join(f"@r{i}\n{SEQ_COVID}\n+\n{'I' * len(SEQ_COVID)}\n" for i in range(20))
+        with mock.patch('dashboard.views.get_index', return_value=index), \
+                mock.patch('dashboard.views.get_prefilter', return_value=None):
+            upload = SimpleUploadedFile('sample.fastq', fastq.encode())
+            response = self.client.post('/run_analysis/stream', {'virus_type': 'covid19', 'file': upload})
+            events = [json.loads(line) for line in b"".join(response.streaming_content).splitlines()]
+        self.assertEqual(events[0]['index_decided'], 20)
+        self.assertEqual(events[-1]['decided_by'], {'model': 0, 'prefilter': 0, 'index': 20})
+        self.assertEqual(events[-1]['virus_count'], 20)
+
+    def test_stream_requires_input(self):
+        response = self.client.post('/run_analysis/stream', {'virus_type': 'covid19'})
+        self.assertEqual(response.status_code, 400)
+
+
+class AnalysisJobTests(TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.settings_override = override_settings(EDGEGEN_JOB_DIR=self.tmp.name)
+        self.settings_override.enable()
+
+    def tearDown(self):
+        self.settings_override.disable()
+        self.tmp.cleanup()
+
+    @staticmethod
+    def _fastq(n):
+        return "".join(f"@r{i}\n{SEQ_COVID}\n+\n{'I' * len(SEQ_COVID)}\n" for i in range(n)).encode()
+
+    def test_submit_poll_and_complete(self):
+        """El cliente recibe un job id, un worker lo procesa por lotes y el resultado queda consultable"""
+        from dashboard.jobs import claim_next_job, run_job
+        from dashboard.views import get_engine
+
+        upload = SimpleUploadedFile('sample.fastq', self._fastq(50))
+        response = self.client.post('/jobs', {'virus_type': 'covid19', 'file': upload})
+        self.assertEqual(response.status_code, 202)
+        status_url = response.json()['status_url']
+        self.assertEqual(self.client.get(status_url).json()['status'], 'queued')
+
+        job = claim_next_job('test-worker')
+        self.assertEqual(run_job(job, 'test-worker', get_engine), 'done')
+
+        data = self.client.get(status_url).json()
+        self.assertEqual(data['status'], 'done')
+        self.assertEqual(data['progress']['reads_processed'], 50)
+        self.assertEqual(data['result']['total_reads'], 50)
+        self.assertFalse(os.path.exists(job.input_path))
+
+    def test_resumes_stale_job_from_last_batch(self):
+        """Un job abandonado por un worker muerto se reanuda desde su checkpoint"""
+        from datetime import timedelta
+        from django.utils import timezone
+        from dashboard.jobs import claim_next_job, run_job, submit_job
+        from dashboard.models import AnalysisJob
+        from dashboard.views import get_engine
+
+        job = submit_job([self._fastq(2500)], batch_size=1000)
+        AnalysisJob.objects.filter(pk=job.pk).update(
+            status=AnalysisJob.RUNNING, worker='dead:1', attempts=1, batches_done=1, reads_processed=1000,
+            heartbeat_at=timezone.now() - timedelta(hours=1))
+
+        # Un job con heartbeat reciente no se reclama
+        self.assertIsNone(claim_next_job('w2', stale_after=2 * 3600))
+
+        job = claim_next_job('w2', stale_after=60)
+        self.assertEqual(job.attempts, 2)
+        self.assertEqual(run_job(job, 'w2', get_engine), 'done')
+
+        job.refresh_from_db()
+        self.assertEqual(job.batches_done, 3)
+        self.assertEqual(job.reads_processed, 2500)
+        self.assertEqual(job.result['total_reads'], 2500)
+
+    def test_finish_keeps_input_of_reclaimed_job(self):
+        """Un worker que perdió el job no lo cierra ni borra el upload que procesa el nuevo dueño"""
+        from dashboard.jobs import _finish, claim_next_job, submit_job
+        from dashboard.models import AnalysisJob
+
+        submit_job([self._fastq(10)])
+        job = claim_next_job('w1')
+        AnalysisJob.objects.filter(pk=job.pk).update(worker='w2')
+
+        self.assertEqual(_finish(job, 'w1', status=AnalysisJob.FAILED, error='timeout'), 0)
+        self.assertTrue(os.path.exists(job.input_path))
+        self.assertEqual(AnalysisJob.objects.get(pk=job.pk).status, AnalysisJob.RUNNING)
+
+    def test_unknown_job_is_404(self):
+        self.assertEqual(self.client.get('/jobs/00000000-0000-0000-0000-000000000000').status_code, 404)
+
+
+class ResultCacheTests(TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.settings_override = override_settings(EDGEGEN_JOB_DIR=self.tmp.name)
+        self.settings_override.enable()
+
+    def tearDown(self):
+        self.settings_override.disable()
+        self.tmp.cleanup()
+
+    def _stream(self, content):
+        upload = SimpleUploadedFile('sample.fastq', content)
+        response = self.client.post('/run_analysis/stream', {'virus_type': 'covid19', 'file': upload})
+        return [json.loads(line) for line in b"".join(response.streaming_content).splitlines()]
+
+    def test_repeated_upload_is_served_from_cache(self):
+        """La misma muestra con el mismo modelo no se reprocesa (stream y jobs comparten la caché)"""
+        content = "".join(f"@r{i}\n{SEQ_COVID}\n+\n{'I' * len(SEQ_COVID)}\n" for i in range(30)).encode()
+
+        first = self._stream(content)
+        self.assertFalse(first[-1]['cached'])
+        second = self._stream(content)
+        self.assertEqual(len(second), 1)
+        self.assertTrue(second[0]['cached'])
+        self.assertEqual(second[0]['total_reads'], 30)
+        self.assertEqual(second[0]['diagnosis'], first[-1]['diagnosis'])
+
+        upload = SimpleUploadedFile('sample.fastq', content)
+        job = self.client.post('/jobs', {'virus_type': 'covid19', 'file': upload}).json()
+        self.assertEqual(job['status'], 'done')
+
+        metrics = self.client.get('/metrics/cache').json()
+        self.assertEqual(metrics['hits'], 2)
+        self.assertEqual(metrics['misses'], 1)
+        self.assertEqual(metrics['bytes_saved'], 2 * len(content))
+
+    def test_lru_eviction_by_size(self):
+        from dashboard import cache
+
+        for i in range(3):
+            cache.store(f"k{i}", {'total_reads': i}, max_bytes=10 ** 6)
+        self.assertIsNotNone(cache.lookup('k0'))  # k0 pasa a ser la más reciente
+        self.assertEqual(cache.evict(max_bytes=20), 2)  # 18 bytes por entrada
+        self.assertIsNotNone(cache.lookup('k0'))
+        self.assertIsNone(cache.lookup('k1'))
+
+
+class ReadResultsTests(TestCase):
+    """Resultados por lectura: lecturas de referencia (índice, clase 1) intercaladas con ruido (prefiltro, clase 0)"""
+    def setUp(self):
+        import random
+        from unittest import mock
+        from src.minimizer_index import MinimizerIndex
+        from src.prefilter import KmerBloomFilter, KmerPrefilter, genome_kmers
+
+        self.tmp = tempfile.TemporaryDirectory()
+        self.settings_override = override_settings(EDGEGEN_JOB_DIR=self.tmp.name)
+        self.settings_override.enable()
+        self.prefilter = KmerPrefilter({'covid19': KmerBloomFilter.build(genome_kmers(SEQ_COVID))}, sha256='test')
+        self.index = MinimizerIndex.from_genomes({'covid19': SEQ_COVID})
+        self.index.sha256 = 'test'
+        for name, value in (('get_prefilter', self.prefilter), ('get_index', self.index)):
+            patcher = mock.patch(f'dashboard.views.{name}', return_value=value)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+        rng = random.Random(0)
+        self.seqs = [SEQ_COVID if i % 4 == 0 else "".join(rng.choice("ACGT") for _ in range(100)) for i in range(80)]
+
+    def tearDown(self):
+        self.settings_override.disable()
+        self.tmp.cleanup()
+
+    def _fastq(self, seqs):
+        return "".join(f"@r{i} extra\n{s}\n+\n{'I' * len(s)}\n" for i, s in enumerate(seqs)).encode()
+
+    def _stream(self, content, **fields):
+        upload = SimpleUploadedFile('sample.fastq', content)
+        response = self.client.post('/run_analysis/stream', {'virus_type': 'covid19', 'file': upload, **fields})
+        if response.status_code != 200:
+            return response
+        return json.loads(b"".join(response.streaming_content).splitlines()[-1])
+
+    def _pages(self, url, cursor):
+        reads, position = [], 0
+        while position is not None:
+            page = self.client.get(f"{url}{'&' if '?' in url else '?'}{cursor}={position}&limit=7").json()
+            self.assertLessEqual(len(page['reads']), 7)
+            reads += page['reads']
+            position = page['next']
+        return reads
+
+    def test_stream_persists_every_read_and_paginates(self):
+        summary = self._stream(self._fastq(self.seqs))
+        self.assertEqual(summary['virus_count'], 20)
+
+        reads = self._pages(f"/samples/{summary['sample_id']}/reads", 'start')
+        self.assertEqual([r['read_index'] for r in reads], list(range(80)))
+        self.assertEqual([r['read_id'] for r in reads], [f"r{i}" for i in range(80)])
+        self.assertEqual([r['class_id'] for r in reads], [int(i % 4 == 0) for i in range(80)])
+        self.assertEqual({r['decided_by'] for r in reads}, {1, 2})  # prefiltro e índice
+
+        flagged = self._pages(f"/runs/{summary['run_id']}/flagged", 'after')
+        self.assertEqual([r['read_index'] for r in flagged], list(range(0, 80, 4)))
+        self.assertTrue(all(r['model'] == 'covid19' and r['class_id'] == 1 for r in flagged))
+
+        # Segunda muestra en la misma corrida; la repetición se sirve de la caché y copia las lecturas
+        again = self._stream(self._fastq(self.seqs), run_id=str(summary['run_id']))
+        self.assertTrue(again['cached'])
+        self.assertEqual(again['run_id'], summary['run_id'])
+        run = self.client.get(f"/runs/{summary['run_id']}").json()
+        self.assertEqual([(s['total_reads'], s['flagged_reads']) for s in run['samples']], [(80, 20), (80, 20)])
+        page = self.client.get(f"/runs/{summary['run_id']}/flagged?sample={again['sample_id']}&limit=1000").json()
+        self.assertEqual(len(page['reads']), 20)
+        self.assertIsNone(page['next'])
+        self.assertEqual(self.client.get('/runs').json()['runs'][0]['run_id'], summary['run_id'])
+
+    def test_invalid_requests(self):
+        content = self._fastq(self.seqs[:4])
+        self.assertEqual(self._stream(content, run_id='x').status_code, 400)
+        self.assertEqual(self._stream(content, run_id='999').status_code, 404)
+        sample_id = self._stream(content)['sample_id']
+        self.assertEqual(self.client.get(f"/samples/{sample_id}/reads?model=flu").status_code, 400)
+        self.assertEqual(self.client.get('/runs/999/flagged').status_code, 404)
+
+    def test_job_results_commit_with_checkpoint(self):
+        """Un job detenido y reanudado guarda cada lectura exactamente una vez"""
+        import threading
+        from dashboard.jobs import claim_next_job, run_job, submit_job
+        from dashboard.models import ReadBatch, Sample
+        from dashboard.views import get_engine
+
+        seqs = self.seqs * 30  # 2400 lecturas
+        with override_settings(EDGEGEN_RESULTS_FLUSH_READS=1000):
+            job = submit_job([self._fastq(seqs)], batch_size=500)
+            stop = threading.Event()
+            stop.set()
+            claimed = claim_next_job('w1')
+            self.assertEqual(run_job(claimed, 'w1', get_engine, stop, self.prefilter, self.index), 'queued')
+            self.assertEqual(ReadBatch.objects.filter(sample=job.sample).count(), 1)
+            claimed = claim_next_job('w2')
+            self.assertEqual(claimed.reads_processed, 500)
+            self.assertEqual(run_job(claimed, 'w2', get_engine, None, self.prefilter, self.index), 'done')
+
+        starts = list(ReadBatch.objects.filter(sample=job.sample).order_by('first_read')
+                      .values_list('first_read', 'n'))
+        self.assertEqual(starts, [(i, 500) for i in range(0, 2000, 500)] + [(2000, 400)])
+        sample = Sample.objects.get(pk=job.sample_id)
+        self.assertEqual((sample.total_reads, sample.flagged_reads), (2400, 600))
+        self.assertEqual(sample.summary['total_reads'], 2400)
+        self.assertEqual(self.client.get(f"/jobs/{job.pk}").json()['sample_id'], sample.pk)
+
+
+class PanelAnalysisTests(TestCase):
+    def test_panel_reports_every_pathogen(self):
+        """Una sola pasada entrega un veredicto y conteo por cada modelo disponible"""
+        from dashboard.views import available_models
+
+        fastq = "".join(f"@r{i}\n{SEQ_COVID}\n+\n{'I' * len(SEQ_COVID)}\n" for i in range(25))
+        upload = SimpleUploadedFile('sample.fastq', fastq.encode())
+        response = self.client.post('/run_analysis/panel', {'file': upload})
+        self.assertEqual(response.status_code, 200)
+        data = response.json()
+        self.assertEqual(data['total_reads'], 25)
+        self.assertEqual(set(data['pathogens']), set(available_models()))
+        for verdict in data['pathogens'].values():
+            self.assertLessEqual(verdict['positive_reads'], 25)
+
+    def test_cached_panel_response_carries_timing(self):
+        fastq = "".join(f"@r{i}\n{SEQ_COVID}\n+\n{'I' * len(SEQ_COVID)}\n" for i in range(25)).encode()
+        for expected_cached in (False, True):
+            response = self.client.post('/run_analysis/panel', {'file': SimpleUploadedFile('sample.fastq', fastq)})
+            data = response.json()
+            self.assertEqual(data['cached'], expected_cached)
+            self.assertEqual(data['timing']['reads'], 25)
+            self.assertGreaterEqual(data['timing']['total_ms'], 0.0)
+
+    def test_index_does_not_load_engines(self):
+        from unittest import mock
+
+        with mock.patch('dashboard.views.get_engine', side_effect=AssertionError("index cargó un motor")):
+            self.assertEqual(self.client.get('/').status_code, 200)
+
+
+class ClassifyApiTests(TestCase):
+    def test_json_and_binary_bodies_agree(self):
+        """Secuencias JSON y lecturas pre-codificadas uint8 producen la misma salida columnar"""
+        import numpy as np
+        from src.preprocessing.encoder import DNAEncoder
+
+        seqs = [SEQ_COVID, "ACGT" * 25, "TTTT" * 25]
+        response = self.client.post('/api/v1/classify', json.dumps({'model': 'covid19', 'sequences': seqs}),
+                                    content_type='application/json')
+        self.assertEqual(response.status_code, 200)
+        data = response.json()
+        self.assertEqual(data['n'], 3)
+        self.assertEqual(len(data['class_id']), 3)
+        self.assertEqual(len(data['probs']), len(data['classes']))
+
+        codes = DNAEncoder().encode_batch(seqs).astype(np.uint8)
+        response = self.client.post('/api/v1/classify?model=covid19', codes.tobytes(),
+                                    content_type='application/octet-stream',
+                                    HTTP_ACCEPT='application/octet-stream')
+        self.assertEqual(response.status_code, 200)
+        n = int(response['X-EdgeGen-Reads'])
+        class_ids = np.frombuffer(response.content[:n], dtype=np.uint8)
+        probs = np.frombuffer(response.content[n:], dtype='<f4').reshape(-1, n)
+        self.assertEqual(class_ids.tolist(), data['class_id'])
+        np.testing.assert_allclose(probs, data['probs'], atol=1e-5)
+
+    def test_limits_are_enforced(self):
+        with override_settings(EDGEGEN_API_MAX_READS=2):
+            response = self.client.post('/api/v1/classify', json.dumps({'sequences': ["ACGT"] * 3}),
+                                        content_type='application/json')
+        self.assertEqual(response.status_code, 413)
+
+        response = self.client.post('/api/v1/classify', bytes([9] * 100), content_type='application/octet-stream')
+        self.assertEqual(response.status_code, 400)
+        response = self.client.post('/api/v1/classify', b'ACGT', content_type='text/plain')
+        self.assertEqual(response.status_code, 415)
+        self.assertIn('limits', self.client.get('/api/v1').json())
+
+    def test_index_reports_read_length_per_model(self):
+        from dashboard.views import get_engine
+
+        data = self.client.get('/api/v1').json()
+        self.assertEqual(set(data['limits']['models']), set(data['models']))
+        for name, limits in data['limits']['models'].items():
+            engine = get_engine(name)
+            self.assertEqual(limits['read_length'], engine.encoder.max_length)
+            if engine.buckets is None:
+                self.assertNotIn('buckets', limits)
+            else:
+                self.assertEqual(limits['buckets'], list(engine.buckets))
+                self.assertEqual(limits['read_length'], engine.buckets[-1])
+
+    def test_malformed_requests_are_400(self):
+        response = self.client.post('/api/v1/classify', json.dumps(["ACGT"]), content_type='application/json')
+        self.assertEqual(response.status_code, 400)
+        response = self.client.post('/api/v1/classify', bytes([1] * 100), content_type='application/octet-stream',
+                                    HTTP_X_EDGEGEN_READ_LENGTH='abc')
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('X-EdgeGen-Read-Length', response.json()['error'])
+        response = self.client.post('/api/v1/classify', b'ACGT', content_type='application/json',
+                                    CONTENT_LENGTH='abc')
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.json()['error'], "Invalid Content-Length")
+
+
+class AdmissionControlTests(TestCase):
+    def test_queue_deadline_and_shedding(self):
+        """Exceso en cola FIFO acotada; con la cola llena o el plazo vencido se descarta"""
+        import threading
+        from dashboard.admission import AdmissionController, Overloaded
+
+        controller = AdmissionController(max_inflight_reads=10, max_queue=1, queue_timeout=5.0)
+        first = controller.acquire(8)
+        admitted = []
+        waiter = threading.Thread(target=lambda: admitted.append(controller.acquire(5)))
+        waiter.start()
+        while controller.metrics()['queue_depth'] == 0:
+            waiter.join(0.001)
+
+        with self.assertRaises(Overloaded) as ctx:
+            controller.acquire(1)  # cola llena
+        self.assertEqual(ctx.exception.reason, 'queue_full')
+        self.assertGreaterEqual(ctx.exception.retry_after, 1)
+
+        first.release()
+        waiter.join()
+        self.assertEqual(controller.metrics()['in_flight_reads'], 5)
+        admitted[0].release()
+
+        controller.queue_timeout = 0.01
+        with controller.acquire(10):
+            with self.assertRaises(Overloaded) as ctx:
+                controller.acquire(1)
+        self.assertEqual(ctx.exception.reason, 'queue_timeout')
+        metrics = controller.metrics()
+        self.assertEqual((metrics['rejected_full'], metrics['rejected_timeout']), (1, 1))
+        self.assertEqual(metrics['in_flight_reads'], 0)
+
+    def test_overloaded_worker_returns_503_with_retry_after(self):
+        from unittest import mock
+        from dashboard.admission import AdmissionController
+
+        saturated = AdmissionController(max_inflight_reads=1, max_queue=0, queue_timeout=0.0)
+        permit = saturated.acquire(1)
+        with mock.patch('dashboard.admission._controller', saturated):
+            response = self.client.post('/api/v1/classify', json.dumps({'sequences': [SEQ_COVID]}),
+                                        content_type='application/json')
+            self.assertEqual(response.status_code, 503)
+            self.assertEqual(response['Retry-After'], str(response.json()['retry_after']))
+
+            permit.release()
+            response = self.client.post('/run_analysis/stream', {'virus_type': 'covid19', 'sequence': SEQ_COVID})
+            b"".join(response.streaming_content)
+            response.close()
+            metrics = self.client.get('/metrics/admission').json()
+        self.assertEqual(metrics['in_flight_reads'], 0)
+        self.assertEqual(metrics['admitted'], 2)
+
+
+class TimingBreakdownTests(TestCase):
+    PHASES = ('upload_read_ms', 'parse_ms', 'encode_ms', 'inference_ms', 'aggregation_ms', 'serialization_ms')
+
+    def test_every_analysis_response_carries_timing(self):
+        fastq = "".join(f"@r{i}\n{SEQ_COVID}\n+\n{'I' * len(SEQ_COVID)}\n" for i in range(30))
+
+        preview = self.client.post('/run_analysis', {'sequence': SEQ_COVID}).json()['timing']
+        upload = SimpleUploadedFile('sample.fastq', fastq.encode())
+        stream = self.client.post('/run_analysis/stream', {'virus_type': 'covid19', 'file': upload})
+        summary = json.loads(b"".join(stream.streaming_content).splitlines()[-1])['timing']
+        upload = SimpleUploadedFile('sample.fastq', fastq.encode())
+        panel = self.client.post('/run_analysis/panel', {'file': upload}).json()['timing']
+        api = self.client.post('/api/v1/classify', json.dumps({'sequences': [SEQ_COVID] * 3}),
+                               content_type='application/json').json()['timing']
+
+        for timing in (preview, summary, panel, api):
+            for phase in self.PHASES:
+                self.assertGreaterEqual(timing[phase], 0.0)
+            self.assertGreaterEqual(timing['total_ms'], timing['inference_ms'])
+            self.assertEqual(len(timing['inference_batches_ms']), timing['inference_batches'])
+        self.assertEqual(summary['reads'], 30)
+        self.assertEqual(summary['inference_batches'], 1)
+        self.assertGreater(summary['reads_per_sec'], 0)
+
+    def test_slow_requests_go_to_trace_log(self):
+        import logging
+        from dashboard import timing
+
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, 'slow.log')
+            with override_settings(EDGEGEN_SLOW_REQUEST_MS=0, EDGEGEN_TRACE_LOG=path):
+                timing._trace_logger = None
+                try:
+                    self.client.post('/api/v1/classify', json.dumps({'sequences': [SEQ_COVID]}),
+                                     content_type='application/json')
+                finally:
+                    for handler in logging.getLogger('edgegen.trace').handlers[:]:
+                        handler.close()
+                        logging.getLogger('edgegen.trace').removeHandler(handler)
+                    timing._trace_logger = None
+            with open(path) as f:
+                trace = json.loads(f.readline())
+        self.assertEqual(trace['path'], '/api/v1/classify')
+        self.assertEqual(trace['timing']['reads'], 1)
@@ -0,0 +1,128 @@
+"""
+Desglose de tiempos por petición y registro de peticiones lentas.
+
+Cada respuesta de análisis incluye `timing` con el tiempo de pared de cada fase:
+lectura del upload, parseo (descompresión incluida), codificación, prefiltro de k-mers,
+índice de minimizers, inferencia (total y por lote), agregación y serialización, más
+lecturas/s y el costo por lectura fuera del intérprete. La latencia por fila de
+`_analyze_read` mide solo invoke(); este desglose es el que se compara con el tiempo de
+pared del cliente.
+Las peticiones que superan EDGEGEN_SLOW_REQUEST_MS se escriben (una línea JSON) en
+EDGEGEN_TRACE_LOG, con rotación por tamaño.
+"""
+import json
+import logging
+import os
+import sys
+import threading
+import time
+from contextlib import contextmanager
+from logging.handlers import RotatingFileHandler
+
+from django.conf import settings
+from django.http import HttpResponse
+
+sys.path.append(str(settings.BASE_DIR.parent))
+
+from src.profiling import StageTimer, stage
+
+# Fases del desglose -> etapa de src.profiling que las mide
+PHASES = (
+    ('parse_ms', 'ingestion'),
+    ('encode_ms', 'encoding'),
+    ('prefilter_ms', 'prefilter'),
+    ('index_ms', 'index'),
+    ('inference_ms', 'interpreter'),
+    ('aggregation_ms', 'aggregation'),
+    ('persistence_ms', 'persistence'),
+    ('serialization_ms', 'django_rendering'),
+)
+
+_trace_logger = None
+_trace_lock = threading.Lock()
+
+
+def trace_logger():
+    """Logger de peticiones lentas (archivo rotativo, sin propagar al logging de Django)."""
+    global _trace_logger
+    if _trace_logger is None:
+        with _trace_lock:
+            if _trace_logger is None:
+                path = str(settings.EDGEGEN_TRACE_LOG)
+                os.makedirs(os.path.dirname(path), exist_ok=True)
+                handler = RotatingFileHandler(path, maxBytes=settings.EDGEGEN_TRACE_LOG_MAX_BYTES,
+                                              backupCount=settings.EDGEGEN_TRACE_LOG_BACKUPS)
+                handler.setFormatter(logging.Formatter('%(message)s'))
+                logger = logging.getLogger('edgegen.trace')
+                logger.setLevel(logging.INFO)
+                logger.propagate = False
+                logger.addHandler(handler)
+                _trace_logger = logger
+    return _trace_logger
+
+
+class RequestTiming:
+    """Cronómetro de una petición: lectura del upload + etapas del pipeline (StageTimer)."""
+    def __init__(self, request):
+        self.request = request
+        self.started = time.perf_counter()
+        self.upload_ms = 0.0
+        self.queue_ms = 0.0
+        self.stages = StageTimer()
+
+    @contextmanager
+    def upload(self):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.upload_ms += (time.perf_counter() - start) * 1000
+
+    @contextmanager
+    def queued(self):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.queue_ms += (time.perf_counter() - start) * 1000
+
+    def breakdown(self, reads):
+        total_ms = (time.perf_counter() - self.started) * 1000
+        timing = {'upload_read_ms': round(self.upload_ms, 3), 'queue_ms': round(self.queue_ms, 3)}
+        for key, name in PHASES:
+            timing[key] = round(self.stages.ms(name), 3)
+        timing['inference_batches_ms'] = [round(ms, 3) for ms in self.stages.spans.get('interpreter', [])]
+        timing['inference_batches'] = self.stages.calls['interpreter']
+        timing['total_ms'] = round(total_ms, 3)
+        timing['reads'] = reads
+        timing['reads_per_sec'] = round(reads / (total_ms / 1000), 1) if total_ms > 0 else 0.0
+        # Todo lo que no es cola ni intérprete, por lectura
+        outside_us = (total_ms - self.queue_ms - timing['inference_ms']) * 1000
+        timing['overhead_us_per_read'] = round(outside_us / reads, 3) if reads else 0.0
+        return timing
+
+    def finish(self, reads, status=200, **context):
+        """Desglose final; si la petición fue lenta, lo registra en el trace log."""
+        timing = self.breakdown(reads)
+        if timing['total_ms'] >= settings.EDGEGEN_SLOW_REQUEST_MS:
+            trace_logger().info(json.dumps(dict(
+                context,
+                timestamp=time.strftime('%Y-%m-%dT%H:%M:%S'),
+                method=self.request.method,
+                path=self.request.path,
+                status=status,
+                pid=os.getpid(),
+                timing=timing,
+            )))
+        return timing
+
+    def json_response(self, payload, reads, status=200, **context):
+        """
+        JsonResponse con `timing`. El payload se serializa primero (la serialización queda
+        medida) y el desglose se agrega al final del objeto JSON.
+        """
+        with self.stages, stage('django_rendering'):
+            body = json.dumps(payload)
+        timing = self.finish(reads, status, **context)
+        body = body[:-1] + (', ' if payload else '') + '"timing": ' + json.dumps(timing) + '}'
+        return HttpResponse(body, content_type='application/json', status=status)
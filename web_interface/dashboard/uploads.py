@@ -0,0 +1,47 @@
+import hashlib
+
+from django.core.files.uploadhandler import FileUploadHandler
+
+
+class HashingUploadHandler(FileUploadHandler):
+    """
+    Calcula el SHA-256 de cada archivo mientras se recibe, sin segunda pasada: deja pasar
+    los chunks intactos al siguiente handler (memoria/archivo temporal) y registra
+    (digest, bytes) en `request.upload_digests[campo]`.
+    """
+    def new_file(self, *args, **kwargs):
+        super().new_file(*args, **kwargs)
+        self.hasher = hashlib.sha256()
+        self.size = 0
+
+    def receive_data_chunk(self, raw_data, start):
+        self.hasher.update(raw_data)
+        self.size += len(raw_data)
+        return raw_data
+
+    def file_complete(self, file_size):
+        if not hasattr(self.request, 'upload_digests'):
+            self.request.upload_digests = {}
+        self.request.upload_digests[self.field_name] = (self.hasher.hexdigest(), self.size)
+        return None
+
+
+def request_input(request):
+    """
+    Entrada de la petición: (chunks, sha256, bytes) del archivo subido en `file` o de la
+    secuencia manual en `sequence`; None si no hay ninguna.
+    """
+    if request.FILES.get('file'):
+        uploaded = request.FILES['file']
+        digest, size = getattr(request, 'upload_digests', {}).get('file', (None, uploaded.size))
+        if digest is None:
+            # Upload recibido sin HashingUploadHandler (e.g. FILE_UPLOAD_HANDLERS personalizado)
+            hasher = hashlib.sha256()
+            for chunk in uploaded.chunks():
+                hasher.update(chunk)
+            digest = hasher.hexdigest()
+        return uploaded.chunks(), digest, size
+    if request.POST.get('sequence'):
+        data = request.POST['sequence'].encode('utf-8')
+        return [data], hashlib.sha256(data).hexdigest(), len(data)
+    return None
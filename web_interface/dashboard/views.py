@@ -1,63 +1,130 @@
-from django.shortcuts import render
-from django.http import JsonResponse
+from django.shortcuts import get_object_or_404, render
+from django.http import JsonResponse, StreamingHttpResponse
+from django.views.decorators.http import require_GET, require_POST
 from django.views.decorators.csrf import ensure_csrf_cookie
 from django.conf import settings
 import os
 import sys
+import json
+import time
+import itertools
+from contextlib import nullcontext
+import numpy as np
 
 # Ajuste de path para que encuentre src
 sys.path.append(str(settings.BASE_DIR.parent))
 
 try:
     from src.ingestion import create_dummy_fastq
-    from src.inference import EdgeInference
 except ImportError as e:
     print(f"Error importando core: {e}")
     create_dummy_fastq = None
-    EdgeInference = None
 
-# Instancia global de motores
-engines = {}
+from src.ingestion import iter_batches, iter_decompressed, iter_lines, parse_records
+from concurrent.futures import ThreadPoolExecutor
+from src.minimizer_index import default_index
+from src.pipeline import DECIDED_BY, PATH_INDEX, classify_batches, decided_counts, screen_batches
+from src.prefilter import default_prefilter
+from src.profiling import profile_run, stage
+from src.registry import default_registry
+
+from . import admission
+from . import cache as result_cache
+from . import jobs
+from . import results
+from .models import AnalysisJob, Run, Sample
+from .timing import RequestTiming
+from .uploads import request_input
+
+# Análisis en streaming: lecturas por lote y máximo de IDs positivos informados por lote
+STREAM_BATCH_SIZE = 1024
+STREAM_MAX_FLAGGED_PER_BATCH = 20
+
+# Sufijo único por perfil: con varios hilos/workers hay peticiones perfiladas en el mismo segundo
+_profile_ids = itertools.count()
+
+# Pool del panel: cada modelo se evalúa en su propio hilo (TFLite libera el GIL en invoke)
+panel_pool = ThreadPoolExecutor(max_workers=os.cpu_count() or 1, thread_name_prefix='edgegen-panel')
+
+def available_models():
+    """Modelos binarios publicados por el registro (data/models/manifest.json)."""
+    return default_registry().keys(kind='binary')
 
 def get_engine(virus_type='covid19'):
-    global engines
-    # Map virus type to filename
-    # Assuming standard names from train.py
-    model_map = {
-        'covid19': 'model_covid.tflite',
-        'h3n2': 'model_h3n2.tflite'
-    }
-    
-    # Check if loaded
-    if virus_type in engines and engines[virus_type] is not None:
-        return engines[virus_type]
-        
-    # Load if not
-    filename = model_map.get(virus_type)
-    if not filename: return None
-    
-    try:
-        model_path = os.path.join(settings.BASE_DIR.parent, 'data', 'models', filename)
-        if os.path.exists(model_path):
-            engines[virus_type] = EdgeInference(model_path=model_path)
-    except Exception as e:
-        print(f"Error loading {virus_type}: {e}")
-        engines[virus_type] = None
-        
-    return engines.get(virus_type)
+    """Motor publicado para `virus_type` o None. Nunca carga modelos en la petición (ver src.registry)."""
+    return default_registry().get(virus_type)
+
+def model_sha(virus_type):
+    entry = default_registry().entry(virus_type)
+    return entry['sha256'] if entry else None
+
+def get_prefilter():
+    """Prefiltro de k-mers (data/models/kmer_prefilter.npz) si está habilitado y construido; si no, None."""
+    return default_prefilter() if settings.EDGEGEN_PREFILTER_ENABLED else None
+
+def get_index():
+    """Índice de minimizers (data/models/minimizer_index/, mmap) si está habilitado y construido; si no, None."""
+    return default_index() if settings.EDGEGEN_MINIMIZER_INDEX_ENABLED else None
+
+def shortcuts_sha():
+    """Hash de las vías que deciden lecturas sin la CNN (prefiltro e índice), para la clave de caché."""
+    return "+".join(shortcut.sha256 if shortcut is not None else '' for shortcut in (get_prefilter(), get_index()))
+
+def _request_run(request):
+    """Corrida indicada en `run_id` (POST), si hay. Retorna (corrida o None, respuesta de error o None)."""
+    run_id = request.POST.get('run_id', '')
+    if not run_id:
+        return None, None
+    if not run_id.isdigit():
+        return None, JsonResponse({'error': "run_id must be an integer."}, status=400)
+    run = Run.objects.filter(pk=int(run_id)).first()
+    if run is None:
+        return None, JsonResponse({'error': f"Run {run_id} not found."}, status=404)
+    return run, None
+
+def _result_sample(request, run, model_names, digest, cache_key):
+    """Muestra donde se guardan las lecturas de la petición (en `run` o en una corrida nueva), o None sin EDGEGEN_PERSIST_RESULTS."""
+    if not settings.EDGEGEN_PERSIST_RESULTS:
+        return None
+    uploaded = request.FILES.get('file')
+    name = uploaded.name if uploaded else 'sequence'
+    return results.create_sample(model_names, name=name, run=run, input_digest=digest, cache_key=cache_key)
+
+def get_panel_engines():
+    """
+    Motores del panel: el modelo multi-clase si está registrado (una sola invocación por lote);
+    si no, todos los modelos binarios publicados (evaluados en paralelo).
+    """
+    registry = default_registry()
+    for key in registry.keys(kind='panel'):
+        if registry.get(key) is not None:
+            return {key: registry.get(key)}
+    loaded = {vt: registry.get(vt) for vt in available_models()}
+    return {vt: eng for vt, eng in loaded.items() if eng is not None}
 
 @ensure_csrf_cookie
 def index(request):
     """Renderiza el dashboard."""
-    # Check general status (at least one model available?)
-    eng_covid = get_engine('covid19')
-    eng_h3n2 = get_engine('h3n2')
-    
-    status = "ONLINE" if (eng_covid or eng_h3n2) else "OFFLINE (No models)"
+    # Check general status (at least one model on disk?) sin cargar los motores
+    status = "ONLINE" if available_models() else "OFFLINE (No models)"
     return render(request, 'dashboard/index.html', {'status': status})
 
 def run_analysis(request):
-    """Maneja el análisis (POST)"""
+    """Maneja el análisis (POST). Con `profile=1` (si está habilitado) perfila la petición."""
+    timing = RequestTiming(request)
+    with timing.upload():
+        request.FILES  # lee y parsea el cuerpo (multipart) completo
+    if not (settings.EDGEGEN_PROFILING_ENABLED and request.POST.get('profile') == '1'):
+        return _run_analysis(request, timing)
+    
+    name = f"{time.strftime('run_analysis_%Y%m%d_%H%M%S')}_{os.getpid()}_{next(_profile_ids)}"
+    prefix = os.path.join(settings.EDGEGEN_PROFILE_DIR, name)
+    with profile_run(prefix, interval=0.001, verbose=False):
+        response = _run_analysis(request, timing)
+    response['X-EdgeGen-Profile'] = prefix + '.folded'
+    return response
+
+def _run_analysis(request, timing):
     # Get selected virus (default covid)
     target_virus = request.POST.get('virus_type', 'covid19')
     
@@ -66,16 +133,26 @@ def run_analysis(request):
         return JsonResponse({'error': f"Model for {target_virus} not ready or training in progress."}, status=503)
     
     try:
-        results = []
-        virus_count = 0
-        
-        # --- MODO 1: Archivo Subido ---
-        lines = []
+        with timing.stages:
+            return _preview_analysis(request, timing, eng, target_virus)
+    except Exception as e:
+        import traceback
+        traceback.print_exc()
+        return JsonResponse({'error': str(e)}, status=500)
+
+def _preview_analysis(request, timing, eng, target_virus):
+    """Vista previa: las primeras 20 lecturas, clasificadas una a una."""
+    results = []
+    virus_count = 0
+    
+    # --- MODO 1: Archivo Subido ---
+    lines = []
+    with stage('ingestion'):
         if request.FILES.get('file'):
             uploaded_file = request.FILES['file']
-            for chunk in uploaded_file.chunks():
-                chunk_str = chunk.decode('utf-8', errors='ignore')
-                lines.extend(chunk_str.split('\n'))
+            # .fastq.gz / BGZF se descomprimen en streaming
+            for line in iter_lines(iter_decompressed(uploaded_file.chunks())):
+                lines.append(line.decode('utf-8', errors='ignore'))
                 if len(lines) > 200: break # Limit
         
         # --- MODO 2: Texto Manual ---
@@ -90,14 +167,21 @@ def run_analysis(request):
             sample_path = create_dummy_fastq()
             with open(sample_path, 'r') as f:
                 lines = f.readlines()
-                
-        # Analyze
-        is_fastq = any((l.startswith('@') for l in lines[:5]))
-        
-        for i in range(min(20, len(lines))):
+            
+    # Analyze
+    is_fastq = any((l.startswith('@') for l in lines[:5]))
+    n_preview = min(20, len(lines))
+    try:
+        with timing.queued():
+            permit = admission.controller().acquire(n_preview)
+    except admission.Overloaded as e:
+        return admission.overloaded_response(e)
+    
+    with permit:
+        for i in range(n_preview):
             header = "Seq"
             seq = ""
-            
+        
             if is_fastq and i*4+1 < len(lines):
                 header = lines[i*4].strip()
                 seq = lines[i*4+1].strip()
@@ -105,27 +189,311 @@ def run_analysis(request):
                 # Line by line raw
                 seq = lines[i].strip()
                 header = f"Read_{i}"
-            
-            if len(seq) < 10: continue
-            
-            # Determine display name
-            viral_label = "SARS-CoV-2" if target_virus == 'covid19' else "Influenza H3N2"
-            _analyze_read(eng, header, seq, results, viral_label)
-            if results[-1]['is_viral']: virus_count += 1
         
-        # Diagnosis
-        virus_name = "SARS-CoV-2" if target_virus == 'covid19' else "Influenza H3N2"
-        diagnosis = f"DETECTADO - {virus_name}" if virus_count > 0 else "NEGATIVO"
+            if len(seq) < 10: continue
         
-        return JsonResponse({
-            'results': results,
-            'diagnosis': diagnosis,
-            'virus_count': virus_count
-        })
+            with stage('interpreter'):
+                _analyze_read(eng, header, seq, results, _display_name(target_virus))
+            if results[-1]['is_viral']: virus_count += 1
+    
+    # Diagnosis
+    with stage('aggregation'):
+        diagnosis = f"DETECTADO - {_display_name(target_virus)}" if virus_count > 0 else "NEGATIVO"
+    
+    return timing.json_response({
+        'results': results,
+        'diagnosis': diagnosis,
+        'virus_count': virus_count
+    }, reads=len(results), model=target_virus)
+
+def _display_name(target_virus):
+    entry = default_registry().entry(target_virus)
+    return entry['name'] if entry else target_virus
+
+@require_POST
+def run_analysis_stream(request):
+    """
+    Análisis en streaming (POST): recorre el upload completo chunk a chunk, clasifica por lotes
+    y devuelve NDJSON: una línea {'type': 'batch', ...} por lote y una línea final
+    {'type': 'summary', ...} con el veredicto y el desglose de tiempos. La memoria queda acotada a un lote.
+    """
+    timing = RequestTiming(request)
+    with timing.upload():
+        request.FILES
+    target_virus = request.POST.get('virus_type', 'covid19')
+    eng = get_engine(target_virus)
+    if eng is None:
+        return JsonResponse({'error': f"Model for {target_virus} not ready or training in progress."}, status=503)
+    
+    sample = request_input(request)
+    if sample is None:
+        return JsonResponse({'error': "No file or sequence provided."}, status=400)
+    chunks, digest, size = sample
+    
+    # Muestra ya analizada con este modelo: solo la línea de resumen, sin reprocesar
+    key = jobs.result_cache_key(digest, model_sha(target_virus), shortcuts_sha())
+    run, error = _request_run(request)
+    if error is not None:
+        return error
+    cached = result_cache.lookup(key, size)
+    if cached is not None:
+        summary = dict(cached, type='summary', cached=True, elapsed_ms=0.0,
+                       timing=timing.finish(cached['total_reads'], model=target_virus, cached=True))
+        stored = _result_sample(request, run, [target_virus], digest, key)
+        if stored is not None:
+            results.copy_results(stored, cached)
+            summary.update(run_id=stored.run_id, sample_id=stored.pk)
+        stream = iter([json.dumps(summary) + '\n'])
+    else:
+        # Un lote del stream en el intérprete a la vez
+        try:
+            with timing.queued():
+                permit = admission.controller().acquire(STREAM_BATCH_SIZE)
+        except admission.Overloaded as e:
+            return admission.overloaded_response(e)
+        records = parse_records(iter_lines(iter_decompressed(chunks)))
+        stored = _result_sample(request, run, [target_virus], digest, key)
+        writer = results.ResultWriter(stored) if stored is not None else None
+        stream = admission.ReleaseOnClose(
+            _stream_analysis(eng, target_virus, records, cache_key=key, input_bytes=size, timing=timing,
+                             writer=writer), permit)
+    
+    response = StreamingHttpResponse(stream, content_type='application/x-ndjson')
+    response['Cache-Control'] = 'no-cache'
+    response['X-Accel-Buffering'] = 'no'  # sin buffering en proxies (nginx)
+    return response
+
+@require_POST
+def run_analysis_panel(request):
+    """
+    Tamizaje de la muestra contra todos los patógenos (POST: `file` o `sequence`).
+    El upload se lee una vez, cada lote se codifica una vez y se evalúa con todos los modelos.
+    Retorna el veredicto, el número de lecturas positivas por patógeno y el desglose de tiempos.
+    """
+    timing = RequestTiming(request)
+    with timing.upload():
+        request.FILES
+    panel = get_panel_engines()
+    if not panel:
+        return JsonResponse({'error': "No models available for panel analysis."}, status=503)
+    
+    sample = request_input(request)
+    if sample is None:
+        return JsonResponse({'error': "No file or sequence provided."}, status=400)
+    chunks, digest, size = sample
+    
+    models_sha = "+".join(model_sha(name) for name in sorted(panel))
+    key = result_cache.cache_key(digest, models_sha, analysis='panel', shortcuts=shortcuts_sha())
+    cached = result_cache.lookup(key, size)
+    if cached is not None:
+        return timing.json_response(dict(cached, cached=True), reads=cached['total_reads'], models=sorted(panel),
+                                    cached=True)
+    
+    # Cada lote se evalúa con todos los modelos del panel
+    try:
+        with timing.queued():
+            permit = admission.controller().acquire(STREAM_BATCH_SIZE * len(panel))
+    except admission.Overloaded as e:
+        return admission.overloaded_response(e)
+    
+    start = time.perf_counter()
+    try:
+        with permit, timing.stages:
+            records = parse_records(iter_lines(iter_decompressed(chunks)))
+            summary = screen_batches(iter_batches(records, STREAM_BATCH_SIZE), panel, executor=panel_pool,
+                                     prefilter=get_prefilter(), index=get_index())
     except Exception as e:
         import traceback
         traceback.print_exc()
         return JsonResponse({'error': str(e)}, status=500)
+    
+    total = summary['total_reads']
+    result = {
+        'diagnosis': "DETECTADO - " + ", ".join(_display_name(p) for p in summary['detected']) if summary['detected'] else "NEGATIVO",
+        'total_reads': total,
+        'pathogens': {
+            pathogen: {
+                'name': _display_name(pathogen),
+                'positive_reads': count,
+                'fraction': count / total if total else 0.0,
+                'detected': pathogen in summary['detected'],
+            }
+            for pathogen, count in summary['hits'].items()
+        },
+        'models': sorted(panel),
+        'prefilter_skipped': summary.get('prefilter_skipped', {}),
+        'decided_by': summary.get('decided_by', {}),
+    }
+    with timing.stages, stage('aggregation'):
+        result_cache.store(key, result, size)
+    return timing.json_response(dict(
+        result,
+        cached=False,
+        inference_ms={name: round(ms, 3) for name, ms in summary['inference_ms'].items()},
+        elapsed_ms=round((time.perf_counter() - start) * 1000, 3),
+    ), reads=total, models=sorted(panel))
+
+@require_POST
+def submit_job(request):
+    """
+    Encola el análisis completo de una muestra (POST, mismos campos que run_analysis, más
+    `run_id` opcional). Responde 202 con el id del job; el progreso se consulta en /jobs/<id>
+    y las lecturas, al terminar, en /samples/<sample_id>/reads.
+    """
+    target_virus = request.POST.get('virus_type', 'covid19')
+    sample = request_input(request)
+    if sample is None:
+        return JsonResponse({'error': "No file or sequence provided."}, status=400)
+    chunks, digest, size = sample
+    
+    sha = model_sha(target_virus)
+    key = jobs.result_cache_key(digest, sha, shortcuts_sha()) if sha else ''
+    run, error = _request_run(request)
+    if error is not None:
+        return error
+    stored = _result_sample(request, run, [target_virus], digest, key)
+    job = jobs.submit_job(chunks, virus_type=target_virus, cache_key=key, input_bytes=size, sample=stored)
+    return JsonResponse({'job_id': str(job.id), 'status': job.status, 'status_url': f"/jobs/{job.id}",
+                         'sample_id': job.sample_id}, status=202)
+
+@require_GET
+def job_status(request, job_id):
+    """Estado, progreso (lecturas procesadas, lecturas/s) y resultado de un job."""
+    return JsonResponse(get_object_or_404(AnalysisJob, pk=job_id).as_dict())
+
+@require_GET
+def run_list(request):
+    """Corridas más recientes (`limit`)."""
+    runs = Run.objects.order_by('-created_at', '-pk')[:results.page_size(request)]
+    return JsonResponse({'runs': [run.as_dict() for run in runs]})
+
+@require_GET
+def run_detail(request, run_id):
+    """Una corrida con sus muestras (conteos y resumen de cada una)."""
+    run = get_object_or_404(Run, pk=run_id)
+    return JsonResponse(dict(run.as_dict(), samples=[sample.as_dict() for sample in run.samples.all()]))
+
+@require_GET
+def run_flagged(request, run_id):
+    """
+    Lecturas positivas de una corrida, paginadas por cursor: `after` (el `next` de la página
+    anterior), `limit`, y filtros opcionales `sample` y `model`.
+    """
+    run = get_object_or_404(Run, pk=run_id)
+    after, sample = request.GET.get('after', '0'), request.GET.get('sample')
+    if not after.isdigit() or (sample is not None and not sample.isdigit()):
+        return JsonResponse({'error': "after and sample must be integers."}, status=400)
+    return JsonResponse(results.flagged_page(run, int(after), results.page_size(request),
+                                             sample=int(sample) if sample else None, model=request.GET.get('model')))
+
+@require_GET
+def sample_reads(request, sample_id):
+    """
+    Todas las lecturas de una muestra para un modelo (`model`, opcional si la muestra tiene
+    uno solo), en orden, desde la lectura `start`.
+    """
+    sample = get_object_or_404(Sample, pk=sample_id)
+    model = request.GET.get('model') or (sample.model_names[0] if len(sample.model_names) == 1 else None)
+    if model not in sample.model_names:
+        return JsonResponse({'error': f"model must be one of: {', '.join(sample.model_names)}."}, status=400)
+    start = request.GET.get('start', '0')
+    if not start.isdigit():
+        return JsonResponse({'error': "start must be an integer."}, status=400)
+    return JsonResponse(dict(results.reads_page(sample, model, int(start), results.page_size(request)),
+                             sample_id=sample.pk, model=model, total_reads=sample.total_reads))
+
+@require_GET
+def model_status(request):
+    """Modelos del registro: hash, entrada, métricas de validación, carga y errores."""
+    return JsonResponse({'models': default_registry().status()})
+
+@require_GET
+def admission_metrics(request):
+    """Control de admisión de este worker: lecturas en vuelo, profundidad de cola, esperas y descartes."""
+    return JsonResponse(admission.controller().metrics())
+
+@require_GET
+def cache_metrics(request):
+    """Métricas de la caché de resultados: hit rate, bytes no reprocesados, tamaño y desalojos."""
+    return JsonResponse(result_cache.metrics())
+
+def _stream_analysis(engine, target_virus, records, batch_size=STREAM_BATCH_SIZE, cache_key='', input_bytes=0,
+                     timing=None, writer=None):
+    start = time.perf_counter()
+    total_reads = 0
+    virus_count = 0
+    skipped = 0
+    decided = dict.fromkeys(DECIDED_BY, 0)
+    all_flagged = []
+    stages = timing.stages if timing is not None else nullcontext()
+    try:
+        with stages:
+            batches = classify_batches(iter_batches(records, batch_size), {target_virus: engine},
+                                       prefilter=get_prefilter(), index=get_index())
+            for i, result in enumerate(batches):
+                with stage('aggregation'):
+                    probs = result['probs'][target_virus]
+                    viral = np.argmax(probs, axis=1) == 1
+                    n_viral = int(viral.sum())
+                    total_reads += len(viral)
+                    virus_count += n_viral
+                    skipped += result['skipped'].get(target_virus, 0)
+                    path = result['decided_by'][target_virus]
+                    for via, count in decided_counts(path).items():
+                        decided[via] += count
+                    
+                    flagged = [result['headers'][j] for j in np.flatnonzero(viral)[:STREAM_MAX_FLAGGED_PER_BATCH]]
+                    if len(all_flagged) < jobs.JOB_MAX_FLAGGED:
+                        all_flagged += [result['headers'][j] for j in np.flatnonzero(viral)[:jobs.JOB_MAX_FLAGGED - len(all_flagged)]]
+                if writer is not None:
+                    with stage('persistence'):
+                        writer.add(result['headers'], result['probs'], result['decided_by'])
+                        if writer.due:
+                            writer.flush()
+                with stage('django_rendering'):
+                    line = json.dumps({
+                        'type': 'batch',
+                        'batch': i,
+                        'reads': len(viral),
+                        'viral': n_viral,
+                        'mean_confidence': float(probs.max(axis=1).mean()),
+                        'flagged': flagged,
+                        'total_reads': total_reads,
+                        'virus_count': virus_count,
+                        'prefilter_skipped': result['skipped'].get(target_virus, 0),
+                        'index_decided': int(np.sum(path == PATH_INDEX)),
+                        'inference_ms': round(result['inference_ms'][target_virus], 3),
+                    }) + '\n'
+                yield line
+            
+            with stage('aggregation'):
+                summary = jobs.analysis_result(target_virus, total_reads, virus_count, all_flagged)
+                if cache_key:
+                    result_cache.store(cache_key, summary, input_bytes)
+            if writer is not None:
+                with stage('persistence'):
+                    writer.finish(summary)
+    except Exception as e:
+        import traceback
+        traceback.print_exc()
+        yield json.dumps({'type': 'error', 'error': str(e)}) + '\n'
+        return
+    
+    elapsed = time.perf_counter() - start
+    summary = dict(
+        summary,
+        type='summary',
+        cached=False,
+        prefilter_skipped=skipped,
+        decided_by=decided,
+        elapsed_ms=round(elapsed * 1000, 3),
+        reads_per_sec=total_reads / elapsed if elapsed > 0 else 0.0,
+    )
+    if writer is not None:
+        summary.update(run_id=writer.sample.run_id, sample_id=writer.sample.pk)
+    if timing is not None:
+        summary['timing'] = timing.finish(total_reads, model=target_virus, input_bytes=input_bytes)
+    yield json.dumps(summary) + '\n'
 
 def _analyze_read(engine, header, sequence, results_list, viral_name_label):
     pathogen_tag, confidence, latency = engine.predict(sequence)
@@ -77,6 +77,9 @@ DATABASES = {
     'default': {
         'ENGINE': 'django.db.backends.sqlite3',
         'NAME': BASE_DIR / 'db.sqlite3',
+        # Los workers de la cola de jobs escriben en paralelo: esperar el lock en vez de fallar.
+        # El modo WAL se activa por conexión en dashboard.apps (sqlite_pragmas).
+        'OPTIONS': {'timeout': 20},
     }
 }
 
@@ -116,3 +119,62 @@ USE_TZ = True
 # https://docs.djangoproject.com/en/6.0/howto/static-files/
 
 STATIC_URL = 'static/'
+
+
+# EdgeGen Dx: profiling bajo demanda de /run_analysis (campo `profile=1` en la petición).
+# Solo se habilita por defecto en DEBUG; los perfiles se escriben en EDGEGEN_PROFILE_DIR.
+EDGEGEN_PROFILING_ENABLED = DEBUG
+EDGEGEN_PROFILE_DIR = BASE_DIR / 'profiles'
+
+# EdgeGen Dx: cola de análisis en segundo plano (`manage.py run_workers`).
+# Los uploads encolados se guardan en EDGEGEN_JOB_DIR hasta que el job termina; un job en
+# proceso sin checkpoint en EDGEGEN_JOB_STALE_SECONDS se considera abandonado y se reanuda.
+EDGEGEN_JOB_DIR = BASE_DIR / 'jobs'
+EDGEGEN_JOB_WORKERS = 2
+EDGEGEN_JOB_STALE_SECONDS = 60
+
+# EdgeGen Dx: caché de resultados por contenido (hash del upload + hash del modelo + parámetros).
+# El hash del upload se calcula mientras se recibe (HashingUploadHandler, sin segunda pasada).
+FILE_UPLOAD_HANDLERS = [
+    'dashboard.uploads.HashingUploadHandler',
+    'django.core.files.uploadhandler.MemoryFileUploadHandler',
+    'django.core.files.uploadhandler.TemporaryFileUploadHandler',
+]
+EDGEGEN_RESULT_CACHE_MAX_BYTES = 64 * 1024 * 1024
+
+# EdgeGen Dx: API de clasificación por lotes para clientes máquina (/api/v1/classify).
+# Límites por petición: número de lecturas y tamaño del cuerpo (JSON o binario uint8).
+EDGEGEN_API_MAX_READS = 100_000
+EDGEGEN_API_MAX_BODY_BYTES = 16 * 1024 * 1024
+
+# EdgeGen Dx: control de admisión por worker (dashboard.admission). Lecturas simultáneas en el
+# intérprete; el exceso espera en una cola acotada con plazo y, si no cabe, recibe 503 + Retry-After.
+EDGEGEN_ADMISSION_MAX_INFLIGHT_READS = 8 * 1024
+EDGEGEN_ADMISSION_MAX_QUEUE = 8
+EDGEGEN_ADMISSION_QUEUE_TIMEOUT = 2.0
+
+# EdgeGen Dx: peticiones de análisis más lentas que EDGEGEN_SLOW_REQUEST_MS se registran (JSON por
+# línea, con el desglose de tiempos) en EDGEGEN_TRACE_LOG, rotado por tamaño.
+EDGEGEN_SLOW_REQUEST_MS = 2000
+EDGEGEN_TRACE_LOG = BASE_DIR / 'traces' / 'slow_requests.log'
+EDGEGEN_TRACE_LOG_MAX_BYTES = 10 * 1024 * 1024
+EDGEGEN_TRACE_LOG_BACKUPS = 5
+
+# EdgeGen Dx: prefiltro de k-mers (src.prefilter, data/models/kmer_prefilter.npz). Las lecturas sin
+# k-mers de los patógenos objetivo se declaran limpias sin pasar por la CNN (streaming, panel y jobs).
+EDGEGEN_PREFILTER_ENABLED = True
+
+# EdgeGen Dx: índice exacto de minimizers (src.minimizer_index, data/models/minimizer_index/, mmap).
+# Las lecturas que coinciden casi exactamente con una referencia se deciden sin la CNN.
+EDGEGEN_MINIMIZER_INDEX_ENABLED = True
+
+# EdgeGen Dx: perfil de hilos/lote por host (src.autotune, data/models/host_profiles/). Los motores
+# lo aplican siempre que exista; con esta opción, el arranque (wsgi.py) afina antes de cargar los
+# modelos que aún no estén en el perfil (tarda unos segundos por modelo).
+EDGEGEN_AUTOTUNE_ON_STARTUP = False
+
+# EdgeGen Dx: resultados por lectura en la base (dashboard.results): corridas, muestras, todas
+# las lecturas por columnas y las positivas indexadas por muestra, modelo y clase. Se insertan
+# cada EDGEGEN_RESULTS_FLUSH_READS lecturas, en una transacción (con el checkpoint en los jobs).
+EDGEGEN_PERSIST_RESULTS = True
+EDGEGEN_RESULTS_FLUSH_READS = 64 * 1024
@@ -1,9 +1,22 @@
 from django.contrib import admin
 from django.urls import path
-from dashboard import views
+from dashboard import api, views
 
 urlpatterns = [
     path('admin/', admin.site.urls),
     path('', views.index, name='index'),
     path('run_analysis', views.run_analysis, name='run_analysis'),
+    path('run_analysis/stream', views.run_analysis_stream, name='run_analysis_stream'),
+    path('run_analysis/panel', views.run_analysis_panel, name='run_analysis_panel'),
+    path('jobs', views.submit_job, name='submit_job'),
+    path('jobs/<uuid:job_id>', views.job_status, name='job_status'),
+    path('runs', views.run_list, name='run_list'),
+    path('runs/<int:run_id>', views.run_detail, name='run_detail'),
+    path('runs/<int:run_id>/flagged', views.run_flagged, name='run_flagged'),
+    path('samples/<int:sample_id>/reads', views.sample_reads, name='sample_reads'),
+    path('metrics/cache', views.cache_metrics, name='cache_metrics'),
+    path('metrics/admission', views.admission_metrics, name='admission_metrics'),
+    path('models', views.model_status, name='model_status'),
+    path('api/v1', api.api_index, name='api_index'),
+    path('api/v1/classify', api.classify, name='api_classify'),
 ]
@@ -14,3 +14,15 @@ from django.core.wsgi import get_wsgi_application
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'web_interface.settings')
 
 application = get_wsgi_application()
+
+# Carga y calentamiento de los modelos al arrancar el worker, antes de atender peticiones;
+# luego el registro observa data/models/manifest.json y publica cambios en segundo plano.
+# Con EDGEGEN_AUTOTUNE_ON_STARTUP, antes se afinan hilos/lote de los modelos sin perfil.
+from django.conf import settings  # noqa: E402
+from dashboard.views import default_registry  # noqa: E402
+
+if settings.EDGEGEN_AUTOTUNE_ON_STARTUP:
+    from src.autotune import ensure_profile
+
+    ensure_profile()
+default_registry()